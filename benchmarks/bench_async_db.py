@@ -0,0 +1,62 @@
+"""
+Concurrent request throughput of the blocking ``Session`` path versus the ``AsyncSession`` path.
+
+Every simulated request runs one query that waits ``--latency`` seconds on the server, the way a slow
+Postgres round trip does. With the blocking session the coroutines run one after another because each
+query stalls the event loop, with the async session they overlap.
+
+Usage::
+
+    python -m benchmarks.bench_async_db --requests 200 --concurrency 50 --latency 0.02
+"""
+import argparse
+import asyncio
+import time
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import sessionmaker
+
+from src.database.db import SQLALCHEMY_DB_URL, SessionLocal, engine
+
+QUERY = text('SELECT pg_sleep(:latency)')
+
+
+async def run(handler, requests: int, concurrency: int, latency: float) -> float:
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one():
+        async with semaphore:
+            await handler(latency)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(requests)))
+    return requests / (time.perf_counter() - start)
+
+
+async def main(requests: int, concurrency: int, latency: float) -> None:
+    sync_engine = create_engine(SQLALCHEMY_DB_URL, pool_size=concurrency)
+    BlockingSession = sessionmaker(bind=sync_engine)
+
+    async def blocking_handler(delay: float):
+        with BlockingSession() as db:
+            db.execute(QUERY, {'latency': delay})
+
+    async def async_handler(delay: float):
+        async with SessionLocal() as db:
+            await db.execute(QUERY, {'latency': delay})
+
+    before = await run(blocking_handler, requests, concurrency, latency)
+    after = await run(async_handler, requests, concurrency, latency)
+    print(f'blocking Session : {before:10.1f} req/s')
+    print(f'AsyncSession     : {after:10.1f} req/s  (x{after / before:.1f})')
+    sync_engine.dispose()
+    await engine.dispose()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--requests', type=int, default=200)
+    parser.add_argument('--concurrency', type=int, default=50)
+    parser.add_argument('--latency', type=float, default=0.02)
+    args = parser.parse_args()
+    asyncio.run(main(args.requests, args.concurrency, args.latency))
@@ -0,0 +1,71 @@
+"""
+Latency and peak Python memory of ``birthdays`` for users with large address books.
+
+Compares the SQL-side month-day window with the former approach of loading every contact and checking
+the window in Python.
+
+Usage::
+
+    python -m benchmarks.bench_birthdays --contacts 100000
+"""
+import argparse
+import asyncio
+import tracemalloc
+from datetime import date, timedelta
+
+from sqlalchemy import select
+
+from benchmarks.utils import measure, report, seed, unseed
+from src.database.db import SessionLocal, engine
+from src.database.models import Contact
+from src.repository import contacts as repository_contacts
+
+
+async def python_loop(period, user, db):
+    today = date.today()
+    end_of_period = today + timedelta(days=period)
+    contacts = await db.execute(select(Contact).filter(Contact.user_id == user.id))
+    birthdays_list = []
+    for contact in contacts.scalars().all():
+        if contact.birthday.month == 2 and contact.birthday.day == 29:
+            continue
+        next_birthday = contact.birthday.replace(year=today.year)
+        if next_birthday < today:
+            next_birthday = next_birthday.replace(year=today.year + 1)
+        if today <= next_birthday <= end_of_period:
+            birthdays_list.append(contact)
+    return birthdays_list
+
+
+async def peak_memory(call) -> float:
+    tracemalloc.start()
+    await call()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return peak / 2 ** 20
+
+
+async def main(contacts: int, period: int, repeat: int) -> None:
+    async with SessionLocal() as db:
+        user = await seed(db, contacts)
+        try:
+            calls = {
+                'python loop': lambda: python_loop(period, user, db),
+                'sql window': lambda: repository_contacts.birthdays(period, user, db),
+            }
+            for name, call in calls.items():
+                db.expunge_all()
+                print(f'{name:<40} peak {await peak_memory(call):9.2f} MiB')
+                report(name, await measure(call, repeat))
+        finally:
+            await unseed(db)
+    await engine.dispose()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--contacts', type=int, default=100_000)
+    parser.add_argument('--period', type=int, default=7)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+    asyncio.run(main(args.contacts, args.period, args.repeat))
@@ -0,0 +1,55 @@
+"""
+Latency of ``GET /api/contacts/changes`` after a handful of edits, for address books of growing size.
+
+A client without the feed downloads the whole book to find what changed. With a sync token only the changed
+rows and the tombstones are read through the (user_id, change_xid, change_seq) indexes, so the delta does not depend on
+the size of the book.
+
+Usage::
+
+    python -m benchmarks.bench_change_feed --sizes 1000 10000 100000 --changes 10
+"""
+import argparse
+import asyncio
+
+from sqlalchemy import text
+
+from benchmarks.utils import measure, report, seed, unseed
+from src.database.db import SessionLocal, engine
+from src.repository import contacts as repository_contacts
+
+EDIT_CONTACTS = text("""
+    UPDATE contacts SET notes = ARRAY['edited']
+    WHERE id IN (SELECT id FROM contacts WHERE user_id = :user_id ORDER BY id DESC LIMIT :changes)
+""")
+
+DELETE_CONTACTS = text("""
+    DELETE FROM contacts WHERE id IN (SELECT id FROM contacts WHERE user_id = :user_id ORDER BY id LIMIT :changes)
+""")
+
+
+async def main(sizes: list[int], changes: int, repeat: int) -> None:
+    async with SessionLocal() as db:
+        for size in sizes:
+            user = await seed(db, size)
+            try:
+                report(f'{size} contacts, full download', await measure(
+                    lambda: repository_contacts.read_changes((0, 0), size, user, db), max(repeat // 10, 2)))
+                _, _, since, _ = await repository_contacts.read_changes((0, 0), size, user, db)
+                await db.execute(EDIT_CONTACTS, {'user_id': user.id, 'changes': changes})
+                await db.execute(DELETE_CONTACTS, {'user_id': user.id, 'changes': changes})
+                await db.commit()
+                report(f'{size} contacts, {2 * changes} changes', await measure(
+                    lambda: repository_contacts.read_changes(since, 1000, user, db), repeat))
+            finally:
+                await unseed(db)
+    await engine.dispose()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10_000, 100_000])
+    parser.add_argument('--changes', type=int, default=10)
+    parser.add_argument('--repeat', type=int, default=50)
+    args = parser.parse_args()
+    asyncio.run(main(args.sizes, args.changes, args.repeat))
@@ -0,0 +1,66 @@
+"""
+Bytes sent and server time of an unchanged poll of ``GET /api/contacts``, with and without If-None-Match.
+
+Without a validator every poll reads the full rows and sends the whole JSON page. With the ETag of the
+previous poll only the IDs and update times are read, from the (user_id, id) index, and a 304 without a
+body is sent. Both paths skip the Redis response cache, as after a write by another client.
+
+Usage::
+
+    python -m benchmarks.bench_conditional_get --contacts 100000 --limit 100
+"""
+import argparse
+import asyncio
+
+from sqlalchemy import text
+
+from benchmarks.utils import measure, report, seed, unseed
+from src.database.db import SessionLocal, engine
+from src.repository import contacts as repository_contacts
+from src.routes.contacts import CONTACT_FIELDS, page_headers
+from src.services.etag import etag_matches
+from src.services.response_cache import render_rows
+
+SEED_NOTES = text("""
+    UPDATE contacts SET notes = ARRAY['met at conference ' || (id % 97), 'call back on monday']
+    WHERE user_id = :user_id
+""")
+
+
+async def main(contacts: int, limit: int, repeat: int) -> None:
+    async with SessionLocal() as db:
+        user = await seed(db, contacts)
+        try:
+            await db.execute(SEED_NOTES, {'user_id': user.id})
+            await db.commit()
+            # VACUUM sets the visibility map, without it the index-only scan still visits the heap.
+            async with engine.connect() as conn:
+                await conn.execution_options(isolation_level='AUTOCOMMIT')
+                await conn.execute(text('VACUUM ANALYZE contacts'))
+            middle = await repository_contacts.read_contacts(contacts // 2, 1, user, db)
+            for name, after in (('first page', None), ('cursor page', middle[0].id)):
+
+                async def full():
+                    page = await repository_contacts.read_contacts(0, limit, user, db, after=after)
+                    return render_rows(page, CONTACT_FIELDS), page_headers(page, limit)
+
+                body, headers = await full()
+
+                async def conditional():
+                    versions = await repository_contacts.read_contact_versions(0, limit, user, db, after=after)
+                    assert etag_matches(headers['ETag'], page_headers(versions, limit)['ETag'])
+
+                report(f'{name}, 200 ({len(body)} bytes)', await measure(full, repeat))
+                report(f'{name}, 304 (0 bytes)', await measure(conditional, repeat))
+        finally:
+            await unseed(db)
+    await engine.dispose()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--contacts', type=int, default=100_000)
+    parser.add_argument('--limit', type=int, default=100)
+    parser.add_argument('--repeat', type=int, default=100)
+    args = parser.parse_args()
+    asyncio.run(main(args.contacts, args.limit, args.repeat))
@@ -0,0 +1,58 @@
+"""
+p95 latency of the read endpoints' repository calls with and without the per-user contact indexes.
+
+Seeds ``--contacts`` rows (1M by default) over ``--users`` users, then measures ``read_contacts``,
+``read_contact``, ``search_contact`` and ``birthdays`` for one user. The "without" run drops the indexes
+inside a transaction that is rolled back afterwards, so the schema is left untouched.
+
+Usage::
+
+    python -m benchmarks.bench_contact_indexes --contacts 1000000 --users 1000
+"""
+import argparse
+import asyncio
+
+from sqlalchemy import text
+
+from benchmarks.utils import measure, report, seed, unseed
+from src.database.db import SessionLocal, engine
+from src.database.models import Contact
+from src.repository import contacts as repository_contacts
+
+INDEXES = [index.name for index in Contact.__table__.indexes if index.name.startswith('ix_contacts_user_id')]
+
+
+async def run_endpoints(db, user, repeat: int, label: str) -> None:
+    contact = (await repository_contacts.read_contacts(0, 1, user, db))[0]
+    calls = {
+        'read_contacts': lambda: repository_contacts.read_contacts(0, 100, user, db),
+        'read_contact': lambda: repository_contacts.read_contact(contact.id, user, db),
+        'search_contact': lambda: repository_contacts.search_contact(contact.last_name, 0, 100, user, db),
+        'birthdays': lambda: repository_contacts.birthdays(7, user, db),
+    }
+    print(f'--- {label}')
+    for name, call in calls.items():
+        report(name, await measure(call, repeat))
+
+
+async def main(contacts: int, users: int, repeat: int) -> None:
+    async with SessionLocal() as db:
+        user = await seed(db, contacts, users)
+        try:
+            await run_endpoints(db, user, repeat, 'with indexes')
+            for name in INDEXES:
+                await db.execute(text(f'DROP INDEX {name}'))
+            await run_endpoints(db, user, repeat, 'without indexes')
+            await db.rollback()
+        finally:
+            await unseed(db)
+    await engine.dispose()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--contacts', type=int, default=1_000_000)
+    parser.add_argument('--users', type=int, default=1000)
+    parser.add_argument('--repeat', type=int, default=50)
+    args = parser.parse_args()
+    asyncio.run(main(args.contacts, args.users, args.repeat))
@@ -0,0 +1,65 @@
+"""
+Throughput of rendering the confirmation email for a batch of recipients.
+
+Compares the paths a batch can take:
+
+* ``fastapi_mail``: a template environment per message, like ``FastMail.send_message`` with ``template_name``.
+* ``jinja``: the template compiled once, rendered by Jinja for every recipient.
+* ``static parts``: the template compiled once, the static parts joined with the escaped values.
+* ``messages``: ``confirmation_messages``, static parts plus the email token and the MessageSchema.
+
+Every sample renders ``--messages`` emails, the messages per second are computed from the median sample.
+
+Usage::
+
+    python -m benchmarks.bench_email_render --messages 1000
+"""
+import argparse
+import asyncio
+
+from benchmarks.utils import measure, percentile, report
+from src.services.email import conf, confirmation_messages
+from src.services.email_templates import email_templates
+
+TEMPLATE = 'email_template.html'
+HOST = 'http://localhost:8000/'
+
+
+async def main(messages: int, repeat: int) -> None:
+    recipients = [(f'bench{i}@example.com', f'bench{i}', HOST) for i in range(messages)]
+    token = 'eyJhbGciOiJIUzI1NiIsInR5cCI6IkpXVCJ9.e30.c2lnbmF0dXJl'
+    contexts = [{'host': HOST, 'username': username, 'token': token} for _, username, _ in recipients]
+    template = email_templates.templates[TEMPLATE]
+
+    def fastapi_mail():
+        for context in contexts:
+            conf.template_engine().get_template(TEMPLATE).render(**context)
+
+    def jinja():
+        for context in contexts:
+            template.template.render(**context)
+
+    assert template.parts is not None
+    assert email_templates.render_batch(TEMPLATE, contexts) == [template.template.render(**c) for c in contexts]
+    paths = {
+        'fastapi_mail': fastapi_mail,
+        'jinja': jinja,
+        'static parts': lambda: email_templates.render_batch(TEMPLATE, contexts),
+        'messages': lambda: confirmation_messages(recipients),
+    }
+    print(f'--- {messages} messages per sample')
+    for name, render in paths.items():
+        async def call():
+            render()
+
+        samples = await measure(call, repeat)
+        report(name, samples)
+        print(f'{"":<40} {messages / percentile(samples, 50) * 1000:,.0f} messages per second')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--messages', type=int, default=1000)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+    asyncio.run(main(args.messages, args.repeat))
@@ -0,0 +1,48 @@
+"""
+Rows per second and peak RSS of streaming a user's contacts with ``GET /api/contacts/export``.
+
+Usage::
+
+    python -m benchmarks.bench_export --contacts 1000000 --format ndjson
+"""
+import argparse
+import asyncio
+import resource
+import time
+
+from benchmarks.utils import seed, unseed
+from src.database.db import SessionLocal, engine
+from src.repository import contacts as repository_contacts
+from src.services.contacts_io import render_contacts
+
+
+def peak_rss_mib() -> float:
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+async def main(contacts: int, file_format: str) -> None:
+    async with SessionLocal() as db:
+        user = await seed(db, contacts)
+    try:
+        rss_before = peak_rss_mib()
+        start = time.perf_counter()
+        size = 0
+        async with SessionLocal() as db:
+            async for chunk in render_contacts(repository_contacts.stream_contacts(user, db), file_format):
+                size += len(chunk)
+        elapsed = time.perf_counter() - start
+        print(f'{contacts} rows, {size / 2 ** 20:.1f} MiB {file_format} in {elapsed:.2f} s: '
+              f'{contacts / elapsed:,.0f} rows/s')
+        print(f'peak RSS {peak_rss_mib():.1f} MiB (before export {rss_before:.1f} MiB)')
+    finally:
+        async with SessionLocal() as db:
+            await unseed(db)
+        await engine.dispose()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--contacts', type=int, default=1_000_000)
+    parser.add_argument('--format', choices=['csv', 'ndjson'], default='ndjson')
+    args = parser.parse_args()
+    asyncio.run(main(args.contacts, args.format))
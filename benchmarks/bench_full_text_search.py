@@ -0,0 +1,52 @@
+"""
+Latency of ``GET /api/contacts/search?q=`` for a user with 100k contacts, among other users with as many.
+
+Every contact of the measured user gets two notes. The queries go from a name that matches a handful of
+contacts to a note word that matches a quarter of them; every matching row has to be ranked before the
+first page is known, so the broad queries are the slow ones.
+
+Usage::
+
+    python -m benchmarks.bench_full_text_search --contacts 100000 --users 3
+"""
+import argparse
+import asyncio
+
+from sqlalchemy import text
+
+from benchmarks.utils import measure, report, seed, unseed
+from src.database.db import SessionLocal, engine
+from src.repository import contacts as repository_contacts
+
+SEED_NOTES = text("""
+    UPDATE contacts SET notes = ARRAY['met at conference ' || (id % 97),
+                                      'likes ' || (ARRAY['tea', 'coffee', 'chess', 'jazz'])[id % 4 + 1]]
+    WHERE user_id = :user_id
+""")
+
+QUERIES = ('first42', 'first42 last99', 'contact12345@example.com', '"conference 13"', 'jazz first42', 'coffee')
+
+
+async def main(contacts: int, users: int, repeat: int) -> None:
+    async with SessionLocal() as db:
+        user = await seed(db, contacts * users, users)
+        try:
+            await db.execute(SEED_NOTES, {'user_id': user.id})
+            await db.commit()
+            await db.execute(text('ANALYZE contacts'))
+            for query in QUERIES:
+                rows = await repository_contacts.search_contacts_text(query, 0, 20, user, db)
+                report(f'q={query!r} ({len(rows)} rows)', await measure(
+                    lambda: repository_contacts.search_contacts_text(query, 0, 20, user, db), repeat))
+        finally:
+            await unseed(db)
+    await engine.dispose()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--contacts', type=int, default=100_000, help='contacts per user')
+    parser.add_argument('--users', type=int, default=3)
+    parser.add_argument('--repeat', type=int, default=50)
+    args = parser.parse_args()
+    asyncio.run(main(args.contacts, args.users, args.repeat))
@@ -0,0 +1,93 @@
+"""
+Time to turn one page of contacts into the JSON body of ``GET /api/contacts``.
+
+Compares the paths a page can take:
+
+* ``fastapi default``: ORM objects, validated by the response model, dumped to Python and encoded with json.
+* ``type adapter``: ORM objects, validated once by a TypeAdapter and dumped to bytes by pydantic-core.
+* ``rows + orjson``: Row tuples of the response columns, zipped with the field names and dumped by orjson.
+
+Each path is measured for the serialization alone and together with the query that feeds it, the ORM query
+also pays for hydrating and tracking the Contact objects in the session.
+
+Usage::
+
+    python -m benchmarks.bench_json_render --contacts 10000 --limit 100
+"""
+import argparse
+import asyncio
+import json
+from typing import List
+
+from pydantic import TypeAdapter
+from sqlalchemy import select, text
+
+from benchmarks.utils import measure, report, seed, unseed
+from src.database.db import SessionLocal, engine
+from src.database.models import Contact
+from src.repository import contacts as repository_contacts
+from src.routes.contacts import CONTACT_FIELDS
+from src.schemas import ContactResponse
+from src.services.response_cache import render, render_rows
+
+SEED_NOTES = text("""
+    UPDATE contacts SET notes = ARRAY['met at conference ' || (id % 97), 'call back on monday']
+    WHERE user_id = :user_id
+""")
+
+CONTACTS = TypeAdapter(List[ContactResponse])
+
+
+def fastapi_default(contacts: list[Contact]) -> bytes:
+    # What FastAPI does for response_model=List[ContactResponse] without a Response class of its own.
+    content = CONTACTS.dump_python(CONTACTS.validate_python(contacts, from_attributes=True), mode='json')
+    return json.dumps(content, ensure_ascii=False, allow_nan=False, separators=(',', ':')).encode('utf-8')
+
+
+async def main(contacts: int, limit: int, repeat: int) -> None:
+    async with SessionLocal() as db:
+        user = await seed(db, contacts)
+        try:
+            await db.execute(SEED_NOTES, {'user_id': user.id})
+            await db.commit()
+
+            async def read_orm():
+                page = await db.execute(select(Contact).filter(Contact.user_id == user.id)
+                                        .order_by(Contact.id).limit(limit))
+                return page.scalars().all()
+
+            async def read_rows():
+                return await repository_contacts.read_contacts(0, limit, user, db)
+
+            objects, rows = await read_orm(), await read_rows()
+            assert fastapi_default(objects) == render(CONTACTS, objects) == render_rows(rows, CONTACT_FIELDS)
+            paths = {
+                'fastapi default': (read_orm, fastapi_default),
+                'type adapter': (read_orm, lambda page: render(CONTACTS, page)),
+                'rows + orjson': (read_rows, lambda page: render_rows(page, CONTACT_FIELDS)),
+            }
+            print(f'--- {limit} contacts per page')
+            for name, (read, serialize) in paths.items():
+                page = await read()
+
+                async def serialize_only():
+                    serialize(page)
+
+                async def query_and_serialize():
+                    db.expunge_all()
+                    serialize(await read())
+
+                report(f'{name}, serialize', await measure(serialize_only, repeat))
+                report(f'{name}, query + serialize', await measure(query_and_serialize, repeat))
+        finally:
+            await unseed(db)
+    await engine.dispose()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--contacts', type=int, default=10_000)
+    parser.add_argument('--limit', type=int, default=100)
+    parser.add_argument('--repeat', type=int, default=200)
+    args = parser.parse_args()
+    asyncio.run(main(args.contacts, args.limit, args.repeat))
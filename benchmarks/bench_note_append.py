@@ -0,0 +1,59 @@
+"""
+Latency of adding one note to a contact that already has N notes.
+
+``PATCH /api/contacts/{id}`` needs the client to read the whole array, add the note and send the whole array
+back. ``POST /api/contacts/{id}/notes`` appends on the server with ``array_append`` and only returns the count.
+Postgres still writes a new version of the array on every update, so both grow with N, the append path
+saves the read and the two transfers of the array.
+
+Usage::
+
+    python -m benchmarks.bench_note_append --sizes 0 100 1000 10000 --repeat 50
+"""
+import argparse
+import asyncio
+
+from sqlalchemy import select, text
+
+from benchmarks.utils import measure, report, seed, unseed
+from src.database.db import SessionLocal, engine
+from src.database.models import Contact
+from src.repository import contacts as repository_contacts
+from src.schemas import NotesContact
+
+FILL_NOTES = text("""
+    UPDATE contacts SET notes = ARRAY(SELECT 'note number ' || g FROM generate_series(1, :size) AS g)
+    WHERE id = :id
+""")
+
+
+async def main(sizes: list[int], repeat: int) -> None:
+    async with SessionLocal() as db:
+        user = await seed(db, 1)
+        try:
+            contact_id = await db.scalar(select(Contact.id).filter(Contact.user_id == user.id))
+
+            async def rewrite():
+                contact = await repository_contacts.read_contact(contact_id, user, db)
+                notes = NotesContact(notes=[*(contact.notes or []), 'bench'])
+                await repository_contacts.add_note(contact_id, notes, user, db)
+
+            async def append():
+                await repository_contacts.append_note(contact_id, 'bench', user, db)
+
+            for size in sizes:
+                for name, call in (('PATCH full array', rewrite), ('POST array_append', append)):
+                    await db.execute(FILL_NOTES, {'size': size, 'id': contact_id})
+                    await db.commit()
+                    report(f'{name}, {size} notes', await measure(call, repeat))
+        finally:
+            await unseed(db)
+    await engine.dispose()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[0, 100, 1000, 10000])
+    parser.add_argument('--repeat', type=int, default=50)
+    args = parser.parse_args()
+    asyncio.run(main(args.sizes, args.repeat))
@@ -0,0 +1,43 @@
+"""
+Latency of reading page 1 and page 10,000 of ``GET /api/contacts`` in offset and cursor mode.
+
+Usage::
+
+    python -m benchmarks.bench_pagination --contacts 1000000 --limit 10
+"""
+import argparse
+import asyncio
+
+from benchmarks.utils import measure, report, seed, unseed
+from src.database.db import SessionLocal, engine
+from src.repository import contacts as repository_contacts
+
+
+async def main(contacts: int, page: int, limit: int, repeat: int) -> None:
+    async with SessionLocal() as db:
+        user = await seed(db, contacts)
+        try:
+            skip = (page - 1) * limit
+            previous = await repository_contacts.read_contacts(skip - 1, 1, user, db)
+            after = previous[0].id
+            report('offset page 1', await measure(
+                lambda: repository_contacts.read_contacts(0, limit, user, db), repeat))
+            report(f'offset page {page}', await measure(
+                lambda: repository_contacts.read_contacts(skip, limit, user, db), repeat))
+            report('cursor page 1', await measure(
+                lambda: repository_contacts.read_contacts(0, limit, user, db, after=0), repeat))
+            report(f'cursor page {page}', await measure(
+                lambda: repository_contacts.read_contacts(0, limit, user, db, after=after), repeat))
+        finally:
+            await unseed(db)
+    await engine.dispose()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--contacts', type=int, default=1_000_000)
+    parser.add_argument('--page', type=int, default=10_000)
+    parser.add_argument('--limit', type=int, default=10)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+    asyncio.run(main(args.contacts, args.page, args.limit, args.repeat))
@@ -0,0 +1,53 @@
+"""
+Latency of concurrent contact reads during a login spike, bcrypt on the event loop versus the hashing pool.
+
+Reads arrive every ``--interval`` seconds during the spike and are simulated by a coroutine awaiting a short
+I/O wait, like a cached contact read does. Their latency is counted from the arrival time.
+
+Usage::
+
+    python -m benchmarks.bench_password_hashing --logins 32 --reads 500
+"""
+import argparse
+import asyncio
+import time
+
+from benchmarks.utils import percentile
+from src.services.auth import auth_service
+
+
+async def spike(verify, password_hash: str, logins: int, reads: int, interval: float) -> tuple[float, list[float]]:
+    start = time.perf_counter()
+
+    async def login():
+        await verify('secret', password_hash)
+
+    async def read(arrival: float):
+        await asyncio.sleep(max(arrival - time.perf_counter(), 0))
+        await asyncio.sleep(0.001)
+        return (time.perf_counter() - arrival) * 1000
+
+    results = await asyncio.gather(*(login() for _ in range(logins)),
+                                   *(read(start + i * interval) for i in range(reads)))
+    return time.perf_counter() - start, [latency for latency in results if latency is not None]
+
+
+async def main(logins: int, reads: int, interval: float) -> None:
+    password_hash = await auth_service.get_password_hash('secret')
+
+    async def on_event_loop(plain, hashed):
+        return auth_service._pwd_context.verify(plain, hashed)
+
+    for name, verify in (('bcrypt on event loop', on_event_loop), ('bcrypt in pool', auth_service.verify_password)):
+        elapsed, latencies = await spike(verify, password_hash, logins, reads, interval)
+        print(f'{name:<24} logins {logins / elapsed:7.1f}/s   read p50 {percentile(latencies, 50):8.2f} ms'
+              f'   p95 {percentile(latencies, 95):8.2f} ms')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--logins', type=int, default=32)
+    parser.add_argument('--reads', type=int, default=500)
+    parser.add_argument('--interval', type=float, default=0.005)
+    args = parser.parse_args()
+    asyncio.run(main(args.logins, args.reads, args.interval))
@@ -0,0 +1,70 @@
+"""
+Overhead of the rate limit middleware per request, with a Redis round trip per request and with leased tokens.
+
+``batch 1`` asks Redis on every request, like the per-route fastapi_limiter dependency did with its Lua script.
+Larger batches lease that many tokens at once and decide the rest of the requests in the worker. Every sample
+sends ``--requests`` requests of ``--clients`` clients through the middleware to an empty ASGI app, the quota
+is high enough that no request is rejected.
+
+Usage::
+
+    python -m benchmarks.bench_rate_limit --requests 100 --clients 10 --batch 1 10 50
+"""
+import argparse
+import asyncio
+from types import SimpleNamespace
+
+from benchmarks.utils import measure, report
+from src.database.redis_pool import create_redis
+from src.services.rate_limit import RateLimiter, RateLimitMiddleware
+
+PREFIX = '/bench'
+
+
+async def empty_app(scope, receive, send) -> None:
+    await send({'type': 'http.response.start', 'status': 200, 'headers': []})
+    await send({'type': 'http.response.body', 'body': b''})
+
+
+async def receive() -> dict:
+    return {'type': 'http.request', 'body': b''}
+
+
+async def send(message: dict) -> None:
+    pass
+
+
+async def main(requests: int, clients: int, batches: list[int], repeat: int) -> None:
+    r = create_redis()
+    app = SimpleNamespace(state=SimpleNamespace(redis=r))
+    scopes = [{'type': 'http', 'method': 'GET', 'path': f'{PREFIX}/contacts', 'headers': [],
+               'client': (f'10.0.0.{client}', 50000), 'app': app} for client in range(clients)]
+
+    def sample(handler):
+        async def call():
+            for i in range(requests):
+                await handler(scopes[i % clients], receive, send)
+        return call
+
+    try:
+        report(f'no limiter, {requests} requests', await measure(sample(empty_app), repeat))
+        for batch in batches:
+            limiter = RateLimiter({PREFIX: '1000000000/60'}, {}, batch)
+            middleware = RateLimitMiddleware(empty_app, limiter)
+            report(f'batch {batch}, {requests} requests', await measure(sample(middleware), repeat))
+            stats = limiter.stats()
+            print(f'{"":<40} {stats["leases"] / stats["allowed"]:.2f} Redis round trips per request')
+    finally:
+        async for key in r.scan_iter(match=f'ratelimit:{PREFIX}:*'):
+            await r.delete(key)
+        await r.aclose()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--requests', type=int, default=100)
+    parser.add_argument('--clients', type=int, default=10)
+    parser.add_argument('--batch', type=int, nargs='+', default=[1, 10, 50])
+    parser.add_argument('--repeat', type=int, default=50)
+    args = parser.parse_args()
+    asyncio.run(main(args.requests, args.clients, args.batch, args.repeat))
@@ -0,0 +1,48 @@
+"""
+Latency of ``search_contact`` for a user with 100k contacts.
+
+Compares the single index-backed prefix query with the former approach of three exact-match queries
+merged and deduplicated in Python.
+
+Usage::
+
+    python -m benchmarks.bench_search_contact --contacts 100000
+"""
+import argparse
+import asyncio
+
+from sqlalchemy import and_, select
+
+from benchmarks.utils import measure, report, seed, unseed
+from src.database.db import SessionLocal, engine
+from src.database.models import Contact
+from src.repository import contacts as repository_contacts
+
+
+async def three_queries(info, user, db):
+    contacts = []
+    for column in (Contact.first_name, Contact.last_name, Contact.email):
+        result = await db.execute(select(Contact).filter(and_(Contact.user_id == user.id, column == info)))
+        contacts += result.scalars().all()
+    return list(set(contacts))
+
+
+async def main(contacts: int, repeat: int) -> None:
+    async with SessionLocal() as db:
+        user = await seed(db, contacts)
+        try:
+            for term in ('last4217', 'First1', 'contact12345'):
+                report(f'three exact queries {term!r}', await measure(lambda: three_queries(term, user, db), repeat))
+                report(f'single prefix query {term!r}', await measure(
+                    lambda: repository_contacts.search_contact(term, 0, 100, user, db), repeat))
+        finally:
+            await unseed(db)
+    await engine.dispose()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--contacts', type=int, default=100_000)
+    parser.add_argument('--repeat', type=int, default=50)
+    args = parser.parse_args()
+    asyncio.run(main(args.contacts, args.repeat))
@@ -0,0 +1,39 @@
+"""
+Encode/decode cost and size of one ``user:{email}`` cache entry, pickled ORM user versus the compact format.
+
+Usage::
+
+    python -m benchmarks.bench_user_cache --number 100000
+"""
+import argparse
+import pickle
+import timeit
+from datetime import datetime
+
+from src.database.models import User
+from src.services.cache import CachedUser, encode_user, decode_user
+
+
+def main(number: int) -> None:
+    user = User(id=42, username='deadpool', email='deadpool@example.com',
+                password='$2b$12$' + 'x' * 53, created_at=datetime.now(),
+                avatar='https://res.cloudinary.com/demo/image/upload/c_fill,h_250,w_250/v1/NotesApp/deadpool',
+                refresh_token='x' * 180, confirmed=True)
+    cached = CachedUser.from_user(user)
+    pickled = pickle.dumps(user)
+    compact = encode_user(cached)
+    rows = [
+        ('pickle', len(pickled), lambda: pickle.dumps(user), lambda: pickle.loads(pickled)),
+        ('compact', len(compact), lambda: encode_user(cached), lambda: decode_user(compact)),
+    ]
+    for name, size, encode, decode in rows:
+        encode_us = timeit.timeit(encode, number=number) / number * 1e6
+        decode_us = timeit.timeit(decode, number=number) / number * 1e6
+        print(f'{name:<10} {size:6d} bytes   encode {encode_us:7.2f} us   decode {decode_us:7.2f} us')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--number', type=int, default=100_000)
+    args = parser.parse_args()
+    main(args.number)
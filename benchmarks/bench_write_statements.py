@@ -0,0 +1,137 @@
+"""
+Statements sent to the database per write endpoint, fetch-then-mutate versus ``... RETURNING``.
+
+The previous repository functions loaded the row with ``SELECT`` and then flushed the change, ``create_contact``
+reloaded the inserted row with ``db.refresh``. Every statement and the ``COMMIT`` is one round trip, so the
+count printed here is the number of network hops the endpoint pays before it can answer.
+
+Usage::
+
+    python -m benchmarks.bench_write_statements --repeat 200
+"""
+import argparse
+import asyncio
+from datetime import date
+from itertools import count as counter
+
+from sqlalchemy import and_, event, select
+
+from benchmarks.utils import measure, report, seed, unseed
+from src.database.db import SessionLocal, engine
+from src.database.models import Contact
+from src.repository import contacts as repository_contacts
+from src.schemas import ContactModel, NotesContact
+
+SEQUENCE = counter()
+
+
+def body() -> ContactModel:
+    # A fresh value every call, otherwise the old flow finds nothing to flush and skips its UPDATE.
+    return ContactModel(first_name=f'Bench{next(SEQUENCE)}', last_name='Write', email='bench.write@example.com',
+                        phone_number='+380501234567', birthday=date(1990, 1, 1))
+
+
+def notes() -> NotesContact:
+    return NotesContact(notes=[f'bench{next(SEQUENCE)}'])
+
+
+# asyncpg sends BEGIN and COMMIT as round trips of their own, so they are counted next to the statements.
+EVENTS = ('begin', 'before_cursor_execute', 'commit')
+
+
+class StatementCounter:
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, *args):
+        self.count += 1
+
+    def __enter__(self):
+        for name in EVENTS:
+            event.listen(engine.sync_engine, name, self)
+        return self
+
+    def __exit__(self, *args):
+        for name in EVENTS:
+            event.remove(engine.sync_engine, name, self)
+
+
+async def fetch_contact(contact_id, user, db):
+    contact = await db.execute(select(Contact).filter(and_(Contact.user_id == user.id, Contact.id == contact_id)))
+    return contact.scalars().first()
+
+
+async def old_create_contact(body, user, db):
+    contact = Contact(**body.model_dump(), user_id=user.id)
+    db.add(contact)
+    await db.commit()
+    await db.refresh(contact)
+    return contact
+
+
+async def old_update_contact(contact_id, body, user, db):
+    contact = await fetch_contact(contact_id, user, db)
+    if contact:
+        for key, value in body.model_dump().items():
+            setattr(contact, key, value)
+        await db.commit()
+    return contact
+
+
+async def old_add_note(contact_id, body, user, db):
+    contact = await fetch_contact(contact_id, user, db)
+    if contact:
+        contact.notes = body.notes
+        await db.commit()
+    return contact
+
+
+async def old_remove_contact(contact_id, user, db):
+    contact = await fetch_contact(contact_id, user, db)
+    if contact:
+        await db.delete(contact)
+        await db.commit()
+    return contact
+
+
+async def count(call, db) -> int:
+    # Every request starts on a fresh session, so a transaction left open by the previous call is not reused.
+    await db.commit()
+    with StatementCounter() as statements:
+        await call()
+    return statements.count
+
+
+async def main(repeat: int) -> None:
+    async with SessionLocal() as db:
+        user = await seed(db, 1000)
+        try:
+            flows = {
+                'old': (old_create_contact, old_update_contact, old_add_note, old_remove_contact),
+                'new': (repository_contacts.create_contact, repository_contacts.update_contact,
+                        repository_contacts.add_note, repository_contacts.remove_contact),
+            }
+            for name, (create, update, note, remove) in flows.items():
+                contact = await create(body(), user, db)
+                endpoints = {
+                    'POST   /api/contacts/': lambda: create(body(), user, db),
+                    'PUT    /api/contacts/{id}': lambda: update(contact.id, body(), user, db),
+                    'PATCH  /api/contacts/{id}': lambda: note(contact.id, notes(), user, db),
+                    'DELETE /api/contacts/{id}': lambda: remove(contact.id, user, db),
+                }
+                for endpoint, call in endpoints.items():
+                    print(f'{name} {endpoint:<30}: {await count(call, db)} round trips')
+            for name, (create, update, note, remove) in flows.items():
+                contact = await create(body(), user, db)
+                report(f'{name} update', await measure(lambda: update(contact.id, body(), user, db), repeat))
+                report(f'{name} note', await measure(lambda: note(contact.id, notes(), user, db), repeat))
+        finally:
+            await unseed(db)
+    await engine.dispose()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repeat', type=int, default=200)
+    args = parser.parse_args()
+    asyncio.run(main(args.repeat))
@@ -0,0 +1,65 @@
+"""
+Helpers shared by the benchmark scripts.
+"""
+import statistics
+import time
+from typing import Awaitable, Callable
+
+from sqlalchemy import select, text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.database.models import User
+
+SEED_USERS = text("""
+    INSERT INTO users (username, email, password, confirmed)
+    SELECT 'bench' || g, 'bench' || g || '@example.com', 'not a hash', true
+    FROM generate_series(1, :users) AS g
+    ON CONFLICT (email) DO NOTHING
+""")
+
+SEED_CONTACTS = text("""
+    INSERT INTO contacts (first_name, last_name, email, phone_number, birthday, user_id)
+    SELECT 'first' || (g % 5003), 'last' || (g % 7919), 'contact' || g || '@example.com',
+           '+380' || lpad(g::text, 9, '0'), date '1950-01-01' + (g * 37 % 20000), u.id
+    FROM generate_series(1, :contacts) AS g
+    JOIN users AS u ON u.email = 'bench' || (g % :users + 1) || '@example.com'
+""")
+
+
+async def seed(db: AsyncSession, contacts: int, users: int = 1) -> User:
+    """
+    Seeds ``contacts`` rows spread evenly over ``users`` bench users and returns the first of them.
+    """
+    await db.execute(SEED_USERS, {'users': users})
+    await db.execute(SEED_CONTACTS, {'contacts': contacts, 'users': users})
+    await db.commit()
+    await db.execute(text('ANALYZE contacts'))
+    user = await db.execute(select(User).filter(User.email == 'bench1@example.com'))
+    return user.scalars().first()
+
+
+async def unseed(db: AsyncSession) -> None:
+    await db.execute(text("DELETE FROM users WHERE email LIKE 'bench%@example.com'"))
+    # Deleting the contacts wrote tombstones of users that no longer exist.
+    await db.execute(text('DELETE FROM contact_tombstones WHERE user_id NOT IN (SELECT id FROM users)'))
+    await db.commit()
+
+
+def percentile(samples: list[float], pct: float) -> float:
+    return statistics.quantiles(samples, n=100, method='inclusive')[int(pct) - 1]
+
+
+async def measure(call: Callable[[], Awaitable], repeat: int) -> list[float]:
+    """
+    Awaits ``call`` ``repeat`` times and returns the latencies in milliseconds.
+    """
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        await call()
+        samples.append((time.perf_counter() - start) * 1000)
+    return samples
+
+
+def report(name: str, samples: list[float]) -> None:
+    print(f'{name:<40} p50 {percentile(samples, 50):9.2f} ms   p95 {percentile(samples, 95):9.2f} ms')
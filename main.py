@@ -1,16 +1,15 @@
-import redis.asyncio as redis
+import asyncio
 import uvicorn
-from fastapi import Depends, FastAPI
+from fastapi import FastAPI
 
 from fastapi.middleware.cors import CORSMiddleware
 
-from fastapi_limiter import FastAPILimiter
-from fastapi_limiter.depends import RateLimiter
+from src.routes import contacts, auth, users, metrics
+from src.database.redis_pool import create_redis
+from src.services.auth import auth_service
+from src.services.rate_limit import RateLimitMiddleware, rate_limiter
 
-from src.routes import contacts, auth, users
-from src.conf.config import settings
-
-from contextlib import asynccontextmanager
+from contextlib import asynccontextmanager, suppress
 
 
 @asynccontextmanager
@@ -23,13 +22,13 @@ async def lifespan(app: FastAPI):
     """
 
     print('start app')
-    r = await redis.Redis(host=settings.redis_host,
-                          port=settings.redis_port,
-                          db=0,
-                          encoding="utf-8",
-                          decode_responses=True)
-    await FastAPILimiter.init(r)
+    app.state.redis = create_redis()
+    invalidations = asyncio.create_task(auth_service.listen_user_invalidations(app.state.redis))
     yield
+    invalidations.cancel()
+    with suppress(asyncio.CancelledError):
+        await invalidations
+    await app.state.redis.aclose()
     print('stop app')
 
 
@@ -38,22 +37,27 @@ app = FastAPI(lifespan=lifespan)
 app.include_router(contacts.router, prefix='/api')
 app.include_router(auth.router, prefix='/api')
 app.include_router(users.router, prefix='/api')
+app.include_router(metrics.router, prefix='/api')
 
 
 origins = [
     "http://localhost:3000",
 ]
 
+app.add_middleware(RateLimitMiddleware, limiter=rate_limiter)
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=origins,
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "ETag", "RateLimit-Limit", "RateLimit-Remaining", "RateLimit-Reset",
+                    "RateLimit-Policy", "Retry-After"],
 )
 
 
-@app.get('/', dependencies=[Depends(RateLimiter(times=2, seconds=5))])
+@app.get('/')
 def read_root():
     """
     Retrieves nothing
@@ -0,0 +1,31 @@
+"""Contacts updated_at column
+
+Revision ID: 1d7b4e92a6f0
+Revises: e5a0f3b71c28
+Create Date: 2026-10-17 23:48:12.730914
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '1d7b4e92a6f0'
+down_revision: Union[str, None] = 'e5a0f3b71c28'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('contacts', sa.Column('updated_at', sa.DateTime(), server_default=sa.text('now()'), nullable=False))
+    op.drop_index('ix_contacts_user_id_id', table_name='contacts')
+    op.create_index('ix_contacts_user_id_id', 'contacts', ['user_id', 'id'], unique=False,
+                    postgresql_include=['updated_at'])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_contacts_user_id_id', table_name='contacts', postgresql_include=['updated_at'])
+    op.create_index('ix_contacts_user_id_id', 'contacts', ['user_id', 'id'], unique=False)
+    op.drop_column('contacts', 'updated_at')
@@ -0,0 +1,35 @@
+"""Contacts per-user indexes
+
+Revision ID: 5b2e9c41f7a3
+Revises: d10a77ff2f9c
+Create Date: 2026-10-17 10:12:41.318204
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5b2e9c41f7a3'
+down_revision: Union[str, None] = 'd10a77ff2f9c'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index('ix_contacts_user_id_id', 'contacts', ['user_id', 'id'], unique=False)
+    op.create_index('ix_contacts_user_id_first_name', 'contacts', ['user_id', 'first_name'], unique=False)
+    op.create_index('ix_contacts_user_id_last_name', 'contacts', ['user_id', 'last_name'], unique=False)
+    op.create_index('ix_contacts_user_id_email', 'contacts', ['user_id', 'email'], unique=False)
+    op.create_index('ix_contacts_user_id_lower_last_name_lower_first_name', 'contacts',
+                    ['user_id', sa.text('lower(last_name)'), sa.text('lower(first_name)')], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_contacts_user_id_lower_last_name_lower_first_name', table_name='contacts')
+    op.drop_index('ix_contacts_user_id_email', table_name='contacts')
+    op.drop_index('ix_contacts_user_id_last_name', table_name='contacts')
+    op.drop_index('ix_contacts_user_id_first_name', table_name='contacts')
+    op.drop_index('ix_contacts_user_id_id', table_name='contacts')
@@ -0,0 +1,98 @@
+"""Contacts change sequence and tombstones
+
+Revision ID: 7a3c9d05e4b1
+Revises: 1d7b4e92a6f0
+Create Date: 2026-10-18 00:31:26.415027
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7a3c9d05e4b1'
+down_revision: Union[str, None] = '1d7b4e92a6f0'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.execute('CREATE SEQUENCE contacts_change_seq')
+    op.add_column('contacts', sa.Column('change_seq', sa.BigInteger(), nullable=True))
+    op.add_column('contacts', sa.Column('created_seq', sa.BigInteger(), nullable=True))
+    # Existing changes are final, transaction ID 0 keeps them in change_seq order before every new change.
+    op.add_column('contacts', sa.Column('change_xid', sa.BigInteger(), server_default='0', nullable=False))
+    op.add_column('contacts', sa.Column('created_xid', sa.BigInteger(), server_default='0', nullable=False))
+    op.alter_column('contacts', 'change_xid', server_default=None)
+    op.alter_column('contacts', 'created_xid', server_default=None)
+    op.execute("UPDATE contacts SET change_seq = nextval('contacts_change_seq')")
+    op.execute('UPDATE contacts SET created_seq = change_seq')
+    op.alter_column('contacts', 'change_seq', nullable=False)
+    op.alter_column('contacts', 'created_seq', nullable=False)
+    op.create_index('ix_contacts_user_id_change_xid_change_seq', 'contacts', ['user_id', 'change_xid', 'change_seq'],
+                    unique=False)
+    op.create_table('contact_tombstones',
+                    sa.Column('contact_id', sa.Integer(), autoincrement=False, nullable=False),
+                    sa.Column('user_id', sa.Integer(), nullable=False),
+                    sa.Column('change_seq', sa.BigInteger(), nullable=False),
+                    sa.Column('change_xid', sa.BigInteger(), nullable=False),
+                    sa.Column('deleted_at', sa.DateTime(), server_default=sa.text('now()'), nullable=False),
+                    sa.PrimaryKeyConstraint('contact_id'))
+    op.create_index('ix_contact_tombstones_user_id_change_xid_change_seq', 'contact_tombstones',
+                    ['user_id', 'change_xid', 'change_seq'], unique=False)
+    op.create_index('ix_contact_tombstones_deleted_at', 'contact_tombstones', ['deleted_at'], unique=False)
+    op.create_table('contact_tombstone_horizon',
+                    sa.Column('id', sa.Integer(), autoincrement=False, nullable=False),
+                    sa.Column('change_xid', sa.BigInteger(), nullable=False),
+                    sa.PrimaryKeyConstraint('id'))
+    op.execute("""
+        CREATE OR REPLACE FUNCTION contacts_change_seq_update() RETURNS trigger AS $$
+        BEGIN
+            NEW.change_seq := nextval('contacts_change_seq');
+            NEW.change_xid := pg_current_xact_id()::text::bigint;
+            IF TG_OP = 'INSERT' THEN
+                NEW.created_seq := NEW.change_seq;
+                NEW.created_xid := NEW.change_xid;
+            END IF;
+            RETURN NEW;
+        END
+        $$ LANGUAGE plpgsql
+    """)
+    op.execute("""
+        CREATE TRIGGER contacts_change_seq_update
+            BEFORE INSERT OR UPDATE ON contacts
+            FOR EACH ROW EXECUTE FUNCTION contacts_change_seq_update()
+    """)
+    op.execute("""
+        CREATE OR REPLACE FUNCTION contacts_tombstone_insert() RETURNS trigger AS $$
+        BEGIN
+            INSERT INTO contact_tombstones (contact_id, user_id, change_seq, change_xid)
+            VALUES (OLD.id, OLD.user_id, nextval('contacts_change_seq'), pg_current_xact_id()::text::bigint);
+            RETURN OLD;
+        END
+        $$ LANGUAGE plpgsql
+    """)
+    op.execute("""
+        CREATE TRIGGER contacts_tombstone_insert
+            AFTER DELETE ON contacts
+            FOR EACH ROW EXECUTE FUNCTION contacts_tombstone_insert()
+    """)
+
+
+def downgrade() -> None:
+    op.execute('DROP TRIGGER contacts_tombstone_insert ON contacts')
+    op.execute('DROP FUNCTION contacts_tombstone_insert()')
+    op.execute('DROP TRIGGER contacts_change_seq_update ON contacts')
+    op.execute('DROP FUNCTION contacts_change_seq_update()')
+    op.drop_table('contact_tombstone_horizon')
+    op.drop_index('ix_contact_tombstones_deleted_at', table_name='contact_tombstones')
+    op.drop_index('ix_contact_tombstones_user_id_change_xid_change_seq', table_name='contact_tombstones')
+    op.drop_table('contact_tombstones')
+    op.drop_index('ix_contacts_user_id_change_xid_change_seq', table_name='contacts')
+    op.drop_column('contacts', 'created_xid')
+    op.drop_column('contacts', 'change_xid')
+    op.drop_column('contacts', 'created_seq')
+    op.drop_column('contacts', 'change_seq')
+    op.execute('DROP SEQUENCE contacts_change_seq')
@@ -0,0 +1,36 @@
+"""Contacts search prefix indexes
+
+Revision ID: 8f41d0c6a2b9
+Revises: 5b2e9c41f7a3
+Create Date: 2026-10-17 11:03:27.904115
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8f41d0c6a2b9'
+down_revision: Union[str, None] = '5b2e9c41f7a3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.drop_index('ix_contacts_user_id_lower_last_name_lower_first_name', table_name='contacts')
+    op.create_index('ix_contacts_user_id_lower_first_name', 'contacts',
+                    ['user_id', sa.text('lower(first_name) text_pattern_ops')], unique=False)
+    op.create_index('ix_contacts_user_id_lower_last_name', 'contacts',
+                    ['user_id', sa.text('lower(last_name) text_pattern_ops')], unique=False)
+    op.create_index('ix_contacts_user_id_lower_email', 'contacts',
+                    ['user_id', sa.text('lower(email) text_pattern_ops')], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_contacts_user_id_lower_email', table_name='contacts')
+    op.drop_index('ix_contacts_user_id_lower_last_name', table_name='contacts')
+    op.drop_index('ix_contacts_user_id_lower_first_name', table_name='contacts')
+    op.create_index('ix_contacts_user_id_lower_last_name_lower_first_name', 'contacts',
+                    ['user_id', sa.text('lower(last_name)'), sa.text('lower(first_name)')], unique=False)
@@ -0,0 +1,29 @@
+"""Contacts birthday month-day column
+
+Revision ID: c37a5e1d9b04
+Revises: 8f41d0c6a2b9
+Create Date: 2026-10-17 11:48:52.120733
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c37a5e1d9b04'
+down_revision: Union[str, None] = '8f41d0c6a2b9'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('contacts', sa.Column('birthday_md', sa.Integer(), sa.Computed(
+        '(EXTRACT(MONTH FROM birthday) * 100 + EXTRACT(DAY FROM birthday))::integer', persisted=True), nullable=True))
+    op.create_index('ix_contacts_user_id_birthday_md', 'contacts', ['user_id', 'birthday_md'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_contacts_user_id_birthday_md', table_name='contacts')
+    op.drop_column('contacts', 'birthday_md')
@@ -0,0 +1,52 @@
+"""Contacts full-text search vector
+
+Revision ID: e5a0f3b71c28
+Revises: c37a5e1d9b04
+Create Date: 2026-10-17 23:05:41.508362
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e5a0f3b71c28'
+down_revision: Union[str, None] = 'c37a5e1d9b04'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('contacts', sa.Column('search_vector', postgresql.TSVECTOR(), nullable=True))
+    op.execute("""
+        CREATE OR REPLACE FUNCTION contacts_search_vector_update() RETURNS trigger AS $$
+        BEGIN
+            NEW.search_vector :=
+                setweight(to_tsvector('simple', coalesce(NEW.first_name, '') || ' ' || coalesce(NEW.last_name, '')),
+                          'A') ||
+                setweight(to_tsvector('simple', coalesce(NEW.email, '') || ' ' ||
+                                                regexp_replace(coalesce(NEW.email, ''), '[@._+-]+', ' ', 'g')), 'B') ||
+                setweight(to_tsvector('simple', coalesce(array_to_string(NEW.notes, ' '), '')), 'C');
+            RETURN NEW;
+        END
+        $$ LANGUAGE plpgsql
+    """)
+    op.execute("""
+        CREATE TRIGGER contacts_search_vector_update
+            BEFORE INSERT OR UPDATE OF first_name, last_name, email, notes ON contacts
+            FOR EACH ROW EXECUTE FUNCTION contacts_search_vector_update()
+    """)
+    op.execute('UPDATE contacts SET notes = notes')
+    op.execute('CREATE EXTENSION IF NOT EXISTS btree_gin')
+    op.create_index('ix_contacts_user_id_search_vector', 'contacts', ['user_id', 'search_vector'], unique=False,
+                    postgresql_using='gin')
+
+
+def downgrade() -> None:
+    op.drop_index('ix_contacts_user_id_search_vector', table_name='contacts', postgresql_using='gin')
+    op.execute('DROP TRIGGER contacts_search_vector_update ON contacts')
+    op.execute('DROP FUNCTION contacts_search_vector_update()')
+    op.drop_column('contacts', 'search_vector')
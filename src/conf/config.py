@@ -15,8 +15,41 @@ class Settings(BaseSettings):
     mail_from: str
     mail_port: int
     mail_server: str
+    # Connections per uvicorn worker: workers * (db_pool_size + db_max_overflow) must stay below max_connections.
+    db_pool_size: int = 5
+    db_max_overflow: int = 10
+    db_pool_timeout: float = 30
+    db_pool_recycle: int = 1800
+    db_pool_pre_ping: bool = True
+    # Set behind PgBouncer in transaction pooling mode, asyncpg then prepares no named statements.
+    db_pgbouncer: bool = False
+    # Read replicas as a JSON list of URLs, reads of a request go to one of them until its first write.
+    db_replica_urls: list[str] = []
     redis_host: str = 'localhost'
     redis_port: int = 6379
+    user_cache_size: int = 1024
+    user_cache_ttl: int = 30
+    token_cache_size: int = 4096
+    token_cache_ttl: int = 300
+    response_cache_ttl: int = 300
+    # Seconds after a write in which the user's reads go to the primary and are not cached, about the replica lag.
+    response_cache_recent_write_ttl: int = 5
+    # Tombstones of deleted contacts are kept this long, clients that did not sync for longer have to sync again.
+    tombstone_retention_days: int = 30
+    tombstone_prune_interval: int = 3600
+    # Quotas as "requests/seconds" by path prefix, the longest matching prefix applies and "/" matches only the root.
+    rate_limits: dict[str, str] = {'/': '2/5', '/api/contacts': '60/60'}
+    # Quotas of single users by email, on top of rate_limits, e.g. {"bulk@example.com": {"/api/contacts": "600/60"}}.
+    rate_limit_users: dict[str, dict[str, str]] = {}
+    # Most tokens a worker takes from Redis at once, it spends them without asking Redis again.
+    rate_limit_batch: int = 10
+    bcrypt_rounds: int = 12
+    password_hash_workers: int = 4
+    password_hash_queue_limit: int = 64
+    # Emails a worker sends over one SMTP connection, attempts before a job goes to email:dead, first retry delay.
+    email_batch_size: int = 20
+    email_max_attempts: int = 5
+    email_retry_backoff: float = 30
     cloudinary_name: str
     cloudinary_api_key: str
     cloudinary_api_secret: str
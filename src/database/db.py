@@ -1,20 +1,172 @@
-import os
+import random
+import time
+from typing import Sequence
+from uuid import uuid4
 
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy import Executable, TextClause, exc
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.orm import Session
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+from sqlalchemy.sql.dml import UpdateBase
 from ..conf.config import settings
 
 SQLALCHEMY_DB_URL = settings.sqlalchemy_db_url
 
-engine = create_engine(SQLALCHEMY_DB_URL)
+ASYNC_DRIVERS = {
+    'postgresql': 'postgresql+asyncpg',
+    'sqlite': 'sqlite+aiosqlite',
+}
 
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+def async_db_url(url: str) -> str:
+    """
+    Converts a database URL to the same URL with an asyncio driver.
+
+    Alembic keeps using the synchronous URL from settings, the application engine uses this one.
+
+    :param url: The database URL.
+    :type url: str
+    :return: The database URL with an async driver.
+    :rtype: str
+    """
+    db_url = make_url(url)
+    drivername = ASYNC_DRIVERS.get(db_url.get_backend_name(), db_url.drivername)
+    return db_url.set(drivername=drivername).render_as_string(hide_password=False)
+
+
+class TimedPool(AsyncAdaptedQueuePool):
+    """
+    Queue pool that records how long checkouts wait for a connection and how many are waiting right now.
+
+    The wait includes opening a new connection when the pool grows into its overflow.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._waiting = 0
+        self._checkouts = 0
+        self._timeouts = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+
+    def _do_get(self):
+        self._waiting += 1
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        except exc.TimeoutError:
+            self._timeouts += 1
+            raise
+        finally:
+            wait = time.perf_counter() - start
+            self._waiting -= 1
+            self._checkouts += 1
+            self._wait_total += wait
+            self._wait_max = max(self._wait_max, wait)
+
+    def stats(self) -> dict:
+        """
+        Retrieves the occupancy of the pool and the checkout wait times of this worker.
+
+        :return: size, checked out and idle connections, saturation, waiting checkouts, timeouts and wait times.
+        :rtype: dict
+        """
+        checked_out = self.checkedout()
+        capacity = self.size() + self._max_overflow if self._max_overflow >= 0 else None
+        return {'size': self.size(), 'max_overflow': self._max_overflow, 'checked_out': checked_out,
+                'idle': self.checkedin(), 'overflow': max(self.overflow(), 0),
+                'saturation': checked_out / capacity if capacity else None, 'waiting': self._waiting,
+                'checkouts': self._checkouts, 'timeouts': self._timeouts,
+                'wait_avg_ms': self._wait_total / self._checkouts * 1000 if self._checkouts else 0.0,
+                'wait_max_ms': self._wait_max * 1000}
+
+
+def engine_options(url: str) -> dict:
+    """
+    Creates the keyword arguments of create_async_engine from the pool settings.
+
+    With DB_PGBOUNCER asyncpg keeps no statement cache and gives every prepared statement a unique name,
+    so statements never outlive the transaction that PgBouncer assigned to a server connection.
+
+    :param url: The async database URL.
+    :type url: str
+    :return: Engine options.
+    :rtype: dict
+    """
+    options = {'poolclass': TimedPool, 'pool_size': settings.db_pool_size,
+               'max_overflow': settings.db_max_overflow, 'pool_timeout': settings.db_pool_timeout,
+               'pool_recycle': settings.db_pool_recycle, 'pool_pre_ping': settings.db_pool_pre_ping}
+    if settings.db_pgbouncer and make_url(url).get_driver_name() == 'asyncpg':
+        options['connect_args'] = {'statement_cache_size': 0, 'prepared_statement_cache_size': 0,
+                                   'prepared_statement_name_func': lambda: f'__asyncpg_{uuid4()}__'}
+    return options
+
+
+class RoutingSession(Session):
+    """
+    Session that sends plain reads to one of the replicas and everything else to the primary.
+
+    Flushes, INSERT/UPDATE/DELETE statements, SELECT ... FOR UPDATE, textual SQL and statements with the
+    ``primary`` execution option go to the primary and pin the session there, so the rest of the request reads
+    its own writes. Reads that feed a write or a security decision set ``primary``, a lagging replica must not
+    decide them. Every session picks one replica and keeps it, so all reads of a request see the same snapshot
+    of replication.
+    """
+
+    def __init__(self, *args, replicas: Sequence[AsyncEngine] = (), **kwargs):
+        super().__init__(*args, **kwargs)
+        self.replica = random.choice(replicas).sync_engine if replicas else None
+        self.pinned = False
+
+    def get_bind(self, mapper=None, clause=None, **kwargs):
+        if self.replica is None or self.pinned:
+            return super().get_bind(mapper, clause=clause, **kwargs)
+        if (self._flushing or clause is None or isinstance(clause, (UpdateBase, TextClause))
+                or getattr(clause, '_for_update_arg', None) is not None
+                or isinstance(clause, Executable) and clause.get_execution_options().get('primary')):
+            self.pinned = True
+            return super().get_bind(mapper, clause=clause, **kwargs)
+        return self.replica
+
+
+ASYNC_DB_URL = async_db_url(SQLALCHEMY_DB_URL)
+
+engine = create_async_engine(ASYNC_DB_URL, **engine_options(ASYNC_DB_URL))
+
+replica_engines = [create_async_engine(url, **engine_options(url))
+                   for url in map(async_db_url, settings.db_replica_urls)]
+
+SessionLocal = async_sessionmaker(engine, class_=AsyncSession, sync_session_class=RoutingSession,
+                                  replicas=replica_engines, autoflush=False, expire_on_commit=False)
 
 
 # Dependency
-def get_db():
-    db = SessionLocal()
-    try:
+async def get_db():
+    async with SessionLocal() as db:
         yield db
-    finally:
-        db.close()
+
+
+def get_stream_db() -> AsyncSession:
+    """
+    Creates a database session for a streaming response, which closes it when the body is sent.
+
+    The session of get_db is closed before the body of a streaming response is read. This one connects on its
+    first statement, so it holds no connection if the body is never read.
+
+    :return: The database session.
+    :rtype: AsyncSession
+    """
+    return SessionLocal()
+
+
+def pin_primary(db: AsyncSession) -> None:
+    """
+    Sends the remaining statements of the session to the primary.
+
+    For a user who wrote moments ago, whose writes may not have reached the replica of the session yet.
+
+    :param db: The database session.
+    :type db: AsyncSession
+    """
+    db.sync_session.pinned = True
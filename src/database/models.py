@@ -1,5 +1,7 @@
-from sqlalchemy import Column, Integer, String, ARRAY, UniqueConstraint, Boolean, func, Table
-from sqlalchemy.orm import relationship, declarative_base
+from sqlalchemy import (Column, Integer, BigInteger, String, ARRAY, UniqueConstraint, Boolean, func, Table, Index,
+                        Computed, DDL, Sequence, FetchedValue, event)
+from sqlalchemy.dialects.postgresql import TSVECTOR
+from sqlalchemy.orm import relationship, declarative_base, deferred
 from sqlalchemy.schema import ForeignKey
 from sqlalchemy.sql.sqltypes import Date, DateTime
 
@@ -14,10 +16,134 @@ class Contact(Base):
     email = Column(String(50), nullable=False)
     phone_number = Column(String(20), nullable=False)
     birthday = Column(Date, nullable=False)  # new_user = User(name='Alice', birthdate=date(1995, 5, 17))
+    birthday_md = Column(Integer, Computed('(EXTRACT(MONTH FROM birthday) * 100 + EXTRACT(DAY FROM birthday))::integer',
+                                           persisted=True))  # 1 May -> 501, 29 Feb -> 229
     notes = Column(ARRAY(String))
+    search_vector = deferred(Column(TSVECTOR))  # filled by the contacts_search_vector_update trigger
+    updated_at = Column(DateTime, nullable=False, server_default=func.now(), onupdate=func.now())
+    # Set by the contacts_change_seq_update trigger on every insert and update: the sequence number from
+    # CONTACTS_CHANGE_SEQ and the ID of the writing transaction, the change feed is ordered by both.
+    change_seq = Column(BigInteger, nullable=False, server_default=FetchedValue(), server_onupdate=FetchedValue())
+    change_xid = Column(BigInteger, nullable=False, server_default=FetchedValue(), server_onupdate=FetchedValue())
+    created_seq = Column(BigInteger, nullable=False, server_default=FetchedValue())
+    created_xid = Column(BigInteger, nullable=False, server_default=FetchedValue())
     user_id = Column('user_id', ForeignKey('users.id', ondelete='CASCADE'), default=None)
     user = relationship('User', backref='contacts')
 
+    __table_args__ = (
+        Index('ix_contacts_user_id_id', 'user_id', 'id', postgresql_include=['updated_at']),
+        Index('ix_contacts_user_id_first_name', 'user_id', 'first_name'),
+        Index('ix_contacts_user_id_last_name', 'user_id', 'last_name'),
+        Index('ix_contacts_user_id_email', 'user_id', 'email'),
+        Index('ix_contacts_user_id_birthday_md', 'user_id', 'birthday_md'),
+        Index('ix_contacts_user_id_lower_first_name', 'user_id', func.lower(first_name).label('lower_first_name'),
+              postgresql_ops={'lower_first_name': 'text_pattern_ops'}),
+        Index('ix_contacts_user_id_lower_last_name', 'user_id', func.lower(last_name).label('lower_last_name'),
+              postgresql_ops={'lower_last_name': 'text_pattern_ops'}),
+        Index('ix_contacts_user_id_lower_email', 'user_id', func.lower(email).label('lower_email'),
+              postgresql_ops={'lower_email': 'text_pattern_ops'}),
+        # btree_gin lets the GIN index hold user_id, a search scans only the entries of one user.
+        Index('ix_contacts_user_id_search_vector', 'user_id', 'search_vector', postgresql_using='gin'),
+        Index('ix_contacts_user_id_change_xid_change_seq', 'user_id', 'change_xid', 'change_seq'),
+    )
+
+
+class ContactTombstone(Base):
+    """
+    A deleted contact, written by the contacts_tombstone_insert trigger so that the change feed can report it.
+    """
+    __tablename__ = 'contact_tombstones'
+    contact_id = Column(Integer, primary_key=True, autoincrement=False)
+    user_id = Column(Integer, nullable=False)  # no foreign key, the user may be the one being deleted
+    change_seq = Column(BigInteger, nullable=False)
+    change_xid = Column(BigInteger, nullable=False)
+    deleted_at = Column(DateTime, nullable=False, server_default=func.now())
+
+    __table_args__ = (
+        Index('ix_contact_tombstones_user_id_change_xid_change_seq', 'user_id', 'change_xid', 'change_seq'),
+        Index('ix_contact_tombstones_deleted_at', 'deleted_at'),
+    )
+
+
+class ContactTombstoneHorizon(Base):
+    """
+    The largest change_xid of the pruned tombstones, a single row. Sync tokens up to it may miss deletions.
+    """
+    __tablename__ = 'contact_tombstone_horizon'
+    id = Column(Integer, primary_key=True, autoincrement=False)
+    change_xid = Column(BigInteger, nullable=False)
+
+
+# Sequence numbers are taken before the writing transaction commits, so a change can become visible before a
+# change with a smaller number. The transaction ID tells the feed which changes are final: every transaction
+# older than the xmin of the current snapshot has ended. xid8 has no SQLAlchemy type, it is stored as bigint.
+CONTACTS_CHANGE_SEQ = Sequence('contacts_change_seq', metadata=Base.metadata)
+
+
+BTREE_GIN_EXTENSION = DDL('CREATE EXTENSION IF NOT EXISTS btree_gin')
+
+# array_to_string is not immutable, so search_vector cannot be a generated column and is kept up to date by a trigger.
+# The email is indexed whole and split on punctuation, so both 'ann.lee@example.com' and 'lee' find it.
+CONTACTS_SEARCH_VECTOR_FUNCTION = DDL("""
+CREATE OR REPLACE FUNCTION contacts_search_vector_update() RETURNS trigger AS $$
+BEGIN
+    NEW.search_vector :=
+        setweight(to_tsvector('simple', coalesce(NEW.first_name, '') || ' ' || coalesce(NEW.last_name, '')), 'A') ||
+        setweight(to_tsvector('simple', coalesce(NEW.email, '') || ' ' ||
+                                        regexp_replace(coalesce(NEW.email, ''), '[@._+-]+', ' ', 'g')), 'B') ||
+        setweight(to_tsvector('simple', coalesce(array_to_string(NEW.notes, ' '), '')), 'C');
+    RETURN NEW;
+END
+$$ LANGUAGE plpgsql
+""")
+
+CONTACTS_SEARCH_VECTOR_TRIGGER = DDL("""
+CREATE TRIGGER contacts_search_vector_update
+    BEFORE INSERT OR UPDATE OF first_name, last_name, email, notes ON contacts
+    FOR EACH ROW EXECUTE FUNCTION contacts_search_vector_update()
+""")
+
+CONTACTS_CHANGE_SEQ_FUNCTION = DDL("""
+CREATE OR REPLACE FUNCTION contacts_change_seq_update() RETURNS trigger AS $$
+BEGIN
+    NEW.change_seq := nextval('contacts_change_seq');
+    NEW.change_xid := pg_current_xact_id()::text::bigint;
+    IF TG_OP = 'INSERT' THEN
+        NEW.created_seq := NEW.change_seq;
+        NEW.created_xid := NEW.change_xid;
+    END IF;
+    RETURN NEW;
+END
+$$ LANGUAGE plpgsql
+""")
+
+CONTACTS_CHANGE_SEQ_TRIGGER = DDL("""
+CREATE TRIGGER contacts_change_seq_update
+    BEFORE INSERT OR UPDATE ON contacts
+    FOR EACH ROW EXECUTE FUNCTION contacts_change_seq_update()
+""")
+
+CONTACTS_TOMBSTONE_FUNCTION = DDL("""
+CREATE OR REPLACE FUNCTION contacts_tombstone_insert() RETURNS trigger AS $$
+BEGIN
+    INSERT INTO contact_tombstones (contact_id, user_id, change_seq, change_xid)
+    VALUES (OLD.id, OLD.user_id, nextval('contacts_change_seq'), pg_current_xact_id()::text::bigint);
+    RETURN OLD;
+END
+$$ LANGUAGE plpgsql
+""")
+
+CONTACTS_TOMBSTONE_TRIGGER = DDL("""
+CREATE TRIGGER contacts_tombstone_insert
+    AFTER DELETE ON contacts
+    FOR EACH ROW EXECUTE FUNCTION contacts_tombstone_insert()
+""")
+
+for ddl in (CONTACTS_SEARCH_VECTOR_FUNCTION, CONTACTS_SEARCH_VECTOR_TRIGGER, CONTACTS_CHANGE_SEQ_FUNCTION,
+            CONTACTS_CHANGE_SEQ_TRIGGER, CONTACTS_TOMBSTONE_FUNCTION, CONTACTS_TOMBSTONE_TRIGGER):
+    event.listen(Contact.__table__, 'after_create', ddl.execute_if(dialect='postgresql'))
+event.listen(Contact.__table__, 'before_create', BTREE_GIN_EXTENSION.execute_if(dialect='postgresql'))
+
 
 class User(Base):
     __tablename__ = 'users'
@@ -29,9 +155,3 @@ class User(Base):
     avatar = Column(String(255), nullable=True)
     refresh_token = Column(String(255), nullable=True)
     confirmed = Column(Boolean, default=False)
-
-
-
-
-
-
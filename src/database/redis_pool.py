@@ -0,0 +1,19 @@
+import redis.asyncio as redis
+from fastapi import Request
+
+from ..conf.config import settings
+
+
+def create_redis() -> redis.Redis:
+    """
+    Creates the asyncio Redis client with its connection pool, shared by the whole application.
+
+    :return: Redis client.
+    :rtype: redis.Redis
+    """
+    return redis.Redis(host=settings.redis_host, port=settings.redis_port, db=0)
+
+
+# Dependency
+async def get_redis(request: Request) -> redis.Redis:
+    return request.app.state.redis
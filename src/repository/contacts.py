@@ -1,12 +1,25 @@
-from typing import List, Type
-from sqlalchemy import and_
-from sqlalchemy.orm import Session
-from src.database.models import Contact, User
-from src.schemas import ContactModel, ContactResponse, NotesContact
+import calendar
+from collections import defaultdict
+from typing import AsyncIterator
+from sqlalchemy import (and_, or_, select, func, insert, update, delete, exists, any_, literal, cast, tuple_, values,
+                        column, Row, ARRAY, BigInteger, Integer, String, Select)
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from src.database.models import Contact, ContactTombstone, ContactTombstoneHorizon, User
+from src.schemas import ContactModel, ContactResponse, NotesContact, ContactBatchOperation, ContactBatchResult
 from datetime import date, timedelta
 
+# Oldest transaction still running when the snapshot was taken, every change of an older transaction is final.
+SNAPSHOT_XMIN = cast(cast(func.pg_snapshot_xmin(func.pg_current_snapshot()), String), BigInteger)
 
-async def create_contact(body: ContactModel, user: User, db: Session) -> Contact:
+# Text search configuration of contacts.search_vector, names and emails are not stemmed.
+SEARCH_CONFIG = 'simple'
+
+# Columns of ContactResponse in the order of its fields, list endpoints render rows of them without ORM objects.
+RESPONSE_COLUMNS = tuple(getattr(Contact, field) for field in ContactResponse.model_fields)
+
+
+async def create_contact(body: ContactModel, user: User, db: AsyncSession) -> Contact:
 
     """
     Creates contact for specific user.
@@ -16,29 +29,57 @@ async def create_contact(body: ContactModel, user: User, db: Session) -> Contact
     :param user: User object.
     :type user: User
     :param db: The database session.
-    :type db: Session
+    :type db: AsyncSession
     :return: A list of notes.
     :rtype: Contact
     """
 
-    contact = Contact(
+    stmt = insert(Contact).values(
         first_name=body.first_name,
         last_name=body.last_name,
         email=body.email,
         phone_number=body.phone_number,
         birthday=body.birthday,
-        user=user
-    )
-    db.add(contact)
-    db.commit()
-    db.refresh(contact)
+        user_id=user.id
+    ).returning(Contact)
+    contact = await db.execute(stmt)
+    contact = contact.scalars().one()
+    await db.commit()
     return contact
 
 
-async def read_contacts(skip: int, limit: int, user: User, db: Session) -> list[Type[Contact]]:
+async def create_contacts(bodies: list[ContactModel], user: User, db: AsyncSession) -> int:
+    """
+    Creates many contacts for specific user with one multi-row insert.
+
+    :param bodies: Contact objects.
+    :type bodies: List[ContactModel]
+    :param user: User object.
+    :type user: User
+    :param db: The database session.
+    :type db: AsyncSession
+    :return: The number of created contacts.
+    :rtype: int
+    """
+    if not bodies:
+        return 0
+    await db.execute(insert(Contact), [
+        dict(first_name=body.first_name, last_name=body.last_name, email=body.email,
+             phone_number=body.phone_number, birthday=body.birthday, user_id=user.id)
+        for body in bodies
+    ])
+    await db.commit()
+    return len(bodies)
+
+
+async def read_contacts(skip: int, limit: int, user: User, db: AsyncSession,
+                        after: int | None = None) -> list[Row]:
     """
     Retrieves a list of contacts for a specific user with specified pagination parameters.
 
+    Contacts are ordered by ID. When ``after`` is given the page starts right after that contact
+    and ``skip`` is ignored, so deep pages cost the same as the first one.
+
     :param skip: The number of contacts to skip.
     :type skip: int
     :param limit: The maximum number of contacts to return.
@@ -46,14 +87,150 @@ async def read_contacts(skip: int, limit: int, user: User, db: Session) -> list[
     :param user: The user to retrieve contacts for.
     :type user: User
     :param db: The database session.
-    :type db: Session
-    :return: A list of contacts.
-    :rtype: List[Contact]
+    :type db: AsyncSession
+    :param after: ID of the last contact of the previous page.
+    :type after: int | None
+    :return: Rows with the RESPONSE_COLUMNS and updated_at.
+    :rtype: list[Row]
+    """
+    stmt = _page(select(*RESPONSE_COLUMNS, Contact.updated_at), skip, limit, user, after)
+    contacts = await db.execute(stmt)
+    return contacts.all()
+
+
+async def read_contact_versions(skip: int, limit: int, user: User, db: AsyncSession,
+                                after: int | None = None) -> list[Row]:
+    """
+    Retrieves only the ID and update time of the contacts that read_contacts returns for the same arguments.
+
+    The columns are included in the (user_id, id) index, so the rows themselves are usually not read.
+
+    :param skip: The number of contacts to skip.
+    :type skip: int
+    :param limit: The maximum number of contacts to return.
+    :type limit: int
+    :param user: The user to retrieve contacts for.
+    :type user: User
+    :param db: The database session.
+    :type db: AsyncSession
+    :param after: ID of the last contact of the previous page.
+    :type after: int | None
+    :return: Rows with id and updated_at.
+    :rtype: list[Row]
+    """
+    stmt = _page(select(Contact.id, Contact.updated_at), skip, limit, user, after)
+    versions = await db.execute(stmt)
+    return versions.all()
+
+
+def _page(stmt: Select, skip: int, limit: int, user: User, after: int | None) -> Select:
+    stmt = stmt.filter(Contact.user_id == user.id).order_by(Contact.id).limit(limit)
+    if after is None:
+        return stmt.offset(skip)
+    return stmt.filter(Contact.id > after)
+
+
+async def stream_contacts(user: User, db: AsyncSession, batch_size: int = 1000) -> AsyncIterator[Row]:
+    """
+    Retrieves all contacts of a specific user through a server-side cursor, ``batch_size`` rows at a time.
+
+    :param user: The user to retrieve contacts for.
+    :type user: User
+    :param db: The database session.
+    :type db: AsyncSession
+    :param batch_size: The number of rows fetched from the cursor at once.
+    :type batch_size: int
+    :return: Rows with the contact columns.
+    :rtype: AsyncIterator[Row]
+    """
+    stmt = select(Contact.id, Contact.first_name, Contact.last_name, Contact.email, Contact.phone_number,
+                  Contact.birthday, Contact.notes) \
+        .filter(Contact.user_id == user.id).order_by(Contact.id).execution_options(yield_per=batch_size)
+    result = await db.stream(stmt)
+    async for row in result:
+        yield row
+
+
+async def read_changes(since: tuple[int, int], limit: int, user: User, db: AsyncSession) \
+        -> tuple[list[Contact], list[ContactTombstone], tuple[int, int], bool] | None:
+    """
+    Retrieves the contacts created, updated or deleted after the change ``since``, oldest change first.
+
+    Changes are ordered by change_xid and change_seq. Only changes of transactions older than the xmin of the
+    snapshot are returned, every later change, committed or not, sorts after them, so a change that commits
+    after the request never lands behind the sync token. Both lists are cut at the same change, the next request
+    starts at the largest (change_xid, change_seq) in them, or at the xmin once everything has been returned, so
+    the token keeps moving ahead of the tombstone horizon. Without ``since`` the client has nothing to delete and
+    tombstones are not read.
+
+    :param since: change_xid and change_seq of the last change the client has received, (0, 0) for a full sync.
+    :type since: tuple[int, int]
+    :param limit: The maximum number of changes to return.
+    :type limit: int
+    :param user: The user to retrieve changes for.
+    :type user: User
+    :param db: The database session.
+    :type db: AsyncSession
+    :return: Changed contacts, tombstones of deleted contacts, the change to continue after and whether more
+        changes follow. None when tombstones after ``since`` have been pruned.
+    :rtype: tuple[list[Contact], list[ContactTombstone], tuple[int, int], bool] | None
+    """
+    # Every statement has its own snapshot, both lists are cut at the xmin of the first one.
+    horizon = select(ContactTombstoneHorizon.change_xid).scalar_subquery()
+    xmin, horizon = (await db.execute(select(SNAPSHOT_XMIN, horizon))).one()
+    if since > (0, 0) and horizon is not None and since[0] <= horizon:
+        return None
+    stmt = select(Contact).filter(and_(Contact.user_id == user.id,
+                                       tuple_(Contact.change_xid, Contact.change_seq) > since,
+                                       Contact.change_xid < xmin)) \
+        .order_by(Contact.change_xid, Contact.change_seq).limit(limit + 1)
+    changes = await db.execute(stmt)
+    changes = list(changes.scalars().all())
+    if since > (0, 0):
+        stmt = select(ContactTombstone) \
+            .filter(and_(ContactTombstone.user_id == user.id,
+                         tuple_(ContactTombstone.change_xid, ContactTombstone.change_seq) > since,
+                         ContactTombstone.change_xid < xmin)) \
+            .order_by(ContactTombstone.change_xid, ContactTombstone.change_seq).limit(limit + 1)
+        tombstones = await db.execute(stmt)
+        changes = sorted(changes + list(tombstones.scalars().all()),
+                         key=lambda change: (change.change_xid, change.change_seq))
+    has_more = len(changes) > limit
+    changes = changes[:limit]
+    last_change = (changes[-1].change_xid, changes[-1].change_seq) if has_more else max(since, (xmin, 0))
+    contacts = [change for change in changes if isinstance(change, Contact)]
+    tombstones = [change for change in changes if isinstance(change, ContactTombstone)]
+    return contacts, tombstones, last_change, has_more
+
+
+async def prune_tombstones(retention: timedelta, db: AsyncSession) -> int:
+    """
+    Deletes the tombstones of deleted users and the tombstones older than ``retention``.
+
+    The largest change_xid of the pruned tombstones becomes the horizon, read_changes refuses the sync tokens up
+    to it because they may miss deletions.
+
+    :param retention: How long tombstones are kept.
+    :type retention: timedelta
+    :param db: The database session.
+    :type db: AsyncSession
+    :return: The number of deleted tombstones.
+    :rtype: int
     """
-    return db.query(Contact).filter(Contact.user_id == user.id).offset(skip).limit(limit).all()
+    orphans = await db.execute(delete(ContactTombstone).where(~exists().where(User.id == ContactTombstone.user_id)))
+    pruned = delete(ContactTombstone).where(ContactTombstone.deleted_at < func.now() - retention) \
+        .returning(ContactTombstone.change_xid).cte('pruned')
+    stmt = select(func.count(), func.max(pruned.c.change_xid)).execution_options(primary=True)
+    count, horizon = (await db.execute(stmt)).one()
+    if horizon is not None:
+        stmt = pg_insert(ContactTombstoneHorizon).values(id=1, change_xid=horizon)
+        await db.execute(stmt.on_conflict_do_update(index_elements=[ContactTombstoneHorizon.id], set_={
+            'change_xid': func.greatest(ContactTombstoneHorizon.change_xid, stmt.excluded.change_xid)}))
+    await db.commit()
+    return orphans.rowcount + count
 
 
-async def read_contact(contact_id: int, user: User, db: Session) -> Contact | None:
+async def read_contact(contact_id: int, user: User, db: AsyncSession) -> Contact | None:
     """
     Retrieves a single contact with the specified ID for a specific user.
 
@@ -62,34 +239,126 @@ async def read_contact(contact_id: int, user: User, db: Session) -> Contact | No
     :param user: The user to retrieve contacts for.
     :type user: User
     :param db: The database session.
-    :type db: Session
+    :type db: AsyncSession
     :return: A list of contacts.
     :rtype: Contact | None
     """
-    return db.query(Contact).filter(and_(Contact.user_id == user.id, Contact.id == contact_id)).first()
+    stmt = select(Contact).filter(and_(Contact.user_id == user.id, Contact.id == contact_id))
+    contact = await db.execute(stmt)
+    return contact.scalars().first()
 
 
-async def search_contact(info: str, user: User, db: Session) -> list[Type[Contact]] | None:
+async def read_contact_version(contact_id: int, user: User, db: AsyncSession) -> Row | None:
     """
-    Retrieves the contacts with corresponding information.
+    Retrieves only the ID and update time of a single contact.
+
+    :param contact_id: ID of specific contact.
+    :type contact_id: int
+    :param user: The user to retrieve contacts for.
+    :type user: User
+    :param db: The database session.
+    :type db: AsyncSession
+    :return: Row with id and updated_at.
+    :rtype: Row | None
+    """
+    stmt = select(Contact.id, Contact.updated_at).filter(and_(Contact.user_id == user.id, Contact.id == contact_id))
+    version = await db.execute(stmt)
+    return version.first()
+
+
+async def search_contact(info: str, skip: int, limit: int, user: User, db: AsyncSession) -> list[Row]:
+    """
+    Retrieves the contacts whose first name, last name or email starts with the information, ignoring case.
 
     :param info: The information about contact to search for.
-    :type info: int
+    :type info: str
+    :param skip: The number of contacts to skip.
+    :type skip: int
+    :param limit: The maximum number of contacts to return.
+    :type limit: int
     :param user: The user to retrieve contacts for.
     :type user: User
     :param db: The database session.
-    :type db: Session
-    :return: A list of contacts.
-    :rtype: List[Contact] | None
+    :type db: AsyncSession
+    :return: Rows with the RESPONSE_COLUMNS.
+    :rtype: list[Row]
+    """
+    pattern = info.lower().replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%'
+    stmt = select(*RESPONSE_COLUMNS).filter(and_(Contact.user_id == user.id,
+                                                 or_(func.lower(Contact.first_name).like(pattern, escape='\\'),
+                                                     func.lower(Contact.last_name).like(pattern, escape='\\'),
+                                                     func.lower(Contact.email).like(pattern, escape='\\')))) \
+        .order_by(Contact.id).offset(skip).limit(limit)
+    contacts = await db.execute(stmt)
+    return contacts.all()
+
+
+async def search_contacts_text(query: str, skip: int, limit: int, user: User, db: AsyncSession) -> list[Row]:
+    """
+    Full-text search over names, email and notes of the contacts of specific user, best matches first.
+
+    The query uses web search syntax: words are ANDed, ``or`` and ``-word`` are understood, quoted text is a
+    phrase. Highlights are only built for the returned page.
+
+    :param query: The search query.
+    :type query: str
+    :param skip: The number of contacts to skip.
+    :type skip: int
+    :param limit: The maximum number of contacts to return.
+    :type limit: int
+    :param user: The user to retrieve contacts for.
+    :type user: User
+    :param db: The database session.
+    :type db: AsyncSession
+    :return: Rows with the RESPONSE_COLUMNS, the rank and a highlighted snippet.
+    :rtype: list[Row]
+    """
+    tsquery = func.websearch_to_tsquery(SEARCH_CONFIG, query)
+    rank = func.ts_rank(Contact.search_vector, tsquery)
+    page = select(Contact.id, rank.label('rank')) \
+        .filter(and_(Contact.user_id == user.id, Contact.search_vector.bool_op('@@')(tsquery))) \
+        .order_by(rank.desc(), Contact.id).offset(skip).limit(limit).subquery()
+    document = func.concat_ws(' ', Contact.first_name, Contact.last_name, Contact.email,
+                              func.array_to_string(Contact.notes, ' '))
+    stmt = select(*RESPONSE_COLUMNS, page.c.rank,
+                  func.ts_headline(SEARCH_CONFIG, document, tsquery).label('headline')) \
+        .join(page, Contact.id == page.c.id).order_by(page.c.rank.desc(), Contact.id)
+    contacts = await db.execute(stmt)
+    return contacts.all()
+
+
+def birthday_window(today: date, period: int) -> list[tuple[int, int]]:
+    """
+    Converts the period starting today into inclusive ranges of ``Contact.birthday_md`` values.
+
+    The window is split in two when it crosses the new year. Birthdays on 29 February are celebrated
+    on 1 March in non-leap years.
+
+    :param today: The first day of the period.
+    :type today: date
+    :param period: The number of days to be checked.
+    :type period: int
+    :return: A list of (first, last) month-day ranges.
+    :rtype: List[tuple[int, int]]
     """
-    contacts_fn = db.query(Contact).filter(and_(Contact.user_id == user.id, Contact.first_name == info)).all()
-    contacts_ln = db.query(Contact).filter(and_(Contact.user_id == user.id, Contact.last_name == info)).all()
-    contacts_email = db.query(Contact).filter(and_(Contact.user_id == user.id, Contact.email == info)).all()
-    contacts = contacts_fn + contacts_ln + contacts_email
-    return list(set(contacts))
+    if period < 0:
+        return []
+    if period >= 365:
+        return [(101, 1231)]
+    end_of_period = today + timedelta(days=period)
+    start_md = today.month * 100 + today.day
+    end_md = end_of_period.month * 100 + end_of_period.day
+    if today.year == end_of_period.year:
+        ranges = [(start_md, end_md)]
+    else:
+        ranges = [(start_md, 1231), (101, end_md)]
+    for year in {today.year, end_of_period.year}:
+        if not calendar.isleap(year) and today <= date(year=year, month=3, day=1) <= end_of_period:
+            ranges.append((229, 229))
+    return ranges
 
 
-async def birthdays(period: int, user: User, db: Session) -> list[Type[Contact]]:
+async def birthdays(period: int, user: User, db: AsyncSession) -> list[Row]:
     """
     Retrieves the contacts with birthdays in corresponding period.
 
@@ -98,30 +367,20 @@ async def birthdays(period: int, user: User, db: Session) -> list[Type[Contact]]
     :param user: The user to retrieve contacts for.
     :type user: User
     :param db: The database session.
-    :type db: Session
-    :return: A list of contacts.
-    :rtype: List[Contact] | None
+    :type db: AsyncSession
+    :return: Rows with the RESPONSE_COLUMNS.
+    :rtype: list[Row]
     """
-    today = date.today()
-    delta = timedelta(days=period)
-    end_of_period = today + delta
-    contacts = db.query(Contact).filter(Contact.user_id == user.id).all()
-    birthdays_list = list()
-    for contact in contacts:
-        contact_next_birthday = date(year=today.year, month=contact.birthday.month, day=contact.birthday.day)
-        if contact_next_birthday < today:
-            contact_next_birthday = date(year=today.year + 1, month=contact.birthday.month, day=contact.birthday.day)
-
-        # if contact.birthday.month >= today.month and contact.birthday.day >= today.day:
-        #
-        # else:
-        #     contact_next_birthday = date(year=today.year + 1, month=contact.birthday.month, day=contact.birthday.day)
-        if today <= contact_next_birthday <= end_of_period:
-            birthdays_list.append(contact)
-    return birthdays_list
+    ranges = birthday_window(date.today(), period)
+    if not ranges:
+        return []
+    stmt = select(*RESPONSE_COLUMNS).filter(and_(
+        Contact.user_id == user.id, or_(*(Contact.birthday_md.between(first, last) for first, last in ranges))))
+    contacts = await db.execute(stmt)
+    return contacts.all()
 
 
-async def update_contact(contact_id: int, body: ContactModel, user: User, db: Session) -> Contact | None:
+async def update_contact(contact_id: int, body: ContactModel, user: User, db: AsyncSession) -> Contact | None:
     """
     Updates a single contact with the specified ID for a specific user.
 
@@ -132,22 +391,24 @@ async def update_contact(contact_id: int, body: ContactModel, user: User, db: Se
     :param user: The user to be updated.
     :type user: User
     :param db: The database session.
-    :type db: Session
+    :type db: AsyncSession
     :return: Updated contact.
     :rtype: Contact | None
     """
-    contact = db.query(Contact).filter(and_(Contact.user_id == user.id, Contact.id == contact_id)).first()
-    if contact:
-        contact.first_name = body.first_name
-        contact.last_name = body.last_name
-        contact.email = body.email
-        contact.phone_number = body.phone_number
-        contact.birthday = body.birthday
-        db.commit()
+    stmt = update(Contact).filter(and_(Contact.user_id == user.id, Contact.id == contact_id)).values(
+        first_name=body.first_name,
+        last_name=body.last_name,
+        email=body.email,
+        phone_number=body.phone_number,
+        birthday=body.birthday
+    ).returning(Contact).execution_options(synchronize_session=False)
+    contact = await db.execute(stmt)
+    contact = contact.scalars().first()
+    await db.commit()
     return contact
 
 
-async def add_note(contact_id: int, body: NotesContact, user: User, db: Session) -> Contact | None:
+async def add_note(contact_id: int, body: NotesContact, user: User, db: AsyncSession) -> Contact | None:
     """
     Adding a note to specific contact.
 
@@ -158,18 +419,96 @@ async def add_note(contact_id: int, body: NotesContact, user: User, db: Session)
     :param user: The user to be added the note.
     :type user: User
     :param db: The database session.
-    :type db: Session
+    :type db: AsyncSession
     :return: Updated contact.
     :rtype: Contact | None
     """
-    contact = db.query(Contact).filter(and_(Contact.user_id == user.id, Contact.id == contact_id)).first()
-    if contact:
-        contact.notes = body.notes
-        db.commit()
+    stmt = update(Contact).filter(and_(Contact.user_id == user.id, Contact.id == contact_id)) \
+        .values(notes=body.notes).returning(Contact).execution_options(synchronize_session=False)
+    contact = await db.execute(stmt)
+    contact = contact.scalars().first()
+    await db.commit()
     return contact
 
 
-async def remove_contact(contact_id: int, user: User, db: Session) -> Contact | None:
+async def append_note(contact_id: int, note: str, user: User, db: AsyncSession) -> int | None:
+    """
+    Appends a note to the notes of specific contact in place, concurrent appends do not overwrite each other.
+
+    :param contact_id: ID of specific contact.
+    :type contact_id: int
+    :param note: The note to be appended.
+    :type note: str
+    :param user: The owner of the contact.
+    :type user: User
+    :param db: The database session.
+    :type db: AsyncSession
+    :return: The number of notes after the append, None if the contact is not found.
+    :rtype: int | None
+    """
+    notes = func.array_append(Contact.notes, cast(note, String), type_=Contact.notes.type)
+    stmt = update(Contact).filter(and_(Contact.user_id == user.id, Contact.id == contact_id)) \
+        .values(notes=notes).returning(func.cardinality(Contact.notes)) \
+        .execution_options(synchronize_session=False)
+    count = await db.execute(stmt)
+    count = count.scalar()
+    await db.commit()
+    return count
+
+
+async def delete_note(contact_id: int, note: str, user: User, db: AsyncSession) -> int | None:
+    """
+    Removes every occurrence of a note from the notes of specific contact in place.
+
+    :param contact_id: ID of specific contact.
+    :type contact_id: int
+    :param note: The note to be removed.
+    :type note: str
+    :param user: The owner of the contact.
+    :type user: User
+    :param db: The database session.
+    :type db: AsyncSession
+    :return: The number of notes after the removal, None if the contact is not found.
+    :rtype: int | None
+    """
+    notes = func.array_remove(Contact.notes, cast(note, String), type_=Contact.notes.type)
+    stmt = update(Contact).filter(and_(Contact.user_id == user.id, Contact.id == contact_id)) \
+        .values(notes=notes).returning(func.coalesce(func.cardinality(Contact.notes), 0)) \
+        .execution_options(synchronize_session=False)
+    count = await db.execute(stmt)
+    count = count.scalar()
+    await db.commit()
+    return count
+
+
+async def read_notes(contact_id: int, skip: int, limit: int, user: User, db: AsyncSession) -> list[str] | None:
+    """
+    Retrieves a page of the notes of specific contact, only the requested slice of the array is sent.
+
+    :param contact_id: ID of specific contact.
+    :type contact_id: int
+    :param skip: The number of notes to skip.
+    :type skip: int
+    :param limit: The maximum number of notes to return.
+    :type limit: int
+    :param user: The owner of the contact.
+    :type user: User
+    :param db: The database session.
+    :type db: AsyncSession
+    :return: The notes, None if the contact is not found.
+    :rtype: list[str] | None
+    """
+    # Postgres arrays are 1-based and both slice bounds are inclusive.
+    stmt = select(Contact.notes[skip + 1:skip + limit]) \
+        .filter(and_(Contact.user_id == user.id, Contact.id == contact_id))
+    notes = await db.execute(stmt)
+    notes = notes.first()
+    if notes is None:
+        return None
+    return notes[0] or []
+
+
+async def remove_contact(contact_id: int, user: User, db: AsyncSession) -> Contact | None:
     """
     Removing of specific contact.
 
@@ -178,13 +517,80 @@ async def remove_contact(contact_id: int, user: User, db: Session) -> Contact |
     :param user: The user to be removed.
     :type user: User
     :param db: The database session.
-    :type db: Session
+    :type db: AsyncSession
     :return: Updated contact.
     :rtype: Contact | None
     """
-
-    contact = db.query(Contact).filter(and_(Contact.user_id == user.id, Contact.id == contact_id)).first()
-    if contact:
-        db.delete(contact)
-        db.commit()
+    stmt = delete(Contact).filter(and_(Contact.user_id == user.id, Contact.id == contact_id)) \
+        .returning(Contact).execution_options(synchronize_session=False)
+    contact = await db.execute(stmt)
+    contact = contact.scalars().first()
+    await db.commit()
     return contact
+
+
+async def apply_batch(operations: list[ContactBatchOperation], user: User,
+                      db: AsyncSession) -> list[ContactBatchResult]:
+    """
+    Applies create, update, note and delete operations in one transaction with one statement per kind.
+
+    Operations are applied grouped by kind in this order: create, update, note, delete.
+    Operations on contacts that do not exist or belong to another user get status 404, the status is taken from
+    the rows each statement returned.
+
+    :param operations: The operations to be applied.
+    :type operations: List[ContactBatchOperation]
+    :param user: The user to apply the operations for.
+    :type user: User
+    :param db: The database session.
+    :type db: AsyncSession
+    :return: Status of every operation.
+    :rtype: List[ContactBatchResult]
+    """
+    results = [ContactBatchResult(index=index, op=operation.op, status=404, id=operation.id)
+               for index, operation in enumerate(operations)]
+    indexes = defaultdict(list)
+    for index, operation in enumerate(operations):
+        indexes[operation.op].append(index)
+
+    if indexes['create']:
+        created = await db.execute(insert(Contact).returning(Contact.id, sort_by_parameter_order=True), [
+            dict(first_name=contact.first_name, last_name=contact.last_name, email=contact.email,
+                 phone_number=contact.phone_number, birthday=contact.birthday, user_id=user.id)
+            for contact in (operations[index].contact for index in indexes['create'])
+        ])
+        for index, contact_id in zip(indexes['create'], created.scalars().all()):
+            results[index].status = 201
+            results[index].id = contact_id
+
+    contacts = Contact.__table__
+    for op in ('update', 'note'):
+        if not indexes[op]:
+            continue
+        rows = {}  # the last operation on a contact wins
+        for index in indexes[op]:
+            operation = operations[index]
+            rows[operation.id] = operation.contact.model_dump() if op == 'update' else dict(notes=operation.notes)
+        names = list(next(iter(rows.values())))
+        batch = values(column('id', Integer), *(column(name, contacts.c[name].type) for name in names),
+                       name='batch').data([(contact_id, *row.values()) for contact_id, row in rows.items()])
+        updated = await db.execute(update(contacts).where(and_(contacts.c.user_id == user.id,
+                                                               contacts.c.id == batch.c.id))
+                                   .values({name: batch.c[name] for name in names}).returning(contacts.c.id))
+        updated = set(updated.scalars().all())
+        for index in indexes[op]:
+            if operations[index].id in updated:
+                results[index].status = 200
+
+    if indexes['delete']:
+        deletes = [operations[index].id for index in indexes['delete']]
+        deleted = await db.execute(delete(Contact).where(and_(
+            Contact.user_id == user.id, Contact.id == any_(literal(deletes, ARRAY(Integer))))).returning(Contact.id)
+            .execution_options(synchronize_session=False))
+        deleted = set(deleted.scalars().all())
+        for index in indexes['delete']:
+            if operations[index].id in deleted:
+                results[index].status = 200
+
+    await db.commit()
+    return results
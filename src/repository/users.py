@@ -1,38 +1,33 @@
 from libgravatar import Gravatar
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from src.database.models import User
 from src.schemas import UserModel
-from src.conf.config import settings
 
-import redis
 
-import pickle
-
-r = redis.Redis(host=settings.redis_host, port=settings.redis_port, db=0)
-
-
-async def get_user_by_email(email: str, db: Session) -> User:
+async def get_user_by_email(email: str, db: AsyncSession) -> User:
     """
-    Retrieves a user with specific email.
+    Retrieves a user with specific email, always from the primary database.
 
     :param email: User email.
     :type email: str
     :param db: The database session.
-    :type db: Session
+    :type db: AsyncSession
     :return: User.
     :rtype: User
     """
-    return db.query(User).filter(User.email == email).first()
+    user = await db.execute(select(User).filter(User.email == email).execution_options(primary=True))
+    return user.scalars().first()
 
 
-async def create_user(body: UserModel, db: Session) -> User:
+async def create_user(body: UserModel, db: AsyncSession) -> User:
     """
     Creates the user.
 
     :param body: Dictionary with user's data.
     :type body: UserModel
     :param db: The database session.
-    :type db: Session
+    :type db: AsyncSession
     :return: User.
     :rtype: User
     """
@@ -44,12 +39,12 @@ async def create_user(body: UserModel, db: Session) -> User:
         print(e)
     new_user = User(**body.dict(), avatar=avatar)
     db.add(new_user)
-    db.commit()
-    db.refresh(new_user)
+    await db.commit()
+    await db.refresh(new_user)
     return new_user
 
 
-async def update_token(user: User, token: str | None, db: Session) -> None:
+async def update_token(user: User, token: str | None, db: AsyncSession) -> None:
     """
     Updates token.
 
@@ -58,31 +53,48 @@ async def update_token(user: User, token: str | None, db: Session) -> None:
     :param token: token to be overwritten.
     :type token: str | None
     :param db: The database session.
-    :type db: Session
+    :type db: AsyncSession
     :return: None.
     :rtype: None
     """
     user.refresh_token = token
-    db.commit()
+    await db.commit()
+
+
+async def update_password(user: User, password: str, db: AsyncSession) -> None:
+    """
+    Updates the password hash.
+
+    :param user: specific user.
+    :type user: User
+    :param password: new hash of the password.
+    :type password: str
+    :param db: The database session.
+    :type db: AsyncSession
+    :return: None.
+    :rtype: None
+    """
+    user.password = password
+    await db.commit()
 
 
-async def confirmed_email(email: str, db: Session) -> None:
+async def confirmed_email(email: str, db: AsyncSession) -> None:
     """
     Changes status of user to 'confirmed' after email confirmation.
 
     :param email: email to be confirmed.
     :type email: str
     :param db: The database session.
-    :type db: Session
+    :type db: AsyncSession
     :return: None.
     :rtype: None
     """
     user = await get_user_by_email(email, db)
     user.confirmed = True
-    db.commit()
+    await db.commit()
 
 
-async def update_avatar(email: str, url: str, db: Session) -> User:
+async def update_avatar(email: str, url: str, db: AsyncSession) -> User:
     """
     Changes avatar of user.
 
@@ -91,13 +103,13 @@ async def update_avatar(email: str, url: str, db: Session) -> User:
     :param url: url of the avatar image.
     :type url: str
     :param db: The database session.
-    :type db: Session
+    :type db: AsyncSession
     :return: User.
     :rtype: User
     """
     user = await get_user_by_email(email, db)
     user.avatar = url
-    db.commit()
+    await db.commit()
     return user
 
 
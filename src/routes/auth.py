@@ -1,51 +1,54 @@
 from typing import List
-from fastapi import APIRouter, HTTPException, Depends, status, Security, BackgroundTasks, Request
+from fastapi import APIRouter, HTTPException, Depends, status, Security, Request
 from fastapi.security import OAuth2PasswordRequestForm, HTTPAuthorizationCredentials, HTTPBearer
-from sqlalchemy.orm import Session
+from redis.asyncio import Redis
+from sqlalchemy.ext.asyncio import AsyncSession
 from src.database.db import get_db
+from src.database.redis_pool import get_redis
 from src.schemas import UserModel, UserResponse, TokenModel, RequestEmail
 from src.repository import users as repository_users
 from src.services.auth import auth_service
-from src.services.email import send_email
+from src.services.email_queue import enqueue_email
 
 router = APIRouter(prefix='/auth', tags=['auth'])
 security = HTTPBearer()
 
 
 @router.post("/signup", response_model=UserResponse, status_code=status.HTTP_201_CREATED)
-async def signup(body: UserModel, background_tasks: BackgroundTasks, request: Request, db: Session = Depends(get_db)):
+async def signup(body: UserModel, request: Request, db: AsyncSession = Depends(get_db),
+                 r: Redis = Depends(get_redis)):
     """
-    Adding a new user to database.
+    Adding a new user to database and queueing the confirmation email.
 
     :param body: new user data.
     :type body: UserModel
-    :param background_tasks: object of FastAPI background task.
-    :type background_tasks: BackgroundTasks
     :param request: request object.
     :type request: Request
     :param db: The database session.
-    :type db: Session
+    :type db: AsyncSession
+    :param r: The Redis client.
+    :type r: Redis
     :return: Updated contact.
     :rtype: Dict
     """
     exist_user = await repository_users.get_user_by_email(body.email, db)
     if exist_user:
         raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Account already exists")
-    body.password = auth_service.get_password_hash(body.password)
+    body.password = await auth_service.get_password_hash(body.password)
     new_user = await repository_users.create_user(body, db)
-    background_tasks.add_task(send_email, new_user.email, new_user.username, request.base_url)
+    await enqueue_email(new_user.email, new_user.username, str(request.base_url), r)
     return {"user": new_user, "detail": "User successfully created. Check your email for confirmation."}
 
 
 @router.post('/login', response_model=TokenModel)
-async def login(body: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
+async def login(body: OAuth2PasswordRequestForm = Depends(), db: AsyncSession = Depends(get_db)):
     """
     Function for logging of the user.
 
     :param body: new user data from the logging form.
     :type body: OAuth2PasswordRequestForm
     :param db: The database session.
-    :type db: Session
+    :type db: AsyncSession
     :return: Updated contact.
     :rtype: Dict
     """
@@ -54,8 +57,11 @@ async def login(body: OAuth2PasswordRequestForm = Depends(), db: Session = Depen
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail='Invalid email')
     if not user.confirmed:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail='Email not confirmed')
-    if not auth_service.verify_password(body.password, user.password):
+    verified, new_hash = await auth_service.verify_and_update_password(body.password, user.password)
+    if not verified:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail='Invalid password')
+    if new_hash:
+        await repository_users.update_password(user, new_hash, db)
     access_token = await auth_service.create_access_token(data={'sub': user.email})
     refresh_token = await auth_service.create_refresh_token(data={'sub': user.email})
     await repository_users.update_token(user, refresh_token, db)
@@ -63,38 +69,42 @@ async def login(body: OAuth2PasswordRequestForm = Depends(), db: Session = Depen
 
 
 @router.get('/refresh_token', response_model=TokenModel)
-async def refresh_token(credentials: HTTPAuthorizationCredentials = Security(security), db: Session = Depends(get_db)):
+async def refresh_token(credentials: HTTPAuthorizationCredentials = Security(security), db: AsyncSession = Depends(get_db)):
     """
     Function for refreshing the tokens.
 
     :param credentials: security credentials of the user.
     :type credentials: HTTPAuthorizationCredentials
     :param db: The database session.
-    :type db: Session
+    :type db: AsyncSession
     :return: Updated contact.
     :rtype: Dict
     """
     token = credentials.credentials
     email = await auth_service.decode_refresh_token(token)
-    user = repository_users.get_user_by_email(email, db)
+    user = await repository_users.get_user_by_email(email, db)
     if user.refresh_token != token:
+        auth_service.forget_token(token)
         await repository_users.update_token(user, None, db)
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail='Invalid refresh token')
     access_token = await auth_service.create_access_token(data={'sub': user.email})
     refresh_token = await auth_service.create_refresh_token(data={'sub': user.email})
+    auth_service.forget_token(token)
     await repository_users.update_token(user, refresh_token, db)
     return {'access_token': access_token, 'refresh_token': refresh_token, 'token_type': 'bearer'}
 
 
 @router.get('/confirmed_email/{token}')
-async def confirmed_email(token: str, db: Session = Depends(get_db)):
+async def confirmed_email(token: str, db: AsyncSession = Depends(get_db), r: Redis = Depends(get_redis)):
     """
     Sending confirmation email to user after signup.
 
     :param token: security token for email confirmation.
     :type token: str
     :param db: The database session.
-    :type db: Session
+    :type db: AsyncSession
+    :param r: The Redis client.
+    :type r: Redis
     :return: Updated contact.
     :rtype: Dict
     """
@@ -105,23 +115,24 @@ async def confirmed_email(token: str, db: Session = Depends(get_db)):
     if user.confirmed:
         return {"message": "Your email is already confirmed"}
     await repository_users.confirmed_email(email, db)
+    await auth_service.invalidate_user(email, r)
     return {"message": "Email confirmed"}
 
 
 @router.post('/request_email')
-async def request_email(body: RequestEmail, background_tasks: BackgroundTasks, request: Request,
-                        db: Session = Depends(get_db)):
+async def request_email(body: RequestEmail, request: Request, db: AsyncSession = Depends(get_db),
+                        r: Redis = Depends(get_redis)):
     """
-    Check if the user is already confirmed or not.
+    Check if the user is already confirmed or not, queues the confirmation email again if not.
 
     :param body: Body with email.
     :type body: RequestEmail
-    :param background_tasks: background task.
-    :type background_tasks: BackgroundTasks
     :param request: request object.
     :type request: Request
     :param db: The database session.
-    :type db: Session
+    :type db: AsyncSession
+    :param r: The Redis client.
+    :type r: Redis
     :return: Updated contact.
     :rtype: Dict
     """
@@ -130,5 +141,5 @@ async def request_email(body: RequestEmail, background_tasks: BackgroundTasks, r
     if user.confirmed:
         return {"message": "Your email is already confirmed"}
     if user:
-        background_tasks.add_task(send_email, user.email, user.username, request.base_url)
+        await enqueue_email(user.email, user.username, str(request.base_url), r)
     return {"message": "Check your email for confirmation."}
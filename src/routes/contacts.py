@@ -1,23 +1,58 @@
-from typing import List
-from fastapi import APIRouter, HTTPException, Depends, status
-from sqlalchemy.orm import Session
-from src.database.db import get_db
-from src.schemas import ContactModel, ContactResponse, NotesContact, UserModel
+from typing import List, Literal
+from datetime import date
+from fastapi import APIRouter, HTTPException, Depends, status, UploadFile, File, Header, Query
+from fastapi.responses import StreamingResponse
+from fastapi.concurrency import iterate_in_threadpool
+from pydantic import TypeAdapter
+from redis.asyncio import Redis
+from sqlalchemy.ext.asyncio import AsyncSession
+from src.database.db import get_db, get_stream_db, pin_primary
+from src.database.redis_pool import get_redis
+from src.schemas import (ContactModel, ContactResponse, NotesContact, UserModel, ContactImportResponse,
+                         ContactBatchRequest, ContactBatchResult, NoteModel, NotesCountResponse,
+                         ContactSearchResponse, ContactChangesResponse)
 from src.repository import contacts as repository_contacts
 from src.database.models import User
 from src.services.auth import auth_service
-from fastapi_limiter.depends import RateLimiter
+from src.services.pagination import encode_cursor, decode_cursor, encode_sync_token, decode_sync_token
+from src.services.contacts_io import parse_contacts, render_contacts
+from src.services.response_cache import response_cache, render, render_rows
+from src.services.etag import contacts_etag, etag_matches, not_modified
 
 
 router = APIRouter(prefix='/contacts', tags=['contacts'])
 
+MAX_IMPORT_ERRORS = 1000
+MAX_CHANGES = 5000
+
+CONTACT = TypeAdapter(ContactResponse)
+CONTACT_FIELDS = tuple(ContactResponse.model_fields)
+SEARCH_FIELDS = tuple(ContactSearchResponse.model_fields)
+RATE_LIMITED = 'Rate limited per user, the quota is returned in the RateLimit-* headers'
+
+
+def page_headers(contacts: list, limit: int) -> dict[str, str]:
+    """
+    Creates the ETag and X-Next-Cursor headers of a page of contacts.
+
+    :param contacts: Contacts or rows with id and updated_at.
+    :type contacts: list
+    :param limit: The page size.
+    :type limit: int
+    :return: Headers.
+    :rtype: dict[str, str]
+    """
+    headers = {'ETag': contacts_etag((contact.id, contact.updated_at) for contact in contacts)}
+    if contacts and len(contacts) == limit:
+        headers['X-Next-Cursor'] = encode_cursor(contacts[-1].id)
+    return headers
+
 
 @router.post('/', response_model=ContactResponse,
-             description='No more than 10 requests per minute',
-             dependencies=[Depends(RateLimiter(times=10, seconds=60))])
+             description=RATE_LIMITED)
 async def create_contact(body: ContactModel,
                          current_user: User = Depends(auth_service.get_current_user),
-                         db: Session = Depends(get_db)):
+                         db: AsyncSession = Depends(get_db), r: Redis = Depends(get_redis)):
     """
     Creates new contact for specific user.
 
@@ -26,67 +61,180 @@ async def create_contact(body: ContactModel,
     :param current_user: current user.
     :type current_user: User
     :param db: The database session.
-    :type db: Session
+    :type db: AsyncSession
+    :param r: The Redis client.
+    :type r: Redis
     :return: A list of notes.
     :rtype: Contact
     """
-    return await repository_contacts.create_contact(body, current_user, db)
+    contact = await repository_contacts.create_contact(body, current_user, db)
+    await response_cache.invalidate(current_user.id, r)
+    return contact
+
+
+@router.post('/import', response_model=ContactImportResponse,
+             description=RATE_LIMITED)
+async def import_contacts(file: UploadFile = File(), file_format: Literal['csv', 'ndjson'] = 'csv',
+                          current_user: User = Depends(auth_service.get_current_user),
+                          db: AsyncSession = Depends(get_db), r: Redis = Depends(get_redis)):
+    """
+    Imports contacts from a CSV file with a header row or from an NDJSON file.
+
+    Rows are validated and inserted in chunks, every chunk is committed separately. Invalid rows are skipped
+    and reported, at most MAX_IMPORT_ERRORS of them, CSV rows by record and NDJSON rows by line number. A CSV
+    file that is not UTF-8 or can not be parsed is reported as an error of the row where reading stopped, the
+    rows before it are imported.
+
+    :param file: The CSV or NDJSON file.
+    :type file: UploadFile
+    :param file_format: csv or ndjson.
+    :type file_format: str
+    :param current_user: current user.
+    :type current_user: User
+    :param db: The database session.
+    :type db: AsyncSession
+    :param r: The Redis client.
+    :type r: Redis
+    :return: The number of imported contacts and the row errors.
+    :rtype: ContactImportResponse
+    """
+    result = ContactImportResponse()
+    try:
+        # Reading and validating a chunk is CPU work, it runs in the thread pool to keep the event loop free.
+        async for contacts, errors in iterate_in_threadpool(parse_contacts(file.file, file_format)):
+            result.imported += await repository_contacts.create_contacts(contacts, current_user, db)
+            result.failed += len(errors)
+            result.errors.extend(errors[:MAX_IMPORT_ERRORS - len(result.errors)])
+    finally:
+        # Chunks are committed one by one, so even a failed import may have changed the contacts.
+        if result.imported:
+            await response_cache.invalidate(current_user.id, r)
+    result.errors_truncated = result.failed > len(result.errors)
+    return result
+
+
+@router.post('/batch', response_model=List[ContactBatchResult],
+             description=RATE_LIMITED)
+async def batch_contacts(body: ContactBatchRequest,
+                         current_user: User = Depends(auth_service.get_current_user),
+                         db: AsyncSession = Depends(get_db), r: Redis = Depends(get_redis)):
+    """
+    Creates, updates, replaces notes of and removes many contacts in one transaction.
+
+    :param body: The list of operations.
+    :type body: ContactBatchRequest
+    :param current_user: current user.
+    :type current_user: User
+    :param db: The database session.
+    :type db: AsyncSession
+    :param r: The Redis client.
+    :type r: Redis
+    :return: Status of every operation.
+    :rtype: List[ContactBatchResult]
+    """
+    results = await repository_contacts.apply_batch(body.operations, current_user, db)
+    await response_cache.invalidate(current_user.id, r)
+    return results
 
 
 @router.get('/', response_model=List[ContactResponse],
-            description='No more than 10 requests per minute',
-            dependencies=[Depends(RateLimiter(times=10, seconds=60))])
-async def read_contacts(skip: int = 0, limit: int = 100,
+            description=RATE_LIMITED + '. '
+                        'The cursor of the next page is returned in the X-Next-Cursor header. '
+                        'Send the ETag back in If-None-Match to get 304 when the page has not changed.')
+async def read_contacts(skip: int = 0, limit: int = 100, after: str | None = None,
+                        if_none_match: str | None = Header(default=None),
                         current_user: User = Depends(auth_service.get_current_user),
-                        db: Session = Depends(get_db)):
+                        db: AsyncSession = Depends(get_db), r: Redis = Depends(get_redis)):
     """
     Retrieves required number of contacts for specific user with specific pagination parameters.
 
+    When the client sends the ETag of its copy and the page has not changed, only the IDs and update times are
+    read and 304 is returned.
+
     :param skip: The number of contacts to skip.
     :type skip: int
     :param limit: The maximum number of contacts to return.
     :type limit: int
+    :param after: cursor of the page from the X-Next-Cursor header, replaces skip.
+    :type after: str | None
+    :param if_none_match: ETag of the page the client has.
+    :type if_none_match: str | None
     :param current_user: current user.
     :type current_user: User
     :param db: The database session.
-    :type db: Session
+    :type db: AsyncSession
+    :param r: The Redis client.
+    :type r: Redis
     :return: A list of notes.
     :rtype: Contact
     """
-    contacts = await repository_contacts.read_contacts(skip, limit, current_user, db)
-    return contacts
+    after_id = decode_cursor(after) if after else None
+    key, cached = await response_cache.lookup(current_user.id, 'read_contacts',
+                                              {'skip': skip, 'limit': limit, 'after': after_id}, r)
+    if cached:
+        return not_modified(cached.headers) if etag_matches(if_none_match, cached.headers.get('etag')) else cached
+    if key is None:
+        pin_primary(db)
+    if if_none_match:
+        versions = await repository_contacts.read_contact_versions(skip, limit, current_user, db, after=after_id)
+        headers = page_headers(versions, limit)
+        if etag_matches(if_none_match, headers['ETag']):
+            return not_modified(headers)
+    contacts = await repository_contacts.read_contacts(skip, limit, current_user, db, after=after_id)
+    return await response_cache.store(key, render_rows(contacts, CONTACT_FIELDS), page_headers(contacts, limit), r)
 
 
-@router.get('/search', response_model=List[ContactResponse],
-            description='No more than 10 requests per minute',
-            dependencies=[Depends(RateLimiter(times=10, seconds=60))])
-async def search_contact(contact_info: str,
+@router.get('/search', response_model=List[ContactSearchResponse],
+            description=RATE_LIMITED + '. '
+                        'contact_info matches the start of first name, last name or email, '
+                        'q is a ranked full-text search over names, email and notes.')
+async def search_contact(contact_info: str | None = None, q: str | None = None, skip: int = 0, limit: int = 100,
                          current_user: User = Depends(auth_service.get_current_user),
-                         db: Session = Depends(get_db)):
+                         db: AsyncSession = Depends(get_db), r: Redis = Depends(get_redis)):
     """
-    Retrieves the contacts with corresponding info.
+    Retrieves the contacts whose first name, last name or email starts with the info, or, when q is given,
+    the contacts matching the full-text query ranked by relevance with a highlighted snippet.
 
     :param contact_info: The information about contact to search for.
-    :type contact_info: int
+    :type contact_info: str | None
+    :param q: The full-text query.
+    :type q: str | None
+    :param skip: The number of contacts to skip.
+    :type skip: int
+    :param limit: The maximum number of contacts to return.
+    :type limit: int
     :param current_user: current user.
     :type current_user: User
     :param db: The database session.
-    :type db: Session
-    :return: A list of notes.
-    :rtype: Contact
+    :type db: AsyncSession
+    :param r: The Redis client.
+    :type r: Redis
+    :return: A list of contacts.
+    :rtype: List[ContactSearchResponse]
     """
-    contacts = await repository_contacts.search_contact(contact_info, current_user, db)
-    if len(contacts) == 0:
+    if not q and not contact_info:
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail='contact_info or q is required')
+    key, cached = await response_cache.lookup(
+        current_user.id, 'search_contact', {'contact_info': contact_info, 'q': q, 'skip': skip, 'limit': limit}, r)
+    if cached:
+        return cached
+    if key is None:
+        pin_primary(db)
+    if q:
+        rows = await repository_contacts.search_contacts_text(q, skip, limit, current_user, db)
+    else:
+        rows = [(*row, None, None) for row in
+                await repository_contacts.search_contact(contact_info, skip, limit, current_user, db)]
+    if len(rows) == 0:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail='Contact not found')
-    return contacts
+    return await response_cache.store(key, render_rows(rows, SEARCH_FIELDS), {}, r)
 
 
 @router.get('/birthdays', response_model=List[ContactResponse],
-            description='No more than 10 requests per minute',
-            dependencies=[Depends(RateLimiter(times=10, seconds=60))])
+            description=RATE_LIMITED)
 async def birthdays(period: int,
                     current_user: User = Depends(auth_service.get_current_user),
-                    db: Session = Depends(get_db)):
+                    db: AsyncSession = Depends(get_db), r: Redis = Depends(get_redis)):
     """
     Retrieves the contacts with birthdays in corresponding period.
 
@@ -95,46 +243,129 @@ async def birthdays(period: int,
     :param current_user: The user to retrieve contacts for.
     :type current_user: User
     :param db: The database session.
-    :type db: Session
+    :type db: AsyncSession
+    :param r: The Redis client.
+    :type r: Redis
     :return: A list of contacts.
     :rtype: Contact
     """
+    key, cached = await response_cache.lookup(current_user.id, 'birthdays',
+                                              {'period': period, 'today': date.today()}, r)
+    if cached:
+        return cached
+    if key is None:
+        pin_primary(db)
     contacts = await repository_contacts.birthdays(period, current_user, db)
     if len(contacts) == 0:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail='Contact not found')
-    return contacts
+    return await response_cache.store(key, render_rows(contacts, CONTACT_FIELDS), {}, r)
+
+
+@router.get('/export', response_class=StreamingResponse,
+            description=RATE_LIMITED)
+async def export_contacts(file_format: Literal['csv', 'ndjson'] = 'ndjson',
+                          current_user: User = Depends(auth_service.get_current_user),
+                          db: AsyncSession = Depends(get_stream_db)):
+    """
+    Streams all contacts of specific user as an NDJSON or CSV file.
+
+    The rows are read through a server-side cursor in a session from get_stream_db, because the session of
+    get_db is closed before a streaming response is sent.
+
+    :param file_format: csv or ndjson.
+    :type file_format: str
+    :param current_user: current user.
+    :type current_user: User
+    :param db: The database session, closed by the response.
+    :type db: AsyncSession
+    :return: The file.
+    :rtype: StreamingResponse
+    """
+    async def content():
+        async with db:
+            async for chunk in render_contacts(repository_contacts.stream_contacts(current_user, db), file_format):
+                yield chunk
+
+    media_type = 'text/csv' if file_format == 'csv' else 'application/x-ndjson'
+    return StreamingResponse(content(), media_type=media_type,
+                             headers={'Content-Disposition': f'attachment; filename="contacts.{file_format}"'})
+
+
+@router.get('/changes', response_model=ContactChangesResponse,
+            description=RATE_LIMITED + '. '
+                        'Send sync_token of the previous response as since, repeat while has_more is true. '
+                        'A token older than the tombstone retention gets 410, then sync again without since.')
+async def read_changes(since: str | None = None, limit: int = Query(default=1000, ge=1, le=MAX_CHANGES),
+                       current_user: User = Depends(auth_service.get_current_user),
+                       db: AsyncSession = Depends(get_db)):
+    """
+    Retrieves the contacts created, updated and deleted since the sync token, everything without it.
+
+    :param since: sync token of the previous response.
+    :type since: str | None
+    :param limit: The maximum number of changes to return, at most MAX_CHANGES.
+    :type limit: int
+    :param current_user: current user.
+    :type current_user: User
+    :param db: The database session.
+    :type db: AsyncSession
+    :return: The changes and the next sync token.
+    :rtype: ContactChangesResponse
+    """
+    since_change = decode_sync_token(since) if since else (0, 0)
+    changes = await repository_contacts.read_changes(since_change, limit, current_user, db)
+    if changes is None:
+        raise HTTPException(status_code=status.HTTP_410_GONE, detail='Sync token expired, sync again without since')
+    contacts, tombstones, last_change, has_more = changes
+    created = [contact for contact in contacts if (contact.created_xid, contact.created_seq) > since_change]
+    updated = [contact for contact in contacts if (contact.created_xid, contact.created_seq) <= since_change]
+    return ContactChangesResponse(created=created, updated=updated,
+                                  deleted=[tombstone.contact_id for tombstone in tombstones],
+                                  sync_token=encode_sync_token(*last_change), has_more=has_more)
 
 
 @router.get('/{contact_id}', response_model=ContactResponse,
-            description='No more than 10 requests per minute',
-            dependencies=[Depends(RateLimiter(times=10, seconds=60))])
-async def read_contact(contact_id: int,
+            description=RATE_LIMITED)
+async def read_contact(contact_id: int, if_none_match: str | None = Header(default=None),
                        current_user: User = Depends(auth_service.get_current_user),
-                       db: Session = Depends(get_db)):
+                       db: AsyncSession = Depends(get_db), r: Redis = Depends(get_redis)):
     """
     Retrieves a single contact with the specified ID for a specific user.
 
     :param contact_id: ID of specific contact.
     :type contact_id: int
+    :param if_none_match: ETag of the contact the client has.
+    :type if_none_match: str | None
     :param current_user: The user to retrieve contacts for.
     :type current_user: User
     :param db: The database session.
-    :type db: Session
+    :type db: AsyncSession
+    :param r: The Redis client.
+    :type r: Redis
     :return: A list of contacts.
     :rtype: Contact
     """
+    key, cached = await response_cache.lookup(current_user.id, 'read_contact', {'contact_id': contact_id}, r)
+    if cached:
+        return not_modified(cached.headers) if etag_matches(if_none_match, cached.headers.get('etag')) else cached
+    if key is None:
+        pin_primary(db)
+    if if_none_match:
+        version = await repository_contacts.read_contact_version(contact_id, current_user, db)
+        if version and etag_matches(if_none_match, contacts_etag([version])):
+            return not_modified({'ETag': contacts_etag([version])})
     contact = await repository_contacts.read_contact(contact_id, current_user, db)
     if contact is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail='Contact not found')
-    return contact
+    headers = {'ETag': contacts_etag([(contact.id, contact.updated_at)])}
+    return await response_cache.store(key, render(CONTACT, contact), headers, r)
 
 
 @router.put('/{contact_id}', response_model=ContactResponse,
-            description='No more than 10 requests per minute',
-            dependencies=[Depends(RateLimiter(times=10, seconds=60))])
+            description=RATE_LIMITED)
 async def update_contact(contact_id: int, body: ContactModel,
                          current_user: User = Depends(auth_service.get_current_user),
-                         db: Session = Depends(get_db)):
+                         db: AsyncSession = Depends(get_db), r: Redis = Depends(get_redis)):
     """
     Updates a single contact with the specified ID for a specific user.
 
@@ -145,22 +376,24 @@ async def update_contact(contact_id: int, body: ContactModel,
     :param current_user: The user to be updated.
     :type current_user: User
     :param db: The database session.
-    :type db: Session
+    :type db: AsyncSession
+    :param r: The Redis client.
+    :type r: Redis
     :return: Updated contact.
     :rtype: Contact
     """
     contact = await repository_contacts.update_contact(contact_id, body, current_user, db)
     if contact is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail='Contact not found')
+    await response_cache.invalidate(current_user.id, r)
     return contact
 
 
 @router.patch('/{contact_id}', response_model=ContactResponse,
-              description='No more than 10 requests per minute',
-              dependencies=[Depends(RateLimiter(times=10, seconds=60))])
+              description=RATE_LIMITED)
 async def add_note(contact_id: int, body: NotesContact,
                    current_user: User = Depends(auth_service.get_current_user),
-                   db: Session = Depends(get_db)):
+                   db: AsyncSession = Depends(get_db), r: Redis = Depends(get_redis)):
     """
     Adding a note to specific contact.
 
@@ -171,22 +404,107 @@ async def add_note(contact_id: int, body: NotesContact,
     :param current_user: The user to be added the note.
     :type current_user: User
     :param db: The database session.
-    :type db: Session
+    :type db: AsyncSession
+    :param r: The Redis client.
+    :type r: Redis
     :return: Updated contact.
     :rtype: Contact
     """
     contact = await repository_contacts.add_note(contact_id, body, current_user, db)
     if contact is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail='Contact not found')
+    await response_cache.invalidate(current_user.id, r)
     return contact
 
 
+@router.get('/{contact_id}/notes', response_model=List[str],
+            description=RATE_LIMITED)
+async def read_notes(contact_id: int, skip: int = 0, limit: int = 100,
+                     current_user: User = Depends(auth_service.get_current_user),
+                     db: AsyncSession = Depends(get_db)):
+    """
+    Retrieves a page of the notes of specific contact.
+
+    :param contact_id: ID of specific contact.
+    :type contact_id: int
+    :param skip: The number of notes to skip.
+    :type skip: int
+    :param limit: The maximum number of notes to return.
+    :type limit: int
+    :param current_user: The owner of the contact.
+    :type current_user: User
+    :param db: The database session.
+    :type db: AsyncSession
+    :return: A list of notes.
+    :rtype: List[str]
+    """
+    notes = await repository_contacts.read_notes(contact_id, skip, limit, current_user, db)
+    if notes is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail='Contact not found')
+    return notes
+
+
+@router.post('/{contact_id}/notes', response_model=NotesCountResponse, status_code=status.HTTP_201_CREATED,
+             description=RATE_LIMITED)
+async def append_note(contact_id: int, body: NoteModel,
+                      current_user: User = Depends(auth_service.get_current_user),
+                      db: AsyncSession = Depends(get_db), r: Redis = Depends(get_redis)):
+    """
+    Appends a note to specific contact without sending the other notes back and forth.
+
+    :param contact_id: ID of specific contact.
+    :type contact_id: int
+    :param body: The note to be appended.
+    :type body: NoteModel
+    :param current_user: The owner of the contact.
+    :type current_user: User
+    :param db: The database session.
+    :type db: AsyncSession
+    :param r: The Redis client.
+    :type r: Redis
+    :return: The number of notes.
+    :rtype: NotesCountResponse
+    """
+    count = await repository_contacts.append_note(contact_id, body.note, current_user, db)
+    if count is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail='Contact not found')
+    await response_cache.invalidate(current_user.id, r)
+    return NotesCountResponse(count=count)
+
+
+@router.delete('/{contact_id}/notes', response_model=NotesCountResponse,
+               description=RATE_LIMITED)
+async def delete_note(contact_id: int, note: str,
+                      current_user: User = Depends(auth_service.get_current_user),
+                      db: AsyncSession = Depends(get_db), r: Redis = Depends(get_redis)):
+    """
+    Removes every occurrence of a note from specific contact.
+
+    :param contact_id: ID of specific contact.
+    :type contact_id: int
+    :param note: The note to be removed.
+    :type note: str
+    :param current_user: The owner of the contact.
+    :type current_user: User
+    :param db: The database session.
+    :type db: AsyncSession
+    :param r: The Redis client.
+    :type r: Redis
+    :return: The number of notes.
+    :rtype: NotesCountResponse
+    """
+    count = await repository_contacts.delete_note(contact_id, note, current_user, db)
+    if count is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail='Contact not found')
+    await response_cache.invalidate(current_user.id, r)
+    return NotesCountResponse(count=count)
+
+
 @router.delete('/{contact_id}', response_model=ContactResponse,
-               description='No more than 10 requests per minute',
-               dependencies=[Depends(RateLimiter(times=10, seconds=60))])
+               description=RATE_LIMITED)
 async def remove_contact(contact_id: int,
                          current_user: User = Depends(auth_service.get_current_user),
-                         db: Session = Depends(get_db)):
+                         db: AsyncSession = Depends(get_db), r: Redis = Depends(get_redis)):
     """
     Removing of specific contact.
 
@@ -195,11 +513,14 @@ async def remove_contact(contact_id: int,
     :param current_user: The user to be removed.
     :type current_user: User
     :param db: The database session.
-    :type db: Session
+    :type db: AsyncSession
+    :param r: The Redis client.
+    :type r: Redis
     :return: Updated contact.
     :rtype: Contact
     """
     contact = await repository_contacts.remove_contact(contact_id, current_user, db)
     if contact is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail='Contact not found')
+    await response_cache.invalidate(current_user.id, r)
     return contact
@@ -0,0 +1,32 @@
+from fastapi import APIRouter, Depends
+from redis.asyncio import Redis
+
+from src.database.db import engine, replica_engines
+from src.database.redis_pool import get_redis
+from src.services.auth import auth_service
+from src.services.email_queue import queue_stats
+from src.services.rate_limit import rate_limiter
+from src.services.response_cache import response_cache
+
+
+router = APIRouter(prefix='/metrics', tags=['metrics'])
+
+
+@router.get('/')
+async def read_metrics(r: Redis = Depends(get_redis)):
+    """
+    Retrieves the counters of this worker and the state of the email queue.
+
+    :param r: The Redis client.
+    :type r: Redis
+    :return: dictionary with counters.
+    :rtype: Dict
+    """
+    return {'user_cache': auth_service.user_cache.stats(),
+            'token_cache': auth_service.token_cache.stats(),
+            'password_hashing': auth_service.hashing_stats(),
+            'response_cache': response_cache.stats(),
+            'rate_limit': rate_limiter.stats(),
+            'db_pool': engine.pool.stats(),
+            'db_replica_pools': [replica.pool.stats() for replica in replica_engines],
+            'email_queue': await queue_stats(r)}
@@ -1,11 +1,11 @@
-import pickle
-
 from fastapi import APIRouter, Depends, status, UploadFile, File
-from sqlalchemy.orm import Session
+from redis.asyncio import Redis
+from sqlalchemy.ext.asyncio import AsyncSession
 import cloudinary
 import cloudinary.uploader
 
 from src.database.db import get_db
+from src.database.redis_pool import get_redis
 from src.database.models import User
 from src.repository import users as repository_users
 from src.services.auth import auth_service
@@ -32,7 +32,8 @@ async def read_users_me(current_user: User = Depends(auth_service.get_current_us
 @router.patch('/avatar', response_model=UserDb)
 async def update_avatar_user(file: UploadFile = File(),
                              current_user: User = Depends(auth_service.get_current_user),
-                             db: Session = Depends(get_db)):
+                             db: AsyncSession = Depends(get_db),
+                             r: Redis = Depends(get_redis)):
     """
     Changes avatar of user.
 
@@ -41,7 +42,9 @@ async def update_avatar_user(file: UploadFile = File(),
     :param current_user: current user.
     :type current_user: User
     :param db: The database session.
-    :type db: Session
+    :type db: AsyncSession
+    :param r: The Redis client.
+    :type r: Redis
     :return: User.
     :rtype: User
     """
@@ -52,11 +55,11 @@ async def update_avatar_user(file: UploadFile = File(),
         secure=True
     )
 
-    r = cloudinary.uploader.upload(file.file, public_id=f'NotesApp/{current_user.username}', overwrite=True)
+    upload_result = cloudinary.uploader.upload(file.file, public_id=f'NotesApp/{current_user.username}',
+                                               overwrite=True)
     src_url = cloudinary.CloudinaryImage(f'NotesApp/{current_user.username}')\
-                        .build_url(width=250, height=250, crop='fill', version=r.get('version'))
+                        .build_url(width=250, height=250, crop='fill', version=upload_result.get('version'))
     user = await repository_users.update_avatar(current_user.email, src_url, db)
-    auth_service.r.set(f'user:{user.email}', pickle.dumps(user))
-    auth_service.r.expire(f'user:{user.email}', 900)
+    await auth_service.invalidate_user(user.email, r)
 
     return user
@@ -1,6 +1,6 @@
 from datetime import date, datetime  # new_user = User(name='Alice', birthdate=date(1995, 5, 17))
-from typing import List, Optional
-from pydantic import BaseModel, Field, EmailStr
+from typing import List, Literal, Optional
+from pydantic import BaseModel, Field, EmailStr, model_validator
 
 
 class ContactModel(BaseModel):
@@ -15,6 +15,14 @@ class NotesContact(BaseModel):
     notes: Optional[List[str]]
 
 
+class NoteModel(BaseModel):
+    note: str = Field(min_length=1)
+
+
+class NotesCountResponse(BaseModel):
+    count: int
+
+
 class ContactResponse(ContactModel):
     id: int
     notes: Optional[List[str]]
@@ -23,6 +31,57 @@ class ContactResponse(ContactModel):
         from_attributes = True
 
 
+class ContactSearchResponse(ContactResponse):
+    rank: Optional[float] = None
+    headline: Optional[str] = None
+
+
+class ContactChangesResponse(BaseModel):
+    created: List[ContactResponse] = []
+    updated: List[ContactResponse] = []
+    deleted: List[int] = []
+    sync_token: str
+    has_more: bool = False
+
+
+class ContactImportError(BaseModel):
+    row: int
+    errors: List[str]
+
+
+class ContactImportResponse(BaseModel):
+    imported: int = 0
+    failed: int = 0
+    errors: List[ContactImportError] = []
+    errors_truncated: bool = False
+
+
+class ContactBatchOperation(BaseModel):
+    op: Literal['create', 'update', 'note', 'delete']
+    id: Optional[int] = None
+    contact: Optional[ContactModel] = None
+    notes: Optional[List[str]] = None
+
+    @model_validator(mode='after')
+    def check_fields(self):
+        if self.op != 'create' and self.id is None:
+            raise ValueError(f'id is required for {self.op}')
+        if self.op in ('create', 'update') and self.contact is None:
+            raise ValueError(f'contact is required for {self.op}')
+        return self
+
+
+class ContactBatchRequest(BaseModel):
+    operations: List[ContactBatchOperation] = Field(min_length=1, max_length=1000)
+
+
+class ContactBatchResult(BaseModel):
+    index: int
+    op: str
+    status: int
+    id: Optional[int] = None
+
+
 class UserModel(BaseModel):
     username: str = Field(min_length=5, max_length=16)
     email: EmailStr
@@ -1,26 +1,71 @@
-from typing import Optional
+import asyncio
+import hashlib
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Optional
 from jose import JWTError, jwt
 from fastapi import HTTPException, status, Depends
 from fastapi.security import OAuth2PasswordBearer
 from passlib.context import CryptContext
 from datetime import datetime, timedelta
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from src.database.db import get_db
+from src.database.models import User
+from src.database.redis_pool import get_redis
 from src.repository import users as repository_users
-import redis
+from src.services.cache import CachedUser, TTLCache, encode_user, decode_user
+from redis.asyncio import Redis
+from redis.exceptions import RedisError
 
 from ..conf.config import settings
-import pickle
 
 
 class Auth:
-    _pwd_context = CryptContext(schemes=['bcrypt'], deprecated='auto')
+    _pwd_context = CryptContext(schemes=['bcrypt'], deprecated='auto', bcrypt__rounds=settings.bcrypt_rounds)
+    _hash_executor = ThreadPoolExecutor(max_workers=settings.password_hash_workers, thread_name_prefix='password-hash')
+    _hash_pending = 0
+    _hash_rejected = 0
     __SECRET_KEY = settings.secret_key
     __ALGORITHM = settings.algorithm
     _oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/auth/login")
-    _r = redis.Redis(host=settings.redis_host, port=settings.redis_port, db=0)
+    USER_INVALIDATION_CHANNEL = 'user-cache-invalidate'
+    INVALIDATION_RETRY_MAX_DELAY = 30
+    user_cache = TTLCache(maxsize=settings.user_cache_size, ttl=settings.user_cache_ttl)
+    token_cache = TTLCache(maxsize=settings.token_cache_size, ttl=settings.token_cache_ttl)
 
-    def verify_password(self, plain_password, hash_password):
+    async def _run_hashing(self, func: Callable, *args):
+        """
+        Runs a bcrypt call in the password hashing pool, so it does not block the event loop.
+
+        :param func: The passlib function.
+        :type func: Callable
+        :param args: Arguments of the function.
+        :return: Result of the function.
+        :raises HTTPException: 503 when PASSWORD_HASH_QUEUE_LIMIT calls are already pending.
+        """
+        if Auth._hash_pending >= settings.password_hash_queue_limit:
+            Auth._hash_rejected += 1
+            raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                                detail='Too many authentication requests, try again later',
+                                headers={'Retry-After': '1'})
+        Auth._hash_pending += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._hash_executor, func, *args)
+        finally:
+            Auth._hash_pending -= 1
+
+    def hashing_stats(self) -> dict:
+        """
+        Retrieves the counters of the password hashing pool.
+
+        :return: workers, pending and queued calls, rejected calls.
+        :rtype: dict
+        """
+        workers = settings.password_hash_workers
+        return {'workers': workers, 'pending': Auth._hash_pending,
+                'queue_depth': max(Auth._hash_pending - workers, 0), 'rejected': Auth._hash_rejected}
+
+    async def verify_password(self, plain_password, hash_password):
         """
         Compares entered password and hash of the password from database.
 
@@ -31,9 +76,22 @@ class Auth:
         :return: True or False of verification.
         :rtype: Bool
         """
-        return self._pwd_context.verify(plain_password, hash_password)
+        return await self._run_hashing(self._pwd_context.verify, plain_password, hash_password)
+
+    async def verify_and_update_password(self, plain_password, hash_password):
+        """
+        Compares entered password and hash of the password and rehashes the password if BCRYPT_ROUNDS changed.
+
+        :param plain_password: The password to be confirmed.
+        :type plain_password: str
+        :param hash_password: The hash password for confirmation.
+        :type hash_password: str
+        :return: True or False of verification and the new hash or None.
+        :rtype: tuple[bool, str | None]
+        """
+        return await self._run_hashing(self._pwd_context.verify_and_update, plain_password, hash_password)
 
-    def get_password_hash(self, password: str):
+    async def get_password_hash(self, password: str):
         """
         Create hashed password for databasec.
 
@@ -42,7 +100,7 @@ class Auth:
         :return: The hash of the password.
         :rtype: str
         """
-        return self._pwd_context.hash(password)
+        return await self._run_hashing(self._pwd_context.hash, password)
 
     async def create_access_token(self, data: dict, expires_delta: Optional[float] = None):
         """
@@ -84,6 +142,38 @@ class Auth:
         encoded_refresh_token = jwt.encode(to_encode, self.__SECRET_KEY, algorithm=self.__ALGORITHM)
         return encoded_refresh_token
 
+    def decode_token(self, token: str) -> dict:
+        """
+        Verifies the token and retrieves its claims, each token is verified only once per worker.
+
+        Verified claims are cached by token hash until the token expires, at most for TOKEN_CACHE_TTL seconds.
+        Only the signature check is skipped, scope and revocation checks are still done by the callers.
+
+        :param token: The token.
+        :type token: str
+        :return: claims of the token.
+        :rtype: dict
+        """
+        key = hashlib.sha256(token.encode()).digest()
+        payload = self.token_cache.get(key)
+        if payload is None:
+            payload = jwt.decode(token, self.__SECRET_KEY, algorithms=[self.__ALGORITHM])
+            ttl = min(payload.get('exp', 0) - time.time(), self.token_cache.ttl)
+            if ttl > 0:
+                self.token_cache.set(key, payload, ttl=ttl)
+        return payload
+
+    def forget_token(self, token: str) -> None:
+        """
+        Removes a revoked token from the verified token cache.
+
+        :param token: The token.
+        :type token: str
+        :return: None.
+        :rtype: None
+        """
+        self.token_cache.pop(hashlib.sha256(token.encode()).digest())
+
     async def decode_refresh_token(self, refresh_token: str):
         """
         Decodes the refresh token.
@@ -94,7 +184,7 @@ class Auth:
         :rtype: str
         """
         try:
-            payload = jwt.decode(refresh_token, self.__SECRET_KEY,algorithms=[self.__ALGORITHM])
+            payload = self.decode_token(refresh_token)
             if payload['scope'] == 'refresh token':
                 email = payload['sub']
                 return email
@@ -117,16 +207,19 @@ class Auth:
         token = jwt.encode(to_encode, self.__SECRET_KEY, algorithm=self.__ALGORITHM)
         return token
 
-    async def get_current_user(self, token: str = Depends(_oauth2_scheme), db: Session = Depends(get_db)):
+    async def get_current_user(self, token: str = Depends(_oauth2_scheme), db: AsyncSession = Depends(get_db),
+                               r: Redis = Depends(get_redis)):
         """
         Retrieves the current user.
 
         :param token: user's token.
         :type token: str
         :param db: The database session.
-        :type db: Session
-        :return: email token.
-        :rtype: str
+        :type db: AsyncSession
+        :param r: The Redis client.
+        :type r: Redis
+        :return: current user.
+        :rtype: CachedUser
         """
         credentials_exception = HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -135,7 +228,7 @@ class Auth:
         )
 
         try:
-            payload = jwt.decode(token, self.__SECRET_KEY, algorithms=[self.__ALGORITHM])
+            payload = self.decode_token(token)
             if payload['scope'] == 'access token':
                 email = payload['sub']
                 if email is None:
@@ -145,18 +238,77 @@ class Auth:
         except JWTError as e:
             print(e)
             raise credentials_exception
-        user = self._r.get(f'user:{email}')
+        user = self.user_cache.get(email)
+        if user is not None:
+            return user
+        user = decode_user(await r.get(f'user:{email}'))
 
         if user is None:
             user = await repository_users.get_user_by_email(email, db)
             if user is None:
                 raise credentials_exception
-            self._r.set(f'user:{email}', pickle.dumps(user))
-            self._r.expire(f'user:{email}', 900)
-        else:
-            user = pickle.loads(user)
+            user = await self.cache_user(user, r)
+        self.user_cache.set(email, user)
+        return user
+
+    async def cache_user(self, user: User | CachedUser, r: Redis) -> CachedUser:
+        """
+        Stores the user in the Redis cache for 15 minutes.
+
+        :param user: The user to be cached.
+        :type user: User | CachedUser
+        :param r: The Redis client.
+        :type r: Redis
+        :return: Cached user.
+        :rtype: CachedUser
+        """
+        if isinstance(user, User):
+            user = CachedUser.from_user(user)
+        await r.set(f'user:{user.email}', encode_user(user), ex=900)
         return user
 
+    async def invalidate_user(self, email: str, r: Redis) -> None:
+        """
+        Removes the cached user from Redis and from the in-process cache of every worker.
+
+        :param email: email of user.
+        :type email: str
+        :param r: The Redis client.
+        :type r: Redis
+        :return: None.
+        :rtype: None
+        """
+        self.user_cache.pop(email)
+        await r.delete(f'user:{email}')
+        await r.publish(self.USER_INVALIDATION_CHANNEL, email)
+
+    async def listen_user_invalidations(self, r: Redis) -> None:
+        """
+        Drops users invalidated by other workers from the in-process cache, runs until cancelled.
+
+        When Redis fails, the listener subscribes again after a delay that doubles up to
+        INVALIDATION_RETRY_MAX_DELAY seconds. The cache is cleared on every subscription, because invalidations
+        published in between were missed.
+
+        :param r: The Redis client.
+        :type r: Redis
+        :return: None.
+        :rtype: None
+        """
+        delay = 1
+        while True:
+            try:
+                async with r.pubsub(ignore_subscribe_messages=True) as pubsub:
+                    await pubsub.subscribe(self.USER_INVALIDATION_CHANNEL)
+                    self.user_cache.clear()
+                    delay = 1
+                    async for message in pubsub.listen():
+                        self.user_cache.pop(message['data'].decode())
+            except RedisError as e:
+                print(e)
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, self.INVALIDATION_RETRY_MAX_DELAY)
+
     async def get_email_from_token(self, token: str):
         """
         Retrieves the email of user by access token.
@@ -167,7 +319,7 @@ class Auth:
         :rtype: str
         """
         try:
-            payload = jwt.decode(token, self.__SECRET_KEY, algorithms=[self.__ALGORITHM])
+            payload = self.decode_token(token)
             email = payload["sub"]
             return email
         except JWTError as e:
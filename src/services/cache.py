@@ -0,0 +1,145 @@
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Hashable
+
+import orjson
+
+from src.database.models import User
+
+USER_CACHE_VERSION = 1
+
+
+@dataclass(slots=True)
+class CachedUser:
+    """
+    The part of the user that authenticated requests need, without the password hash and refresh token.
+    """
+    id: int
+    username: str | None
+    email: str
+    created_at: datetime | None
+    avatar: str | None
+    confirmed: bool | None
+
+    @classmethod
+    def from_user(cls, user: User) -> 'CachedUser':
+        """
+        Creates the projection of a database user.
+
+        :param user: The database user.
+        :type user: User
+        :return: Cached user.
+        :rtype: CachedUser
+        """
+        return cls(id=user.id, username=user.username, email=user.email, created_at=user.created_at,
+                   avatar=user.avatar, confirmed=user.confirmed)
+
+
+def encode_user(user: CachedUser) -> bytes:
+    """
+    Serializes the user for the Redis cache as a versioned JSON array.
+
+    :param user: The user to be cached.
+    :type user: CachedUser
+    :return: Serialized user.
+    :rtype: bytes
+    """
+    return orjson.dumps([USER_CACHE_VERSION, user.id, user.username, user.email, user.created_at,
+                         user.avatar, user.confirmed])
+
+
+def decode_user(data: bytes | str | None) -> CachedUser | None:
+    """
+    Deserializes the user from the Redis cache.
+
+    Entries in an unknown format, such as pickles written by older releases, are treated as a cache miss.
+
+    :param data: Value stored in Redis.
+    :type data: bytes | str | None
+    :return: Cached user or None.
+    :rtype: CachedUser | None
+    """
+    if not data:
+        return None
+    try:
+        version, user_id, username, email, created_at, avatar, confirmed = orjson.loads(data)
+        if version != USER_CACHE_VERSION:
+            return None
+        return CachedUser(id=user_id, username=username, email=email,
+                          created_at=datetime.fromisoformat(created_at) if created_at else None,
+                          avatar=avatar, confirmed=confirmed)
+    except (orjson.JSONDecodeError, TypeError, ValueError):
+        return None
+
+
+class TTLCache:
+    """
+    Bounded in-process LRU cache whose entries expire after ``ttl`` seconds.
+    """
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._data: OrderedDict[Hashable, tuple[float, Any]] = OrderedDict()
+
+    def get(self, key: Hashable) -> Any | None:
+        """
+        Retrieves a value and marks it as recently used.
+
+        :param key: The cache key.
+        :type key: Hashable
+        :return: Cached value or None when it is missing or expired.
+        :rtype: Any | None
+        """
+        item = self._data.get(key)
+        if item is None or item[0] <= time.monotonic():
+            if item is not None:
+                del self._data[key]
+            self.misses += 1
+            return None
+        self._data.move_to_end(key)
+        self.hits += 1
+        return item[1]
+
+    def set(self, key: Hashable, value: Any, ttl: float | None = None) -> None:
+        """
+        Stores a value, evicting the least recently used entry when the cache is full.
+
+        :param key: The cache key.
+        :type key: Hashable
+        :param value: The value to be cached.
+        :type value: Any
+        :param ttl: Lifetime of this entry in seconds, the cache ttl by default.
+        :type ttl: float | None
+        """
+        self._data[key] = (time.monotonic() + (self.ttl if ttl is None else ttl), value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def pop(self, key: Hashable) -> None:
+        """
+        Removes a value from the cache.
+
+        :param key: The cache key.
+        :type key: Hashable
+        """
+        self._data.pop(key, None)
+
+    def clear(self) -> None:
+        self._data.clear()
+
+    def stats(self) -> dict:
+        """
+        Retrieves the cache counters.
+
+        :return: size, hits, misses and hit ratio.
+        :rtype: dict
+        """
+        total = self.hits + self.misses
+        return {'size': len(self._data), 'maxsize': self.maxsize, 'hits': self.hits, 'misses': self.misses,
+                'hit_ratio': self.hits / total if total else 0.0}
@@ -0,0 +1,110 @@
+import codecs
+import csv
+import io
+from typing import AsyncIterator, BinaryIO, Iterator
+
+import orjson
+from pydantic import ValidationError
+
+from src.schemas import ContactModel, ContactImportError
+
+IMPORT_CHUNK_SIZE = 1000
+EXPORT_CHUNK_SIZE = 1000
+EXPORT_COLUMNS = ['id', 'first_name', 'last_name', 'email', 'phone_number', 'birthday', 'notes']
+
+
+def _read_rows(file: BinaryIO, file_format: str) -> Iterator[tuple[int, dict | None, str | None]]:
+    if file_format == 'csv':
+        number = 0
+        try:
+            for number, row in enumerate(csv.DictReader(io.TextIOWrapper(file, encoding='utf-8-sig', newline='')),
+                                         start=1):
+                yield number, row, None
+        except UnicodeDecodeError:
+            # The reader can not find the next row in text it could not decode, nor after a broken quote.
+            yield number + 1, None, 'not UTF-8 text, the rest of the file was skipped'
+        except csv.Error as e:
+            yield number + 1, None, f'{e}, the rest of the file was skipped'
+        return
+    # Rows are numbered by line, blank lines are skipped but counted, so the numbers match an editor.
+    for number, line in enumerate(file, start=1):
+        if number == 1:
+            line = line.removeprefix(codecs.BOM_UTF8)
+        if not line.strip():
+            continue
+        try:
+            # orjson rejects invalid UTF-8 as well, a bad line does not stop the file.
+            yield number, orjson.loads(line), None
+        except orjson.JSONDecodeError as e:
+            yield number, None, str(e)
+
+
+def parse_contacts(file: BinaryIO, file_format: str, chunk_size: int = IMPORT_CHUNK_SIZE
+                   ) -> Iterator[tuple[list[ContactModel], list[ContactImportError]]]:
+    """
+    Reads an uploaded CSV or NDJSON file and validates it in chunks, so memory does not grow with the file.
+
+    :param file: The uploaded file.
+    :type file: BinaryIO
+    :param file_format: csv or ndjson.
+    :type file_format: str
+    :param chunk_size: The number of rows in a chunk.
+    :type chunk_size: int
+    :return: Valid contacts and row errors of every chunk.
+    :rtype: Iterator[tuple[List[ContactModel], List[ContactImportError]]]
+    """
+    contacts, errors = [], []
+    for number, row, error in _read_rows(file, file_format):
+        if error is None:
+            try:
+                contacts.append(ContactModel.model_validate(row))
+            except ValidationError as e:
+                errors.append(ContactImportError(row=number, errors=[
+                    f"{'.'.join(map(str, err['loc'])) or 'row'}: {err['msg']}" for err in e.errors()]))
+        else:
+            errors.append(ContactImportError(row=number, errors=[error]))
+        if len(contacts) + len(errors) >= chunk_size:
+            yield contacts, errors
+            contacts, errors = [], []
+    if contacts or errors:
+        yield contacts, errors
+
+
+async def render_contacts(rows: AsyncIterator, file_format: str,
+                          chunk_size: int = EXPORT_CHUNK_SIZE) -> AsyncIterator[bytes]:
+    """
+    Serializes contact rows to CSV or NDJSON, ``chunk_size`` rows per yielded chunk.
+
+    In CSV the notes are a JSON array, so a note may contain any character.
+
+    :param rows: Rows with the EXPORT_COLUMNS.
+    :type rows: AsyncIterator
+    :param file_format: csv or ndjson.
+    :type file_format: str
+    :param chunk_size: The number of rows in a chunk.
+    :type chunk_size: int
+    :return: Chunks of the file.
+    :rtype: AsyncIterator[bytes]
+    """
+    if file_format == 'csv':
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(EXPORT_COLUMNS)
+        count = 0
+        async for row in rows:
+            writer.writerow([*row[:-1], '' if row[-1] is None else orjson.dumps(row[-1]).decode()])
+            count += 1
+            if count % chunk_size == 0:
+                yield buffer.getvalue().encode()
+                buffer.seek(0)
+                buffer.truncate()
+        yield buffer.getvalue().encode()
+        return
+    chunk = []
+    async for row in rows:
+        chunk.append(orjson.dumps(row._asdict(), option=orjson.OPT_APPEND_NEWLINE))
+        if len(chunk) == chunk_size:
+            yield b''.join(chunk)
+            chunk = []
+    if chunk:
+        yield b''.join(chunk)
@@ -1,11 +1,12 @@
-from pathlib import Path
-
-from fastapi_mail import FastMail, MessageSchema, ConnectionConfig, MessageType
-from fastapi_mail.errors import ConnectionErrors
+from aiosmtplib import SMTPException
+from fastapi_mail import MessageSchema, ConnectionConfig, MessageType
+from fastapi_mail.connection import Connection
+from fastapi_mail.msg import MailMsg
 from pydantic import EmailStr
 from ..conf.config import settings
 
 from src.services.auth import auth_service
+from src.services.email_templates import TEMPLATE_FOLDER, email_templates
 
 conf = ConnectionConfig(
     MAIL_USERNAME=settings.mail_username,
@@ -18,34 +19,56 @@ conf = ConnectionConfig(
     MAIL_SSL_TLS=True,
     USE_CREDENTIALS=True,
     VALIDATE_CERTS=False,
-    TEMPLATE_FOLDER=Path(__file__).parent / 'templates'
+    TEMPLATE_FOLDER=TEMPLATE_FOLDER
 
 )
 
 
-async def send_email(email: EmailStr, username: str, host: str):
+def confirmation_messages(recipients: list[tuple[EmailStr, str, str]]) -> list[MessageSchema]:
+    """
+    Creates the confirmation emails of many users, the HTML is rendered from the precompiled template.
+
+    :param recipients: email, username and server host of every user.
+    :type recipients: list[tuple[EmailStr, str, str]]
+    :return: The messages with the rendered HTML body.
+    :rtype: list[MessageSchema]
     """
-    Send confirmation email to user.
-
-    :param email: the receiver's email.
-    :type email: EmailStr
-    :param username: username.
-    :type username: str
-    :param host: server host.
-    :type host: str
-    :return: None.
-    :rtype: None
+    bodies = email_templates.render_batch('email_template.html', [
+        {'host': host, 'username': username, 'token': auth_service.create_email_token({"sub": email})}
+        for email, username, host in recipients])
+    return [MessageSchema(subject="Confirm your email ", recipients=[email], body=body, subtype=MessageType.html)
+            for (email, _, _), body in zip(recipients, bodies)]
+
+
+async def send_messages(messages: list[MessageSchema], config: ConnectionConfig = conf) -> list[Exception | None]:
     """
+    Sends messages over one SMTP connection.
+
+    FastMail.send_message opens a connection, logs in and quits for every message. This does what it does,
+    with its Connection and MailMsg, but keeps the connection for all messages. MailMsg._message and
+    Connection.session are not public, fastapi-mail is pinned to the version they were checked against.
+
+    :param messages: The messages.
+    :type messages: list[MessageSchema]
+    :param config: The SMTP connection settings.
+    :type config: ConnectionConfig
+    :return: The error of every message, None for the sent ones.
+    :rtype: list[Exception | None]
+    :raises ConnectionErrors: When the SMTP server can not be reached or refuses the credentials.
+    """
+    sender = f'{config.MAIL_FROM_NAME} <{config.MAIL_FROM}>' if config.MAIL_FROM_NAME else config.MAIL_FROM
+    errors = []
     try:
-        token_verification = auth_service.create_email_token({"sub": email})
-        message = MessageSchema(
-            subject="Confirm your email ",
-            recipients=[email],
-            template_body={"host": host, "username": username, "token": token_verification},
-            subtype=MessageType.html
-        )
-        fm = FastMail(conf)
-        await fm.send_message(message, template_name="email_template.html")
-    except ConnectionErrors as err:
+        async with Connection(config) as connection:
+            for message in messages:
+                try:
+                    mime_message = await MailMsg(message)._message(sender)
+                    if not config.SUPPRESS_SEND:
+                        await connection.session.send_message(mime_message)
+                    errors.append(None)
+                except Exception as err:
+                    errors.append(err)
+    except SMTPException as err:
+        # Raised by QUIT, the messages have been handed over already.
         print(err)
-
+    return errors
@@ -0,0 +1,206 @@
+import asyncio
+import time
+from uuid import uuid4
+
+import orjson
+from fastapi_mail import ConnectionConfig, MessageSchema
+from pydantic import EmailStr
+from redis.asyncio import Redis
+
+from src.services.email import conf, confirmation_messages, send_messages
+from ..conf.config import settings
+
+QUEUE_KEY = 'email:queue'
+DELAYED_KEY = 'email:delayed'
+DEAD_KEY = 'email:dead'
+LATENCY_KEY = 'email:latency'
+STATS_KEY = 'email:stats'
+# Latencies of the last sent emails, kept for the percentiles in the metrics.
+LATENCY_SAMPLES = 1000
+# Fields of a job and their types, a job without them goes to the dead letter list.
+JOB_FIELDS = {'email': str, 'username': str, 'host': str, 'attempts': int, 'enqueued_at': (int, float)}
+
+# Moves the retries that are due back to the queue, in one step so that a job is never lost or doubled.
+PROMOTE_DUE = """
+local jobs = redis.call('ZRANGEBYSCORE', KEYS[1], '-inf', ARGV[1], 'LIMIT', 0, ARGV[2])
+for _, job in ipairs(jobs) do
+    redis.call('ZREM', KEYS[1], job)
+    redis.call('LPUSH', KEYS[2], job)
+end
+return #jobs
+"""
+
+
+def _percentile(values: list[float], pct: int) -> float | None:
+    return values[min(len(values) - 1, len(values) * pct // 100)] if values else None
+
+
+def _decode_job(raw: bytes) -> dict:
+    job = orjson.loads(raw)
+    if not isinstance(job, dict) or not all(isinstance(job.get(field), kind) for field, kind in JOB_FIELDS.items()):
+        raise ValueError('Malformed email job')
+    return job
+
+
+def _create_messages(recipients: list[tuple[str, str, str]]) -> list[MessageSchema | Exception]:
+    try:
+        return confirmation_messages(recipients)
+    except Exception:
+        # One bad recipient fails the whole batch, the messages are created one by one to find it.
+        messages = []
+        for recipient in recipients:
+            try:
+                messages.extend(confirmation_messages([recipient]))
+            except Exception as err:
+                messages.append(err)
+        return messages
+
+
+async def enqueue_email(email: EmailStr, username: str, host: str, r: Redis) -> None:
+    """
+    Queues the confirmation email of a user for the email worker.
+
+    :param email: the receiver's email.
+    :type email: EmailStr
+    :param username: username.
+    :type username: str
+    :param host: server host.
+    :type host: str
+    :param r: The Redis client.
+    :type r: Redis
+    """
+    job = {'id': uuid4().hex, 'email': email, 'username': username, 'host': str(host), 'attempts': 0,
+           'enqueued_at': time.time()}
+    await r.lpush(QUEUE_KEY, orjson.dumps(job))
+
+
+async def queue_stats(r: Redis) -> dict:
+    """
+    Retrieves the depth of the email queue and the latency of the sent emails, shared by all workers.
+
+    :param r: The Redis client.
+    :type r: Redis
+    :return: queued, delayed and dead jobs, sent and failed counters, latency percentiles in seconds.
+    :rtype: dict
+    """
+    async with r.pipeline(transaction=False) as pipe:
+        pipe.llen(QUEUE_KEY).zcard(DELAYED_KEY).llen(DEAD_KEY).hgetall(STATS_KEY).lrange(LATENCY_KEY, 0, -1)
+        queued, delayed, dead, counters, latencies = await pipe.execute()
+    latencies = sorted(float(latency) for latency in latencies)
+    return {'queued': queued, 'delayed': delayed, 'dead': dead, 'sent': 0, 'failed': 0,
+            **{key.decode(): int(value) for key, value in counters.items()},
+            'latency_p50': _percentile(latencies, 50), 'latency_p95': _percentile(latencies, 95)}
+
+
+class EmailWorker:
+    """
+    Sends the queued emails, runs in its own process next to the web workers.
+
+    Jobs are moved from the queue to the processing list of the worker with BLMOVE, so a job of a crashed worker
+    is not lost: the worker puts it back when it starts again under the same name. Failed jobs are retried with
+    exponential backoff from a sorted set, after EMAIL_MAX_ATTEMPTS attempts they go to the dead letter list.
+    """
+
+    def __init__(self, r: Redis, name: str = 'default', config: ConnectionConfig = conf):
+        self.r = r
+        self.config = config
+        self.processing_key = f'email:processing:{name}'
+        self._promote_due = r.register_script(PROMOTE_DUE)
+
+    async def recover(self) -> int:
+        """
+        Puts the jobs that the previous run of this worker did not finish back at the head of the queue.
+
+        :return: Number of recovered jobs.
+        :rtype: int
+        """
+        recovered = 0
+        while await self.r.lmove(self.processing_key, QUEUE_KEY, 'RIGHT', 'RIGHT') is not None:
+            recovered += 1
+        return recovered
+
+    async def take(self, timeout: float) -> list[bytes]:
+        """
+        Takes up to EMAIL_BATCH_SIZE jobs from the queue, waits up to ``timeout`` seconds for the first one.
+
+        :param timeout: Seconds to wait.
+        :type timeout: float
+        :return: The jobs.
+        :rtype: list[bytes]
+        """
+        await self._promote_due(keys=[DELAYED_KEY, QUEUE_KEY], args=[time.time(), settings.email_batch_size])
+        job = await self.r.blmove(QUEUE_KEY, self.processing_key, timeout, 'RIGHT', 'LEFT')
+        jobs = []
+        while job is not None:
+            jobs.append(job)
+            if len(jobs) == settings.email_batch_size:
+                break
+            job = await self.r.lmove(QUEUE_KEY, self.processing_key, 'RIGHT', 'LEFT')
+        return jobs
+
+    async def process(self, jobs: list[bytes]) -> None:
+        """
+        Sends the emails of the jobs over one SMTP connection, then acknowledges, retries or buries every job.
+
+        A job that can not be decoded or turned into an email goes to the dead letter list at once, a retry
+        would fail the same way.
+
+        :param jobs: The jobs from take.
+        :type jobs: list[bytes]
+        """
+        decoded, poisoned = [], []
+        for raw in jobs:
+            try:
+                decoded.append((raw, _decode_job(raw)))
+            except Exception as err:
+                poisoned.append((raw, {'job': raw.decode(errors='replace')}, err))
+        messages = _create_messages([(job['email'], job['username'], job['host']) for _, job in decoded])
+        sendable = []
+        for (raw, job), message in zip(decoded, messages):
+            if isinstance(message, Exception):
+                poisoned.append((raw, job, message))
+            else:
+                sendable.append((raw, job, message))
+        try:
+            errors = await send_messages([message for _, _, message in sendable], self.config)
+        except Exception as err:
+            errors = [err] * len(sendable)
+        now = time.time()
+        async with self.r.pipeline(transaction=True) as pipe:
+            for raw, job, error in poisoned:
+                print(error)
+                pipe.lrem(self.processing_key, 1, raw)
+                pipe.hincrby(STATS_KEY, 'failed', 1)
+                pipe.lpush(DEAD_KEY, orjson.dumps({**job, 'error': repr(error)}))
+            for (raw, job, _), error in zip(sendable, errors):
+                pipe.lrem(self.processing_key, 1, raw)
+                if error is None:
+                    pipe.hincrby(STATS_KEY, 'sent', 1)
+                    pipe.lpush(LATENCY_KEY, now - job['enqueued_at'])
+                    continue
+                print(error)
+                job['attempts'] += 1
+                pipe.hincrby(STATS_KEY, 'failed', 1)
+                if job['attempts'] >= settings.email_max_attempts:
+                    pipe.lpush(DEAD_KEY, orjson.dumps({**job, 'error': str(error)}))
+                else:
+                    delay = settings.email_retry_backoff * 2 ** (job['attempts'] - 1)
+                    pipe.zadd(DELAYED_KEY, {orjson.dumps(job): now + delay})
+            pipe.ltrim(LATENCY_KEY, 0, LATENCY_SAMPLES - 1)
+            await pipe.execute()
+
+    async def run(self) -> None:
+        """
+        Processes jobs until cancelled, waits a second and goes on when Redis is unreachable or a batch fails.
+        """
+        recovered = await self.recover()
+        print(f'email worker started, {recovered} jobs recovered')
+        while True:
+            try:
+                jobs = await self.take(timeout=1)
+                if jobs:
+                    await self.process(jobs)
+            except Exception as e:
+                # Redis is unreachable or a bug, the jobs in the processing list are recovered on restart.
+                print(e)
+                await asyncio.sleep(1)
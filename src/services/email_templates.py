@@ -0,0 +1,104 @@
+import re
+import secrets
+from pathlib import Path
+from typing import Any, Callable
+
+from jinja2 import Environment, FileSystemLoader, Template, meta, select_autoescape
+from markupsafe import escape
+
+TEMPLATE_FOLDER = Path(__file__).parent / 'templates'
+
+
+class CompiledTemplate:
+    """
+    A Jinja template compiled once, with its static parts rendered in advance.
+
+    When the template only substitutes its variables, it is rendered once with markers in place of the variables
+    and split at the markers. Rendering is then a join of the static parts with the escaped values. Templates
+    that transform or branch on their variables are rendered by Jinja.
+    """
+
+    def __init__(self, template: Template, variables: set[str]):
+        self.template = template
+        self.variables = sorted(variables)
+        self.parts: list[str] | None = None
+        self.convert: Callable[[Any], str] = str
+        self._split()
+
+    def _markers(self, probe: str = '') -> dict[str, str]:
+        return {name: f'{probe}\x00{secrets.token_hex(8)}\x00{probe}' for name in self.variables}
+
+    def _split(self) -> None:
+        markers = self._markers()
+        rendered = self.template.render(**markers)
+        names = {marker: name for name, marker in markers.items()}
+        parts = re.split('(' + '|'.join(map(re.escape, markers.values())) + ')', rendered) if markers else [rendered]
+        self.parts = [names.get(part, part) for part in parts]
+        # Empty values and values with whitespace and markup must come out exactly as Jinja renders them.
+        probes = [self._markers(probe=' <a href="?x=1&y=2">\'</a> '), dict.fromkeys(self.variables, '')]
+        for convert in (lambda value: str(escape(value)), str):
+            self.convert = convert
+            if all(self.render(probe) == self.template.render(**probe) for probe in probes):
+                return
+        self.parts = None
+
+    def render(self, context: dict) -> str:
+        """
+        Renders the template.
+
+        :param context: Values of the template variables.
+        :type context: dict
+        :return: The rendered text.
+        :rtype: str
+        """
+        if self.parts is None:
+            return self.template.render(context)
+        # Parts alternate between static text and variable names, starting with static text.
+        return ''.join(part if i % 2 == 0 else self.convert(context.get(part, ''))
+                       for i, part in enumerate(self.parts))
+
+
+class EmailTemplates:
+    """
+    Loads and compiles every template of the folder once, HTML templates are autoescaped.
+    """
+
+    def __init__(self, folder: Path):
+        self.environment = Environment(loader=FileSystemLoader(folder), autoescape=select_autoescape(['html']))
+        self.templates = {name: self._compile(name) for name in self.environment.list_templates()}
+
+    def _compile(self, name: str) -> CompiledTemplate:
+        source, _, _ = self.environment.loader.get_source(self.environment, name)
+        variables = meta.find_undeclared_variables(self.environment.parse(source))
+        return CompiledTemplate(self.environment.get_template(name), variables)
+
+    def render(self, name: str, context: dict) -> str:
+        """
+        Renders a template for one recipient.
+
+        :param name: Name of the template.
+        :type name: str
+        :param context: Values of the template variables.
+        :type context: dict
+        :return: The rendered text.
+        :rtype: str
+        """
+        return self.templates[name].render(context)
+
+    def render_batch(self, name: str, recipients: list[dict], **shared) -> list[str]:
+        """
+        Renders a template for many recipients.
+
+        :param name: Name of the template.
+        :type name: str
+        :param recipients: Values of the template variables for every recipient.
+        :type recipients: list[dict]
+        :param shared: Values of the template variables common to all recipients.
+        :return: The rendered text of every recipient.
+        :rtype: list[str]
+        """
+        template = self.templates[name]
+        return [template.render({**shared, **context}) for context in recipients]
+
+
+email_templates = EmailTemplates(TEMPLATE_FOLDER)
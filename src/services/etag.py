@@ -0,0 +1,56 @@
+import hashlib
+from datetime import datetime
+from typing import Iterable, Mapping
+
+from fastapi import Response, status
+
+# Part of every ETag, bump it when the JSON of a contact changes shape so that clients download it again.
+ETAG_VERSION = 1
+
+
+def contacts_etag(versions: Iterable[tuple[int, datetime]]) -> str:
+    """
+    Creates the weak ETag of one contact or of a page of contacts from their IDs and update times.
+
+    :param versions: Pairs of contact ID and updated_at, in the order of the response.
+    :type versions: Iterable[tuple[int, datetime]]
+    :return: ETag header value.
+    :rtype: str
+    """
+    digest = hashlib.blake2b(digest_size=12)
+    digest.update(f'v{ETAG_VERSION}'.encode())
+    for contact_id, updated_at in versions:
+        digest.update(f';{contact_id}:{updated_at.isoformat()}'.encode())
+    return f'W/"{digest.hexdigest()}"'
+
+
+def etag_matches(if_none_match: str | None, etag: str | None) -> bool:
+    """
+    Checks the If-None-Match request header against an ETag with the weak comparison of RFC 9110.
+
+    :param if_none_match: Value of the If-None-Match header.
+    :type if_none_match: str | None
+    :param etag: Current ETag of the resource.
+    :type etag: str | None
+    :return: True when the client copy is up to date.
+    :rtype: bool
+    """
+    if not if_none_match or not etag:
+        return False
+    if if_none_match.strip() == '*':
+        return True
+    opaque = etag.removeprefix('W/')
+    return any(tag.strip().removeprefix('W/') == opaque for tag in if_none_match.split(','))
+
+
+def not_modified(headers: Mapping[str, str]) -> Response:
+    """
+    Creates the 304 response, it keeps the ETag and the pagination cursor of the full response.
+
+    :param headers: Headers of the full response.
+    :type headers: Mapping[str, str]
+    :return: Response without a body.
+    :rtype: Response
+    """
+    headers = {name: value for name, value in headers.items() if name.lower() in ('etag', 'x-next-cursor')}
+    return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
@@ -0,0 +1,70 @@
+import base64
+import binascii
+
+from fastapi import HTTPException, status
+
+
+def _encode(prefix: str, *values: int) -> str:
+    return base64.urlsafe_b64encode(':'.join([prefix, *map(str, values)]).encode()).decode().rstrip('=')
+
+
+def _decode(prefix: str, length: int, token: str, detail: str) -> list[int]:
+    try:
+        token_prefix, *values = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4)).decode().split(':')
+        if token_prefix != prefix or len(values) != length:
+            raise ValueError(token_prefix)
+        return [int(value) for value in values]
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=detail)
+
+
+def encode_cursor(contact_id: int) -> str:
+    """
+    Creates an opaque cursor pointing after the contact.
+
+    :param contact_id: ID of the last contact on the page.
+    :type contact_id: int
+    :return: cursor for the next page.
+    :rtype: str
+    """
+    return _encode('id', contact_id)
+
+
+def decode_cursor(cursor: str) -> int:
+    """
+    Retrieves the contact ID from the cursor.
+
+    :param cursor: cursor returned with the previous page.
+    :type cursor: str
+    :return: ID of the last contact on the previous page.
+    :rtype: int
+    """
+    contact_id, = _decode('id', 1, cursor, 'Invalid cursor')
+    return contact_id
+
+
+def encode_sync_token(change_xid: int, change_seq: int) -> str:
+    """
+    Creates an opaque sync token pointing after the change.
+
+    :param change_xid: change_xid of the last change the client has received.
+    :type change_xid: int
+    :param change_seq: change_seq of the last change the client has received.
+    :type change_seq: int
+    :return: sync token for the next request.
+    :rtype: str
+    """
+    return _encode('xid', change_xid, change_seq)
+
+
+def decode_sync_token(token: str) -> tuple[int, int]:
+    """
+    Retrieves the change_xid and change_seq from the sync token.
+
+    :param token: sync token returned with the previous changes.
+    :type token: str
+    :return: change_xid and change_seq of the last change the client has received.
+    :rtype: tuple[int, int]
+    """
+    change_xid, change_seq = _decode('xid', 2, token, 'Invalid sync token')
+    return change_xid, change_seq
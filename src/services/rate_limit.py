@@ -0,0 +1,218 @@
+import math
+import time
+from dataclasses import dataclass
+
+from jose import JWTError
+from redis.asyncio import Redis
+from redis.exceptions import RedisError
+from starlette.datastructures import Headers
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from src.services.auth import auth_service
+from ..conf.config import settings
+
+# Buckets of finished windows are dropped once a worker holds more than this many.
+MAX_BUCKETS = 10_000
+
+
+def parse_quota(quota: str) -> tuple[int, int]:
+    """
+    Parses a quota of the form "requests/seconds".
+
+    :param quota: The quota, e.g. "60/60".
+    :type quota: str
+    :return: Number of requests and length of the window in seconds.
+    :rtype: tuple[int, int]
+    """
+    times, seconds = quota.split('/')
+    return int(times), int(seconds)
+
+
+@dataclass(slots=True)
+class Bucket:
+    """
+    Tokens a worker leased from Redis for one subject, path prefix and window.
+    """
+    window: int
+    tokens: int
+    remaining: int
+    retry_at: float
+    expires: float
+
+
+class RateLimiter:
+    """
+    Sliding window rate limiter shared by all workers through Redis, with a local token bucket in every worker.
+
+    A worker leases up to RATE_LIMIT_BATCH tokens at once with INCRBY on the Redis counter of the current fixed
+    window and spends them without asking Redis again. The sliding window is estimated from the counters of the
+    current and the previous window. Leases get smaller as the quota runs out, so the limit is exceeded by less
+    than one lease per worker. An exhausted subject is rejected locally until a token is expected to free up.
+    """
+
+    def __init__(self, rules: dict[str, str], users: dict[str, dict[str, str]], batch: int):
+        self.rules = self._sorted(rules)
+        self.users = {email: self._sorted({**rules, **quotas}) for email, quotas in users.items()}
+        self.prefixes = {prefix for rules in (self.rules, *self.users.values()) for prefix, _, _ in rules}
+        self.batch = batch
+        self._buckets: dict[tuple[str, str], Bucket] = {}
+        self._allowed = 0
+        self._limited = 0
+        self._leases = 0
+
+    @staticmethod
+    def _sorted(rules: dict[str, str]) -> list[tuple[str, int, int]]:
+        return sorted(((prefix, *parse_quota(quota)) for prefix, quota in rules.items()),
+                      key=lambda rule: len(rule[0]), reverse=True)
+
+    @staticmethod
+    def _matches(prefix: str, path: str) -> bool:
+        return path == prefix or (prefix != '/' and path.startswith(prefix.rstrip('/') + '/'))
+
+    def applies(self, path: str) -> bool:
+        """
+        Checks if any quota, of any user, covers the path.
+
+        :param path: The request path.
+        :type path: str
+        :return: True when the request has to be checked.
+        :rtype: bool
+        """
+        return any(self._matches(prefix, path) for prefix in self.prefixes)
+
+    async def _lease(self, key: tuple[str, str], limit: int, seconds: int, window: int, elapsed: float,
+                     r: Redis) -> Bucket:
+        prefix, subject = key
+        chunk = max(1, min(self.batch, limit // 10))
+        bucket = self._buckets.get(key)
+        if bucket is not None and bucket.window == window:
+            chunk = max(1, min(chunk, bucket.remaining // 2))
+        counter = f'ratelimit:{prefix}:{seconds}:{subject}:'
+        async with r.pipeline(transaction=False) as pipe:
+            pipe.incrby(f'{counter}{window}', chunk).expire(f'{counter}{window}', 2 * seconds)
+            pipe.get(f'{counter}{window - 1}')
+            current, _, previous = await pipe.execute()
+        self._leases += 1
+        used = int(previous or 0) * (1 - elapsed / seconds) + current
+        granted = min(chunk, max(0, math.floor(limit - used) + chunk))
+        if granted < chunk:
+            await r.decrby(f'{counter}{window}', chunk - granted)
+            used -= chunk - granted
+        now = time.time()
+        return Bucket(window=window, tokens=granted, remaining=max(0, math.floor(limit - used)),
+                      retry_at=now + seconds / limit if granted == 0 else 0.0, expires=(window + 1) * seconds)
+
+    async def check(self, subject: str, email: str | None, path: str, r: Redis) -> tuple[bool, dict] | None:
+        """
+        Takes a token for the request.
+
+        :param subject: Who is limited, the user or the client address.
+        :type subject: str
+        :param email: email of the authenticated user, selects the quotas of the user.
+        :type email: str | None
+        :param path: The request path.
+        :type path: str
+        :param r: The Redis client.
+        :type r: Redis
+        :return: If the request is allowed and the RateLimit headers, None when no quota applies or Redis is down.
+        :rtype: tuple[bool, dict] | None
+        """
+        rule = next((rule for rule in self.users.get(email, self.rules) if self._matches(rule[0], path)), None)
+        if rule is None:
+            return None
+        prefix, limit, seconds = rule
+        now = time.time()
+        window, elapsed = divmod(now, seconds)
+        window = int(window)
+        key = (prefix, subject)
+        bucket = self._buckets.get(key)
+        if bucket is None or bucket.window != window or (bucket.tokens == 0 and bucket.retry_at <= now):
+            try:
+                leased = await self._lease(key, limit, seconds, window, elapsed, r)
+            except RedisError as e:
+                print(e)
+                return None
+            bucket = self._buckets.get(key)
+            if bucket is not None and bucket.window == leased.window:
+                leased.tokens += bucket.tokens
+            bucket = self._buckets[key] = leased
+            if len(self._buckets) > MAX_BUCKETS:
+                self._buckets = {key: bucket for key, bucket in self._buckets.items() if bucket.expires > now}
+        headers = {'RateLimit-Limit': str(limit), 'RateLimit-Remaining': '0',
+                   'RateLimit-Reset': str(math.ceil(seconds - elapsed)), 'RateLimit-Policy': f'{limit};w={seconds}'}
+        if bucket.tokens == 0:
+            self._limited += 1
+            headers['Retry-After'] = str(max(1, math.ceil(bucket.retry_at - now)))
+            return False, headers
+        bucket.tokens -= 1
+        self._allowed += 1
+        headers['RateLimit-Remaining'] = str(bucket.remaining + bucket.tokens)
+        return True, headers
+
+    def stats(self) -> dict:
+        """
+        Retrieves the counters of this worker.
+
+        :return: allowed and limited requests, Redis leases and buckets held.
+        :rtype: dict
+        """
+        return {'allowed': self._allowed, 'limited': self._limited, 'leases': self._leases,
+                'buckets': len(self._buckets)}
+
+
+def request_subject(scope: Scope) -> tuple[str, str | None]:
+    """
+    Identifies who the request counts against: the user of a valid access token, otherwise the client address.
+
+    :param scope: The ASGI scope.
+    :type scope: Scope
+    :return: The subject and the email of the user.
+    :rtype: tuple[str, str | None]
+    """
+    scheme, _, token = Headers(scope=scope).get('authorization', '').partition(' ')
+    if scheme.lower() == 'bearer' and token:
+        try:
+            payload = auth_service.decode_token(token)
+            if payload.get('scope') == 'access token' and payload.get('sub'):
+                return f"user:{payload['sub']}", payload['sub']
+        except JWTError:
+            pass
+    client = scope.get('client')
+    return f"ip:{client[0] if client else 'unknown'}", None
+
+
+class RateLimitMiddleware:
+    """
+    ASGI middleware that applies the rate limiter before routing, so rejected requests never reach the database.
+    """
+
+    def __init__(self, app: ASGIApp, limiter: RateLimiter):
+        self.app = app
+        self.limiter = limiter
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope['type'] != 'http' or not self.limiter.applies(scope['path']):
+            await self.app(scope, receive, send)
+            return
+        subject, email = request_subject(scope)
+        decision = await self.limiter.check(subject, email, scope['path'], scope['app'].state.redis)
+        if decision is None:
+            await self.app(scope, receive, send)
+            return
+        allowed, headers = decision
+        if not allowed:
+            response = JSONResponse({'detail': 'Too Many Requests'}, status_code=429, headers=headers)
+            await response(scope, receive, send)
+            return
+        raw_headers = [(name.lower().encode('latin-1'), value.encode('latin-1')) for name, value in headers.items()]
+
+        async def send_with_headers(message: Message) -> None:
+            if message['type'] == 'http.response.start':
+                message['headers'] = [*message.get('headers', ()), *raw_headers]
+            await send(message)
+
+        await self.app(scope, receive, send_with_headers)
+
+
+rate_limiter = RateLimiter(settings.rate_limits, settings.rate_limit_users, settings.rate_limit_batch)
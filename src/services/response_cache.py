@@ -0,0 +1,150 @@
+import hashlib
+from collections import defaultdict
+from typing import Iterable, Sequence
+
+import orjson
+from fastapi import Response
+from pydantic import TypeAdapter
+from redis.asyncio import Redis
+
+from ..conf.config import settings
+
+
+def render(adapter: TypeAdapter, value) -> bytes:
+    """
+    Serializes a response body to JSON the way FastAPI does for the response model.
+
+    :param adapter: Type adapter of the response model.
+    :type adapter: TypeAdapter
+    :param value: ORM objects or models.
+    :return: JSON body.
+    :rtype: bytes
+    """
+    return adapter.dump_json(adapter.validate_python(value, from_attributes=True))
+
+
+def render_rows(rows: Iterable[Sequence], fields: Sequence[str]) -> bytes:
+    """
+    Serializes database rows to a JSON array of objects without building ORM objects or models.
+
+    The rows hold the values of ``fields`` in the same order, extra trailing columns are left out. The values come
+    from columns the response model already validated on the way in, so the output is the same as from render.
+
+    :param rows: Rows or tuples.
+    :type rows: Iterable[Sequence]
+    :param fields: Field names of the response model.
+    :type fields: Sequence[str]
+    :return: JSON body.
+    :rtype: bytes
+    """
+    return orjson.dumps([dict(zip(fields, row)) for row in rows])
+
+
+class ResponseCache:
+    """
+    Redis cache of serialized contact responses, keyed by user, endpoint and query parameters.
+
+    Every key contains the generation of the user. A write increments the generation, so all cached responses of
+    the user become unreachable with a single command and expire on their own.
+
+    A write also marks the user as recently written for ``recent_write_ttl`` seconds, about the longest replica lag.
+    Until the mark expires nothing is cached for the user, so a read from a replica that has not seen the write yet
+    is never stored under the new generation.
+    """
+
+    def __init__(self, ttl: int, recent_write_ttl: int):
+        self.ttl = ttl
+        self.recent_write_ttl = recent_write_ttl
+        self._counters: defaultdict[str, list[int]] = defaultdict(lambda: [0, 0])
+
+    @staticmethod
+    def _generation_key(user_id: int) -> str:
+        return f'contacts:generation:{user_id}'
+
+    @staticmethod
+    def _recent_write_key(user_id: int) -> str:
+        return f'contacts:recent_write:{user_id}'
+
+    async def lookup(self, user_id: int, endpoint: str, params: dict, r: Redis) -> tuple[str, Response | None]:
+        """
+        Retrieves the cached response of an endpoint.
+
+        :param user_id: ID of the current user.
+        :type user_id: int
+        :param endpoint: Name of the endpoint.
+        :type endpoint: str
+        :param params: Everything else the response depends on.
+        :type params: dict
+        :param r: The Redis client.
+        :type r: Redis
+        :return: The cache key and the cached response, None on a miss. The key is None after a recent write of the
+            user, the response must then be read from the primary and is not cached.
+        :rtype: tuple[str | None, Response | None]
+        """
+        generation, recent_write = await r.mget(self._generation_key(user_id), self._recent_write_key(user_id))
+        counters = self._counters[endpoint]
+        if recent_write is not None:
+            counters[1] += 1
+            return None, None
+        digest = hashlib.sha1(orjson.dumps(params, option=orjson.OPT_SORT_KEYS)).hexdigest()
+        key = f'contacts:response:{user_id}:{int(generation or 0)}:{endpoint}:{digest}'
+        cached = await r.get(key)
+        if cached is None:
+            counters[1] += 1
+            return key, None
+        counters[0] += 1
+        headers, body = cached.split(b'\n', 1)
+        return key, Response(body, media_type='application/json', headers=orjson.loads(headers))
+
+    async def store(self, key: str | None, body: bytes, headers: dict[str, str], r: Redis) -> Response:
+        """
+        Caches a serialized response for ``ttl`` seconds, unless the key is None.
+
+        :param key: The key from lookup.
+        :type key: str | None
+        :param body: JSON body.
+        :type body: bytes
+        :param headers: Response headers to be cached with the body.
+        :type headers: dict[str, str]
+        :param r: The Redis client.
+        :type r: Redis
+        :return: The response.
+        :rtype: Response
+        """
+        if key is not None:
+            await r.set(key, orjson.dumps(headers) + b'\n' + body, ex=self.ttl)
+        return Response(body, media_type='application/json', headers=headers)
+
+    async def invalidate(self, user_id: int, r: Redis) -> None:
+        """
+        Drops every cached response of the user and marks the user as recently written.
+
+        :param user_id: ID of the user whose contacts changed.
+        :type user_id: int
+        :param r: The Redis client.
+        :type r: Redis
+        """
+        async with r.pipeline(transaction=False) as pipe:
+            pipe.incr(self._generation_key(user_id))
+            pipe.set(self._recent_write_key(user_id), 1, ex=self.recent_write_ttl)
+            await pipe.execute()
+
+    def stats(self) -> dict:
+        """
+        Retrieves the hit and miss counters of this worker, in total and per endpoint.
+
+        :return: hits, misses and hit ratio.
+        :rtype: dict
+        """
+        def ratio(hits: int, misses: int) -> dict:
+            total = hits + misses
+            return {'hits': hits, 'misses': misses, 'hit_ratio': hits / total if total else 0.0}
+
+        hits = sum(counters[0] for counters in self._counters.values())
+        misses = sum(counters[1] for counters in self._counters.values())
+        return {**ratio(hits, misses),
+                'endpoints': {endpoint: ratio(*counters) for endpoint, counters in self._counters.items()}}
+
+
+response_cache = ResponseCache(ttl=settings.response_cache_ttl,
+                               recent_write_ttl=settings.response_cache_recent_write_ttl)
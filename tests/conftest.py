@@ -1,12 +1,17 @@
+from unittest.mock import AsyncMock
+
 import pytest
 from fastapi.testclient import TestClient
 from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import NullPool
 
 
 from main import app
 from src.database.models import Base
-from src.database.db import get_db
+from src.database.db import get_db, get_stream_db, async_db_url
+from src.database.redis_pool import get_redis
 
 from src.conf.config import settings
 
@@ -18,6 +23,10 @@ engine = create_engine(
 )
 TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+async_engine = create_async_engine(async_db_url(SQLALCHEMY_DATABASE_URL), poolclass=NullPool)
+AsyncTestingSessionLocal = async_sessionmaker(async_engine, class_=AsyncSession, autoflush=False,
+                                              expire_on_commit=False)
+
 
 @pytest.fixture(scope="module")
 def session():
@@ -37,13 +46,16 @@ def session():
 def client(session):
     # Dependency override
 
-    def override_get_db():
-        try:
-            yield session
-        finally:
-            session.close()
+    async def override_get_db():
+        async with AsyncTestingSessionLocal() as db:
+            yield db
+
+    async def override_get_redis():
+        return AsyncMock()
 
     app.dependency_overrides[get_db] = override_get_db
+    app.dependency_overrides[get_stream_db] = AsyncTestingSessionLocal
+    app.dependency_overrides[get_redis] = override_get_redis
 
     yield TestClient(app)
 
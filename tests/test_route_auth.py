@@ -1,11 +1,11 @@
-from unittest.mock import MagicMock
+from unittest.mock import AsyncMock
 
 from src.database.models import User
 
 
 def test_create_user(client, user, monkeypatch):
-    mock_send_email = MagicMock()
-    monkeypatch.setattr("src.routes.auth.send_email", mock_send_email)
+    mock_enqueue_email = AsyncMock()
+    monkeypatch.setattr("src.routes.auth.enqueue_email", mock_enqueue_email)
     response = client.post(
         "/api/auth/signup",
         json=user,
@@ -1,32 +1,37 @@
 import unittest
 from unittest.mock import MagicMock
 
-from sqlalchemy.orm import Session
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from datetime import date
+from datetime import date, datetime, timedelta
 
 import os
 import sys
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
 
-from src.database.models import Contact, User
-from src.schemas import ContactModel, NotesContact, ContactResponse
-from src.repository.contacts import (create_contact, read_contacts, read_contact, search_contact, birthdays,
-                                     update_contact, add_note, remove_contact)
+from src.database.models import Contact, ContactTombstone, User
+from src.schemas import ContactModel, NotesContact, ContactResponse, ContactBatchOperation
+from src.repository.contacts import (create_contact, create_contacts, read_contacts, read_contact_versions,
+                                     read_changes, read_contact, search_contact, search_contacts_text, birthdays,
+                                     birthday_window, update_contact, add_note, remove_contact, append_note,
+                                     delete_note, read_notes, apply_batch, prune_tombstones)
 
 
 class TestContacts(unittest.IsolatedAsyncioTestCase):
 
     def setUp(self):
-        self.session = MagicMock(spec=Session)
+        self.session = MagicMock(spec=AsyncSession)
+        self.result = MagicMock()
+        self.session.execute.return_value = self.result
         self.user = User(id=1)
         self.contact = MagicMock(contact_id=1, birthday=date(year=2000, month=9, day=1))
 
     async def test_create_contact(self):
         contact = ContactModel(first_name='first name', last_name='last name', email='tests@tests.com',
                                phone_number='1234567890', birthday=date(year=2001, month=1, day=1))
-        self.session.query().filter().all.return_value = contact
+        self.result.scalars().one.return_value = Contact(id=1, **contact.model_dump())
         result = await create_contact(body=contact, user=self.user, db=self.session)
 
         self.assertEqual(result.first_name, contact.first_name)
@@ -35,36 +40,135 @@ class TestContacts(unittest.IsolatedAsyncioTestCase):
         self.assertEqual(result.phone_number, contact.phone_number)
         self.assertEqual(result.birthday, contact.birthday)
         self.assertTrue(hasattr(result, "id"))
+        self.assertIn('RETURNING', str(self.session.execute.call_args.args[0]))
+        self.session.execute.assert_awaited_once()
+        self.session.refresh.assert_not_awaited()
+
+    async def test_create_contacts(self):
+        contact = ContactModel(first_name='first name', last_name='last name', email='tests@tests.com',
+                               phone_number='1234567890', birthday=date(year=2001, month=1, day=1))
+        result = await create_contacts(bodies=[contact, contact], user=self.user, db=self.session)
+        self.assertEqual(result, 2)
+        self.assertEqual(len(self.session.execute.call_args.args[1]), 2)
+        self.session.commit.assert_awaited_once()
 
     async def test_read_contacts(self):
-        contacts = [Contact(), Contact(), Contact()]
-        self.session.query().filter().offset().limit().all.return_value = contacts
+        contacts = [MagicMock(), MagicMock(), MagicMock()]
+        self.result.all.return_value = contacts
         result = await read_contacts(skip=0, limit=10, user=self.user, db=self.session)
         self.assertEqual(result, contacts)
+        stmt = str(self.session.execute.call_args.args[0])
+        self.assertIn('SELECT contacts.first_name, contacts.last_name', stmt)
+        self.assertIn('contacts.notes, contacts.updated_at', stmt)
+        self.assertNotIn('search_vector', stmt)
+
+    async def test_read_contacts_after(self):
+        contacts = [MagicMock(id=11), MagicMock(id=12)]
+        self.result.all.return_value = contacts
+        result = await read_contacts(skip=0, limit=2, user=self.user, db=self.session, after=10)
+        self.assertEqual(result, contacts)
+        stmt = self.session.execute.call_args.args[0]
+        self.assertIn('contacts.id >', str(stmt))
+        self.assertNotIn('OFFSET', str(stmt))
+
+    async def test_read_contact_versions(self):
+        versions = [(1, datetime(2024, 10, 1)), (2, datetime(2024, 10, 2))]
+        self.result.all.return_value = versions
+        result = await read_contact_versions(skip=0, limit=10, user=self.user, db=self.session, after=5)
+        self.assertEqual(result, versions)
+        stmt = str(self.session.execute.call_args.args[0])
+        self.assertIn('SELECT contacts.id, contacts.updated_at', stmt)
+        self.assertIn('contacts.id > :id_1', stmt)
+
+    async def test_read_changes(self):
+        contacts = [Contact(id=1, change_xid=7, change_seq=11, created_xid=7, created_seq=11),
+                    Contact(id=2, change_xid=9, change_seq=10, created_xid=1, created_seq=3)]
+        tombstones = [ContactTombstone(contact_id=3, user_id=1, change_xid=8, change_seq=12),
+                      ContactTombstone(contact_id=4, user_id=1, change_xid=9, change_seq=15)]
+        self.result.one.return_value = (20, None)
+        self.result.scalars().all.side_effect = [contacts, tombstones]
+        result = await read_changes(since=(5, 10), limit=3, user=self.user, db=self.session)
+        self.assertEqual(result, (contacts, tombstones[:1], (9, 10), True))
+        self.assertEqual(self.session.execute.await_count, 3)
+        stmt = self.session.execute.call_args_list[1].args[0]
+        compiled = stmt.compile(dialect=postgresql.dialect(), compile_kwargs={'literal_binds': True})
+        self.assertIn('(contacts.change_xid, contacts.change_seq) > (5, 10)', str(compiled))
+        self.assertIn('contacts.change_xid < 20', str(compiled))
+        self.assertIn('ORDER BY contacts.change_xid, contacts.change_seq', str(compiled))
+
+    async def test_read_changes_full_sync(self):
+        contacts = [Contact(id=1, change_xid=1, change_seq=1, created_xid=1, created_seq=1)]
+        self.result.one.return_value = (20, 30)
+        self.result.scalars().all.return_value = contacts
+        result = await read_changes(since=(0, 0), limit=3, user=self.user, db=self.session)
+        self.assertEqual(result, (contacts, [], (20, 0), False))
+        self.assertEqual(self.session.execute.await_count, 2)
+
+    async def test_read_changes_expired(self):
+        self.result.one.return_value = (20, 5)
+        self.assertIsNone(await read_changes(since=(5, 10), limit=3, user=self.user, db=self.session))
+        self.session.execute.assert_awaited_once()
+        self.result.scalars().all.return_value = []
+        result = await read_changes(since=(6, 10), limit=3, user=self.user, db=self.session)
+        self.assertEqual(result, ([], [], (20, 0), False))
+
+    async def test_prune_tombstones(self):
+        self.result.rowcount = 2
+        self.result.one.return_value = (3, 42)
+        result = await prune_tombstones(retention=timedelta(days=30), db=self.session)
+        self.assertEqual(result, 5)
+        self.assertEqual(self.session.execute.await_count, 3)
+        pruned = str(self.session.execute.call_args_list[1].args[0].compile(dialect=postgresql.dialect()))
+        self.assertIn('WHERE contact_tombstones.deleted_at < now() -', pruned)
+        horizon = str(self.session.execute.call_args_list[2].args[0].compile(dialect=postgresql.dialect()))
+        self.assertIn('ON CONFLICT (id) DO UPDATE', horizon)
+        self.session.commit.assert_awaited_once()
 
     async def test_read_contact(self):
         contact = Contact()
-        self.session.query().filter().first.return_value = contact
+        self.result.scalars().first.return_value = contact
         result = await read_contact(contact_id=1, user=self.user, db=self.session)
         self.assertEqual(result, contact)
 
     async def test_search_contact(self):
-        contacts = [Contact(first_name='tests'), Contact(last_name='tests')]
-        self.session.query().filter().all.return_value = contacts
-        result = await search_contact(info='tests', user=self.user, db=self.session)
-        self.assertEqual([contact.id for contact in result], [contact.id for contact in contacts])
+        contacts = [MagicMock(first_name='tests'), MagicMock(last_name='tests')]
+        self.result.all.return_value = contacts
+        result = await search_contact(info='tests', skip=0, limit=10, user=self.user, db=self.session)
+        self.assertEqual(result, contacts)
+        self.session.execute.assert_awaited_once()
+
+    async def test_search_contacts_text(self):
+        rows = [MagicMock(), MagicMock()]
+        self.result.all.return_value = rows
+        result = await search_contacts_text(query="ann -lee", skip=0, limit=10, user=self.user, db=self.session)
+        self.assertEqual(result, rows)
+        stmt = str(self.session.execute.call_args.args[0].compile(dialect=postgresql.dialect()))
+        self.assertIn('contacts.search_vector @@ websearch_to_tsquery', stmt)
+        self.assertIn('ts_headline', stmt)
 
     async def test_birthdays(self):
-        contacts = [Contact(id=1, birthday=date(year=2000, month=9, day=30)),
-                    Contact(id=2, birthday=date(year=2001, month=10, day=2))]
-        self.session.query().filter().all.return_value = contacts
+        today = date.today()
+        contacts = [MagicMock(id=1, birthday=(today + timedelta(days=1)).replace(year=2000)),
+                    MagicMock(id=2, birthday=(today + timedelta(days=6)).replace(year=2004))]
+        self.result.all.return_value = contacts
         result = await birthdays(period=7, user=self.user, db=self.session)
         self.assertEqual(result, contacts)
 
+    def test_birthday_window(self):
+        self.assertEqual(birthday_window(date(year=2024, month=9, day=28), 7), [(928, 1005)])
+        self.assertEqual(birthday_window(date(year=2024, month=12, day=30), 5), [(1230, 1231), (101, 104)])
+        self.assertEqual(birthday_window(date(year=2024, month=1, day=1), 400), [(101, 1231)])
+        self.assertEqual(birthday_window(date(year=2024, month=1, day=1), -1), [])
+
+    def test_birthday_window_leap_day(self):
+        self.assertEqual(birthday_window(date(year=2025, month=3, day=1), 3), [(301, 304), (229, 229)])
+        self.assertEqual(birthday_window(date(year=2025, month=2, day=20), 8), [(220, 228)])
+        self.assertEqual(birthday_window(date(year=2024, month=3, day=1), 3), [(301, 304)])
+
     async def test_update_contact(self):
         contact = Contact(first_name="test_f_n", last_name="test_l_n", email='tests@update.com', phone_number='123321',
                           birthday=date(year=2001, month=1, day=2), notes=['tests', 'note'])
-        self.session.query().filter().first.return_value = contact
+        self.result.scalars().first.return_value = contact
         body = ContactModel(first_name="test_f_n", last_name="test_l_n", email='tests@update.com', phone_number='123321',
                             birthday=date(year=2001, month=1, day=2), notes=['tests', 'note'])
         result = await update_contact(contact_id=1, body=body, user=self.user, db=self.session)
@@ -73,15 +177,54 @@ class TestContacts(unittest.IsolatedAsyncioTestCase):
     async def test_add_note(self):
         notes = NotesContact(notes=["tests", "notes"])
         contact = Contact(notes=notes)
-        self.session.query().filter().first.return_value = contact
+        self.result.scalars().first.return_value = contact
         result = await add_note(contact_id=1, body=notes, user=self.user, db=self.session)
         self.assertEqual(result, contact)
 
+    async def test_append_note(self):
+        self.result.scalar.return_value = 3
+        result = await append_note(contact_id=1, note="note", user=self.user, db=self.session)
+        self.assertEqual(result, 3)
+        self.assertIn('array_append', str(self.session.execute.call_args.args[0]))
+
+    async def test_delete_note(self):
+        self.result.scalar.return_value = None
+        result = await delete_note(contact_id=1, note="note", user=self.user, db=self.session)
+        self.assertIsNone(result)
+        self.assertIn('array_remove', str(self.session.execute.call_args.args[0]))
+
+    async def test_read_notes(self):
+        self.result.first.return_value = (["b", "c"],)
+        result = await read_notes(contact_id=1, skip=1, limit=2, user=self.user, db=self.session)
+        self.assertEqual(result, ["b", "c"])
+        stmt = self.session.execute.call_args.args[0].compile(dialect=postgresql.dialect())
+        self.assertIn('contacts.notes[%(notes_1)s:%(notes_2)s]', str(stmt))
+        self.assertEqual((stmt.params['notes_1'], stmt.params['notes_2']), (2, 3))
+
+    async def test_read_notes_not_found(self):
+        self.result.first.return_value = None
+        result = await read_notes(contact_id=1, skip=0, limit=2, user=self.user, db=self.session)
+        self.assertIsNone(result)
+
     async def test_remove_contact(self):
         contact = Contact()
-        self.session.query().filter().first.return_value = contact
+        self.result.scalars().first.return_value = contact
         result = await remove_contact(contact_id=1, user=self.user, db=self.session)
         self.assertEqual(result, contact)
+        self.assertIn('DELETE FROM contacts', str(self.session.execute.call_args.args[0]))
+        self.session.execute.assert_awaited_once()
+
+    async def test_apply_batch(self):
+        operations = [ContactBatchOperation(op='note', id=1, notes=['tests']),
+                      ContactBatchOperation(op='delete', id=2)]
+        self.result.scalars().all.side_effect = [[1], []]
+        result = await apply_batch(operations=operations, user=self.user, db=self.session)
+        self.assertEqual([item.status for item in result], [200, 404])
+        self.assertEqual(self.session.execute.await_count, 2)
+        stmt = str(self.session.execute.await_args_list[0].args[0].compile(dialect=postgresql.dialect()))
+        self.assertIn('FROM (VALUES', stmt)
+        self.assertIn('RETURNING contacts.id', stmt)
+        self.session.commit.assert_awaited_once()
 
 
 if __name__ == '__main__':
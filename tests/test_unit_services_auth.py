@@ -0,0 +1,163 @@
+import asyncio
+import hashlib
+import threading
+import time
+import unittest
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from fastapi import HTTPException
+from fastapi.security import HTTPAuthorizationCredentials
+from jose import JWTError, jwt
+from jose.exceptions import ExpiredSignatureError
+from passlib.context import CryptContext
+from redis.exceptions import ConnectionError, ResponseError, TimeoutError
+
+import os
+import sys
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+
+from src.database.models import User
+from src.routes.auth import login, refresh_token
+from src.services.auth import Auth, auth_service
+
+
+def cache_key(token: str) -> bytes:
+    return hashlib.sha256(token.encode()).digest()
+
+
+class TestTokenCache(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        auth_service.token_cache.clear()
+
+    async def test_ttl_capped_at_expiry(self):
+        token = await auth_service.create_access_token({'sub': 'ann@example.com'}, expires_delta=60)
+        with patch.object(auth_service.token_cache, 'set', wraps=auth_service.token_cache.set) as cache_set:
+            auth_service.decode_token(token)
+        ttl = cache_set.call_args.kwargs['ttl']
+        self.assertLessEqual(ttl, 60)
+        self.assertGreater(ttl, 50)
+        self.assertLess(ttl, auth_service.token_cache.ttl)
+
+    async def test_hit_skips_decode(self):
+        token = await auth_service.create_access_token({'sub': 'ann@example.com'})
+        with patch('src.services.auth.jwt.decode', wraps=jwt.decode) as decode:
+            first = auth_service.decode_token(token)
+            second = auth_service.decode_token(token)
+        self.assertEqual(first, second)
+        self.assertEqual(first['sub'], 'ann@example.com')
+        decode.assert_called_once()
+
+    async def test_expired_token_not_served(self):
+        token = await auth_service.create_access_token({'sub': 'ann@example.com'}, expires_delta=60)
+        auth_service.decode_token(token)
+        later = time.monotonic() + 61
+        with patch('src.services.cache.time.monotonic', return_value=later), \
+                patch('src.services.auth.jwt.decode', side_effect=ExpiredSignatureError('Signature has expired.')):
+            with self.assertRaises(JWTError):
+                auth_service.decode_token(token)
+
+        expired = await auth_service.create_access_token({'sub': 'ann@example.com'}, expires_delta=-10)
+        with self.assertRaises(ExpiredSignatureError):
+            auth_service.decode_token(expired)
+        self.assertIsNone(auth_service.token_cache.get(cache_key(expired)))
+
+    async def test_forget_token_on_refresh(self):
+        token = await auth_service.create_refresh_token({'sub': 'ann@example.com'})
+        auth_service.decode_token(token)
+        self.assertIsNotNone(auth_service.token_cache.get(cache_key(token)))
+        user = User(email='ann@example.com', refresh_token=token)
+        credentials = HTTPAuthorizationCredentials(scheme='Bearer', credentials=token)
+        with patch('src.routes.auth.repository_users.get_user_by_email', AsyncMock(return_value=user)), \
+                patch('src.routes.auth.repository_users.update_token', AsyncMock()) as update_token:
+            result = await refresh_token(credentials, db=MagicMock())
+        self.assertIsNone(auth_service.token_cache.get(cache_key(token)))
+        self.assertEqual(update_token.call_args.args[1], result['refresh_token'])
+
+    async def test_forget_token_on_reuse(self):
+        token = await auth_service.create_refresh_token({'sub': 'ann@example.com'})
+        auth_service.decode_token(token)
+        user = User(email='ann@example.com', refresh_token='rotated')
+        credentials = HTTPAuthorizationCredentials(scheme='Bearer', credentials=token)
+        with patch('src.routes.auth.repository_users.get_user_by_email', AsyncMock(return_value=user)), \
+                patch('src.routes.auth.repository_users.update_token', AsyncMock()) as update_token:
+            with self.assertRaises(HTTPException):
+                await refresh_token(credentials, db=MagicMock())
+        self.assertIsNone(auth_service.token_cache.get(cache_key(token)))
+        self.assertIsNone(update_token.call_args.args[1])
+
+
+class TestPasswordHashing(unittest.IsolatedAsyncioTestCase):
+
+    async def test_admission_limit(self):
+        rejected = auth_service.hashing_stats()['rejected']
+        with patch('src.services.auth.settings.password_hash_queue_limit', 0):
+            with self.assertRaises(HTTPException) as cm:
+                await auth_service.get_password_hash('secret')
+        self.assertEqual(cm.exception.status_code, 503)
+        self.assertEqual(cm.exception.headers['Retry-After'], '1')
+        self.assertEqual(auth_service.hashing_stats()['rejected'], rejected + 1)
+
+    async def test_queue_depth(self):
+        workers = auth_service.hashing_stats()['workers']
+        release = threading.Event()
+        calls = [asyncio.create_task(auth_service._run_hashing(release.wait)) for _ in range(workers + 2)]
+        await asyncio.sleep(0)
+        stats = auth_service.hashing_stats()
+        self.assertEqual((stats['pending'], stats['queue_depth']), (workers + 2, 2))
+        release.set()
+        await asyncio.gather(*calls)
+        stats = auth_service.hashing_stats()
+        self.assertEqual((stats['pending'], stats['queue_depth']), (0, 0))
+
+    async def test_rehash_on_login(self):
+        context = CryptContext(schemes=['bcrypt'], deprecated='auto', bcrypt__rounds=5)
+        old_hash = CryptContext(schemes=['bcrypt'], bcrypt__rounds=4).hash('secret')
+        user = User(email='ann@example.com', password=old_hash, confirmed=True)
+        body = MagicMock(username='ann@example.com', password='secret')
+        db = MagicMock()
+        with patch.object(Auth, '_pwd_context', context), \
+                patch('src.routes.auth.repository_users.get_user_by_email', AsyncMock(return_value=user)), \
+                patch('src.routes.auth.repository_users.update_token', AsyncMock()), \
+                patch('src.routes.auth.repository_users.update_password', AsyncMock()) as update_password:
+            verified, new_hash = await auth_service.verify_and_update_password('secret', old_hash)
+            self.assertTrue(verified)
+            self.assertTrue(new_hash.startswith('$2b$05$'))
+            await login(body, db)
+            (_, password, _), _ = update_password.call_args
+            self.assertTrue(context.verify('secret', password))
+            self.assertFalse(context.needs_update(password))
+
+            update_password.reset_mock()
+            user.password = password
+            await login(body, db)
+            update_password.assert_not_called()
+
+
+class TestUserInvalidations(unittest.IsolatedAsyncioTestCase):
+
+    async def test_reconnect_with_backoff(self):
+        async def listen(messages, error):
+            for message in messages:
+                auth_service.user_cache.set(message.decode(), 'cached')
+                yield {'data': message}
+            raise error
+
+        pubsub = MagicMock()
+        pubsub.__aenter__.return_value = pubsub
+        pubsub.subscribe = AsyncMock(side_effect=[ResponseError('LOADING'), TimeoutError('Timeout'),
+                                                  *[ConnectionError('Connection refused')] * 5, None, None])
+        pubsub.listen.side_effect = [listen([b'ann@example.com'], ConnectionError('Connection reset')),
+                                     listen([], asyncio.CancelledError())]
+        r = MagicMock()
+        r.pubsub.return_value = pubsub
+        with patch('src.services.auth.asyncio.sleep', AsyncMock()) as sleep:
+            with self.assertRaises(asyncio.CancelledError):
+                await auth_service.listen_user_invalidations(r)
+        self.assertEqual([call.args[0] for call in sleep.await_args_list], [1, 2, 4, 8, 16, 30, 30, 1])
+        self.assertIsNone(auth_service.user_cache.get('ann@example.com'))
+
+
+if __name__ == '__main__':
+    unittest.main()
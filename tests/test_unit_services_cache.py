@@ -0,0 +1,80 @@
+import pickle
+import unittest
+from datetime import datetime
+from unittest.mock import patch
+
+import os
+import sys
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+
+from src.database.models import User
+from src.services.cache import CachedUser, TTLCache, encode_user, decode_user
+
+
+class TestUserCache(unittest.TestCase):
+
+    def setUp(self):
+        self.user = User(id=1, username='deadpool', email='deadpool@example.com', password='hash',
+                         created_at=datetime(year=2024, month=10, day=1, hour=12), avatar='https://avatar',
+                         refresh_token='token', confirmed=True)
+
+    def test_round_trip(self):
+        cached = CachedUser.from_user(self.user)
+        result = decode_user(encode_user(cached))
+        self.assertEqual(result, cached)
+        self.assertEqual(result.created_at, self.user.created_at)
+
+    def test_secrets_not_cached(self):
+        data = encode_user(CachedUser.from_user(self.user))
+        self.assertNotIn(b'hash', data)
+        self.assertNotIn(b'token', data)
+
+    def test_legacy_pickle_is_miss(self):
+        self.assertIsNone(decode_user(pickle.dumps({'email': 'deadpool@example.com'})))
+
+    def test_unknown_version_is_miss(self):
+        self.assertIsNone(decode_user(b'[2, 1, "deadpool"]'))
+        self.assertIsNone(decode_user(None))
+
+
+class TestTTLCache(unittest.TestCase):
+
+    def setUp(self):
+        self.cache = TTLCache(maxsize=2, ttl=10)
+
+    def test_hit_and_miss(self):
+        self.cache.set('a', 1)
+        self.assertEqual(self.cache.get('a'), 1)
+        self.assertIsNone(self.cache.get('b'))
+        self.assertEqual(self.cache.stats()['hits'], 1)
+        self.assertEqual(self.cache.stats()['misses'], 1)
+
+    def test_evicts_least_recently_used(self):
+        self.cache.set('a', 1)
+        self.cache.set('b', 2)
+        self.cache.get('a')
+        self.cache.set('c', 3)
+        self.assertIsNone(self.cache.get('b'))
+        self.assertEqual(self.cache.get('a'), 1)
+        self.assertEqual(self.cache.get('c'), 3)
+
+    def test_expires(self):
+        with patch('src.services.cache.time.monotonic', return_value=100):
+            self.cache.set('a', 1)
+            self.cache.set('b', 2, ttl=1)
+        with patch('src.services.cache.time.monotonic', return_value=105):
+            self.assertEqual(self.cache.get('a'), 1)
+            self.assertIsNone(self.cache.get('b'))
+        with patch('src.services.cache.time.monotonic', return_value=110):
+            self.assertIsNone(self.cache.get('a'))
+
+    def test_pop(self):
+        self.cache.set('a', 1)
+        self.cache.pop('a')
+        self.cache.pop('missing')
+        self.assertIsNone(self.cache.get('a'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,95 @@
+import codecs
+import csv
+import io
+import unittest
+from collections import namedtuple
+from datetime import date
+
+import orjson
+
+import os
+import sys
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+
+from src.services.contacts_io import parse_contacts, render_contacts, EXPORT_COLUMNS
+
+
+class TestImport(unittest.TestCase):
+
+    def test_parse_csv(self):
+        file = io.BytesIO(b'first_name,last_name,email,phone_number,birthday\n'
+                          b'Ann,Lee,ann@example.com,+380501234567,1990-10-20\n'
+                          b'Bob,Ray,not an email,+380501234567,1990-10-20\n')
+        chunks = list(parse_contacts(file, 'csv'))
+        self.assertEqual(len(chunks), 1)
+        contacts, errors = chunks[0]
+        self.assertEqual([contact.first_name for contact in contacts], ['Ann'])
+        self.assertEqual(contacts[0].birthday, date(year=1990, month=10, day=20))
+        self.assertEqual([error.row for error in errors], [2])
+        self.assertTrue(errors[0].errors[0].startswith('email'))
+
+    def test_parse_ndjson_in_chunks(self):
+        line = b'{"first_name": "Ann", "last_name": "Lee", "email": "ann@example.com", ' \
+               b'"phone_number": "12345", "birthday": "1990-10-20"}\n'
+        file = io.BytesIO(line * 3 + b'\n{broken\n')
+        chunks = list(parse_contacts(file, 'ndjson', chunk_size=2))
+        self.assertEqual([len(contacts) for contacts, _ in chunks], [2, 1])
+        self.assertEqual([error.row for _, errors in chunks for error in errors], [5])
+
+    def test_parse_latin1(self):
+        header = b'first_name,last_name,email,phone_number,birthday\n'
+        file = io.BytesIO(header + 'Zoë,Brontë,zoe@example.com,12345,1990-10-20\n'.encode('latin-1'))
+        contacts, errors = next(parse_contacts(file, 'csv'))
+        self.assertEqual(contacts, [])
+        self.assertEqual(errors[0].row, 1)
+        self.assertIn('not UTF-8', errors[0].errors[0])
+        line = '{"first_name": "Zoë", "last_name": "Lee", "email": "zoe@example.com", ' \
+               '"phone_number": "12345", "birthday": "1990-10-20"}\n'
+        file = io.BytesIO(codecs.BOM_UTF8 + line.encode() + line.encode('latin-1') + line.encode())
+        contacts, errors = next(parse_contacts(file, 'ndjson'))
+        self.assertEqual([contact.first_name for contact in contacts], ['Zoë', 'Zoë'])
+        self.assertEqual([error.row for error in errors], [2])
+
+    def test_parse_malformed_csv(self):
+        file = io.BytesIO(b'first_name,last_name,email,phone_number,birthday\n'
+                          b'Ann,Lee,ann@example.com,+380501234567,1990-10-20\n'
+                          b'Bob,"Ray,bob@example.com,+380501234567,1990-10-20\n' + b'x' * (csv.field_size_limit() + 1))
+        chunks = list(parse_contacts(file, 'csv'))
+        self.assertEqual([contact.first_name for contacts, _ in chunks for contact in contacts], ['Ann'])
+        errors = [error for _, errors in chunks for error in errors]
+        self.assertEqual([error.row for error in errors], [2])
+        self.assertIn('field larger than field limit', errors[0].errors[0])
+
+
+class TestExport(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        ContactRow = namedtuple('ContactRow', EXPORT_COLUMNS)
+        self.rows = [ContactRow(1, 'Ann', 'Lee', 'ann@example.com', '12345', date(year=1990, month=10, day=20),
+                                ['first', 'second|third, "quoted"']),
+                     ContactRow(2, 'Bob', 'Ray', 'bob@example.com', '12345', date(year=1991, month=1, day=2), None)]
+
+    async def rows_iterator(self):
+        for row in self.rows:
+            yield row
+
+    async def test_render_ndjson(self):
+        chunks = [chunk async for chunk in render_contacts(self.rows_iterator(), 'ndjson', chunk_size=1)]
+        self.assertEqual(len(chunks), 2)
+        self.assertEqual(chunks[0], b'{"id":1,"first_name":"Ann","last_name":"Lee","email":"ann@example.com",'
+                                    b'"phone_number":"12345","birthday":"1990-10-20",'
+                                    b'"notes":["first","second|third, \\"quoted\\""]}\n')
+
+    async def test_render_csv(self):
+        content = b''.join([chunk async for chunk in render_contacts(self.rows_iterator(), 'csv')]).decode()
+        rows = list(csv.reader(io.StringIO(content)))
+        self.assertEqual(rows, [EXPORT_COLUMNS,
+                                ['1', 'Ann', 'Lee', 'ann@example.com', '12345', '1990-10-20',
+                                 '["first","second|third, \\"quoted\\""]'],
+                                ['2', 'Bob', 'Ray', 'bob@example.com', '12345', '1991-01-02', '']])
+        self.assertEqual(orjson.loads(rows[1][-1]), self.rows[0].notes)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,159 @@
+import asyncio
+import email
+import socket
+import unittest
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import orjson
+from aiosmtpd.controller import Controller
+from fastapi_mail import ConnectionConfig
+
+import os
+import sys
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+
+from src.services.email_queue import (DEAD_KEY, DELAYED_KEY, QUEUE_KEY, EmailWorker, enqueue_email,
+                                      queue_stats)
+
+
+def smtp_config(port: int) -> ConnectionConfig:
+    return ConnectionConfig(MAIL_USERNAME='', MAIL_PASSWORD='', MAIL_FROM='noreply@example.com', MAIL_PORT=port,
+                            MAIL_SERVER='127.0.0.1', MAIL_FROM_NAME='Tests', MAIL_STARTTLS=False, MAIL_SSL_TLS=False,
+                            USE_CREDENTIALS=False, VALIDATE_CERTS=False)
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def job(attempts: int = 0) -> bytes:
+    return orjson.dumps({'id': 'a1', 'email': 'ann@example.com', 'username': 'ann', 'host': 'http://test/',
+                         'attempts': attempts, 'enqueued_at': 1.0})
+
+
+class TestEmailQueue(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.redis = MagicMock()
+        self.redis.register_script.return_value = AsyncMock()
+        self.pipe = MagicMock()
+        self.pipe.execute = AsyncMock()
+        self.redis.pipeline.return_value.__aenter__.return_value = self.pipe
+
+    async def test_enqueue_email(self):
+        self.redis.lpush = AsyncMock()
+        await enqueue_email('ann@example.com', 'ann', 'http://test/', self.redis)
+        key, value = self.redis.lpush.call_args.args
+        self.assertEqual(key, QUEUE_KEY)
+        self.assertEqual(orjson.loads(value)['attempts'], 0)
+
+    async def test_take(self):
+        self.redis.blmove = AsyncMock(return_value=b'1')
+        self.redis.lmove = AsyncMock(side_effect=[b'2', None])
+        worker = EmailWorker(self.redis, name='w1')
+        self.assertEqual(await worker.take(timeout=1), [b'1', b'2'])
+        self.assertEqual(self.redis.blmove.call_args.args[:2], (QUEUE_KEY, 'email:processing:w1'))
+
+    async def test_recover(self):
+        self.redis.lmove = AsyncMock(side_effect=[b'1', b'2', None])
+        self.assertEqual(await EmailWorker(self.redis).recover(), 2)
+
+    async def test_retry_with_backoff(self):
+        worker = EmailWorker(self.redis, config=smtp_config(free_port()))
+        await worker.process([job(attempts=1)])
+        self.pipe.lrem.assert_called_once_with('email:processing:default', 1, job(attempts=1))
+        (key, mapping), _ = self.pipe.zadd.call_args
+        self.assertEqual(key, DELAYED_KEY)
+        retry, due = next(iter(mapping.items()))
+        self.assertEqual(orjson.loads(retry)['attempts'], 2)
+        self.assertGreater(due, 60)
+        self.pipe.lpush.assert_not_called()
+
+    async def test_dead_letter(self):
+        worker = EmailWorker(self.redis, config=smtp_config(free_port()))
+        await worker.process([job(attempts=4)])
+        key, value = self.pipe.lpush.call_args.args
+        self.assertEqual(key, DEAD_KEY)
+        self.assertIn('error', orjson.loads(value))
+        self.pipe.zadd.assert_not_called()
+
+    async def test_poison_jobs(self):
+        bad_email = orjson.dumps({**orjson.loads(job()), 'email': 'not an email'})
+        poison = [b'not json', orjson.dumps({'email': 'ann@example.com'}), bad_email]
+        worker = EmailWorker(self.redis, config=smtp_config(free_port()))
+        await worker.process([*poison, job()])
+        self.assertEqual(self.pipe.lrem.call_count, 4)
+        dead = [call.args[1] for call in self.pipe.lpush.call_args_list]
+        self.assertEqual([call.args[0] for call in self.pipe.lpush.call_args_list], [DEAD_KEY] * 3)
+        self.assertEqual(orjson.loads(dead[0])['job'], 'not json')
+        self.assertEqual(orjson.loads(dead[2])['email'], 'not an email')
+        self.assertTrue(all('error' in orjson.loads(value) for value in dead))
+        self.pipe.zadd.assert_called_once()
+
+    async def test_run_survives_errors(self):
+        self.redis.lmove = AsyncMock(return_value=None)
+        worker = EmailWorker(self.redis)
+        worker.take = AsyncMock(side_effect=[[b'1'], [], asyncio.CancelledError()])
+        worker.process = AsyncMock(side_effect=RuntimeError('bug'))
+        with patch('src.services.email_queue.asyncio.sleep', AsyncMock()) as sleep:
+            with self.assertRaises(asyncio.CancelledError):
+                await worker.run()
+        sleep.assert_awaited_once_with(1)
+        self.assertEqual(worker.take.await_count, 3)
+
+    async def test_queue_stats(self):
+        self.pipe.execute.return_value = [3, 1, 0, {b'sent': b'10', b'failed': b'2'}, [b'0.5', b'2.0', b'1.0']]
+        stats = await queue_stats(self.redis)
+        self.assertEqual((stats['queued'], stats['delayed'], stats['dead']), (3, 1, 0))
+        self.assertEqual((stats['sent'], stats['failed']), (10, 2))
+        self.assertEqual((stats['latency_p50'], stats['latency_p95']), (1.0, 2.0))
+
+
+class TestEmailWorkerSMTP(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        class Handler:
+            def __init__(self):
+                self.messages = []
+                self.connections = 0
+
+            async def handle_EHLO(self, server, session, envelope, hostname, responses):
+                self.connections += 1
+                session.host_name = hostname
+                return responses
+
+            async def handle_DATA(self, server, session, envelope):
+                self.messages.append(email.message_from_bytes(envelope.content))
+                return '250 OK'
+
+        self.handler = Handler()
+        self.controller = Controller(self.handler, hostname='127.0.0.1', port=free_port())
+        self.controller.start()
+        self.redis = MagicMock()
+        self.pipe = MagicMock()
+        self.pipe.execute = AsyncMock()
+        self.redis.pipeline.return_value.__aenter__.return_value = self.pipe
+
+    def tearDown(self):
+        self.controller.stop()
+
+    async def test_process_sends_batch(self):
+        worker = EmailWorker(self.redis, config=smtp_config(self.controller.port))
+        await worker.process([job(), job()])
+        self.assertEqual(len(self.handler.messages), 2)
+        self.assertEqual(self.handler.connections, 1)
+        message = self.handler.messages[0]
+        self.assertEqual(message['To'], 'ann@example.com')
+        self.assertEqual(message['Subject'], 'Confirm your email ')
+        html = next(part for part in message.walk() if part.get_content_type() == 'text/html')
+        self.assertIn('http://test/api/auth/confirmed_email/', html.get_payload(decode=True).decode())
+        self.assertEqual(self.pipe.lrem.call_count, 2)
+        self.assertEqual(self.pipe.hincrby.call_args.args, ('email:stats', 'sent', 1))
+        self.pipe.zadd.assert_not_called()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,56 @@
+import unittest
+
+from jinja2 import DictLoader, Environment, select_autoescape
+
+import os
+import sys
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+
+from src.services.email_templates import EmailTemplates, TEMPLATE_FOLDER
+
+
+class TestEmailTemplates(unittest.TestCase):
+
+    def setUp(self):
+        self.templates = EmailTemplates(TEMPLATE_FOLDER)
+        self.jinja = Environment(loader=self.templates.environment.loader, autoescape=select_autoescape(['html']))
+
+    def test_static_parts(self):
+        template = self.templates.templates['email_template.html']
+        self.assertIsNotNone(template.parts)
+        context = {'host': 'http://test/', 'username': '<b>Ann & "Lee"</b>', 'token': 'a.b.c'}
+        rendered = self.templates.render('email_template.html', context)
+        self.assertEqual(rendered, self.jinja.get_template('email_template.html').render(**context))
+        self.assertIn('Hi &lt;b&gt;Ann &amp; &#34;Lee&#34;&lt;/b&gt;,', rendered)
+
+    def test_render_batch(self):
+        recipients = [{'username': 'ann', 'token': 't1'}, {'username': 'bob', 'token': 't2'}]
+        bodies = self.templates.render_batch('email_template.html', recipients, host='http://test/')
+        self.assertEqual(len(bodies), 2)
+        self.assertIn('http://test/api/auth/confirmed_email/t2', bodies[1])
+        self.assertIn('Hi bob,', bodies[1])
+
+    def test_fallback_to_jinja(self):
+        self.templates.environment.loader = DictLoader({
+            'branch.html': '{% if username %}Hi {{ username }}{% endif %}!',
+            'filter.html': '{{ username|upper }}',
+            'trim.txt': '{{ username|trim }} & {{ host }}',
+            'plain.txt': '{{ username }} & {{ host }}',
+        })
+        context = {'username': ' a<b ', 'host': 'h'}
+        cases = [
+            ('branch.html', None, 'Hi  a&lt;b !'),
+            ('filter.html', None, ' A&lt;B '),
+            ('trim.txt', None, 'a<b & h'),
+            ('plain.txt', ['', 'username', ' & ', 'host', ''], ' a<b  & h'),
+        ]
+        for name, parts, rendered in cases:
+            template = self.templates._compile(name)
+            self.assertEqual(template.parts, parts, name)
+            self.assertEqual(template.render(context), rendered, name)
+        self.assertEqual(self.templates._compile('branch.html').render({'username': ''}), '!')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,48 @@
+import unittest
+from datetime import datetime
+
+import os
+import sys
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+
+from src.services.etag import contacts_etag, etag_matches, not_modified
+
+
+class TestETag(unittest.TestCase):
+
+    def setUp(self):
+        self.versions = [(1, datetime(2024, 10, 1, 12, 0, 0, 1)), (2, datetime(2024, 10, 1, 12, 0, 0, 2))]
+
+    def test_etag_is_weak_and_stable(self):
+        etag = contacts_etag(self.versions)
+        self.assertTrue(etag.startswith('W/"'))
+        self.assertEqual(etag, contacts_etag(list(self.versions)))
+
+    def test_etag_changes(self):
+        etag = contacts_etag(self.versions)
+        self.assertNotEqual(etag, contacts_etag([self.versions[0], (2, datetime(2024, 10, 1, 12, 0, 0, 3))]))
+        self.assertNotEqual(etag, contacts_etag(self.versions[:1]))
+        self.assertNotEqual(etag, contacts_etag(reversed(self.versions)))
+
+    def test_etag_matches(self):
+        etag = contacts_etag(self.versions)
+        self.assertTrue(etag_matches(etag, etag))
+        self.assertTrue(etag_matches(etag.removeprefix('W/'), etag))
+        self.assertTrue(etag_matches(f'W/"other", {etag}', etag))
+        self.assertTrue(etag_matches('*', etag))
+        self.assertFalse(etag_matches('W/"other"', etag))
+        self.assertFalse(etag_matches(None, etag))
+        self.assertFalse(etag_matches(etag, None))
+
+    def test_not_modified(self):
+        response = not_modified({'etag': 'W/"a"', 'x-next-cursor': 'abc', 'content-length': '10'})
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.body, b'')
+        self.assertEqual(response.headers['etag'], 'W/"a"')
+        self.assertEqual(response.headers['x-next-cursor'], 'abc')
+        self.assertNotEqual(response.headers.get('content-length'), '10')
+
+
+if __name__ == '__main__':
+    unittest.main()
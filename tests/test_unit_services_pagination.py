@@ -0,0 +1,46 @@
+import base64
+import unittest
+
+from fastapi import HTTPException
+
+import os
+import sys
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+
+from src.services.pagination import decode_cursor, decode_sync_token, encode_cursor, encode_sync_token
+
+
+class TestPagination(unittest.TestCase):
+
+    def assertBadRequest(self, decode, token: str, detail: str):
+        with self.assertRaises(HTTPException) as cm:
+            decode(token)
+        self.assertEqual(cm.exception.status_code, 400)
+        self.assertEqual(cm.exception.detail, detail)
+
+    def test_cursor_round_trip(self):
+        for contact_id in (0, 1, 42, 2 ** 63 - 1):
+            cursor = encode_cursor(contact_id)
+            self.assertNotIn('=', cursor)
+            self.assertEqual(decode_cursor(cursor), contact_id)
+
+    def test_sync_token_round_trip(self):
+        for change in ((0, 0), (1, 7), (2 ** 40, 10 ** 12)):
+            self.assertEqual(decode_sync_token(encode_sync_token(*change)), change)
+
+    def test_invalid_cursor(self):
+        for cursor in ('', 'not base64!', base64.urlsafe_b64encode(b'\xff\xfe').decode(),
+                       base64.urlsafe_b64encode(b'id:abc').decode(), base64.urlsafe_b64encode(b'id:1:2').decode(),
+                       encode_sync_token(5, 6)):
+            self.assertBadRequest(decode_cursor, cursor, 'Invalid cursor')
+
+    def test_invalid_sync_token(self):
+        for token in ('', '!!!', base64.urlsafe_b64encode(b'seq:42').decode(),
+                      base64.urlsafe_b64encode(b'xid:').decode(), base64.urlsafe_b64encode(b'xid:1').decode(),
+                      encode_cursor(5)):
+            self.assertBadRequest(decode_sync_token, token, 'Invalid sync token')
+
+
+if __name__ == '__main__':
+    unittest.main()
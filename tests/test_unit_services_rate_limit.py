@@ -0,0 +1,157 @@
+import unittest
+from unittest.mock import MagicMock, patch
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from redis.exceptions import ConnectionError
+
+import os
+import sys
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+
+from src.services.rate_limit import RateLimiter, RateLimitMiddleware, parse_quota, request_subject
+
+
+class FakeRedis:
+    """
+    The counters part of Redis that the rate limiter uses, shared by several limiters like by several workers.
+    """
+
+    def __init__(self):
+        self.store = {}
+        self.round_trips = 0
+
+    def pipeline(self, transaction=True):
+        redis, commands = self, []
+
+        class Pipeline:
+            async def __aenter__(self):
+                return self
+
+            async def __aexit__(self, *args):
+                pass
+
+            def incrby(self, key, amount):
+                commands.append(lambda: redis._incrby(key, amount))
+                return self
+
+            def expire(self, key, seconds):
+                commands.append(lambda: True)
+                return self
+
+            def get(self, key):
+                commands.append(lambda: redis.store.get(key))
+                return self
+
+            async def execute(self):
+                redis.round_trips += 1
+                return [command() for command in commands]
+
+        return Pipeline()
+
+    def _incrby(self, key, amount):
+        self.store[key] = self.store.get(key, 0) + amount
+        return self.store[key]
+
+    async def decrby(self, key, amount):
+        self.round_trips += 1
+        return self._incrby(key, -amount)
+
+
+class TestRateLimiter(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.redis = FakeRedis()
+
+    def test_parse_quota(self):
+        self.assertEqual(parse_quota('60/60'), (60, 60))
+
+    def test_applies(self):
+        limiter = RateLimiter({'/': '2/5', '/api/contacts': '10/60'}, {'a@example.com': {'/api/users': '5/60'}}, 10)
+        self.assertTrue(limiter.applies('/'))
+        self.assertTrue(limiter.applies('/api/contacts'))
+        self.assertTrue(limiter.applies('/api/contacts/5/notes'))
+        self.assertTrue(limiter.applies('/api/users/me/'))
+        self.assertFalse(limiter.applies('/api/auth/login'))
+        self.assertFalse(limiter.applies('/api/contactsfoo'))
+
+    async def test_limit_and_headers(self):
+        limiter = RateLimiter({'/api/contacts': '5/60'}, {}, 10)
+        decisions = [await limiter.check('user:a', 'a', '/api/contacts/1', self.redis) for _ in range(7)]
+        self.assertEqual([allowed for allowed, _ in decisions], [True] * 5 + [False] * 2)
+        self.assertEqual([headers['RateLimit-Remaining'] for _, headers in decisions[:5]], ['4', '3', '2', '1', '0'])
+        headers = decisions[-1][1]
+        self.assertEqual((headers['RateLimit-Limit'], headers['RateLimit-Policy']), ('5', '5;w=60'))
+        self.assertEqual(headers['Retry-After'], '12')
+        self.assertLessEqual(int(headers['RateLimit-Reset']), 60)
+        self.assertEqual(limiter.stats()['limited'], 2)
+
+    async def test_batches_redis_calls(self):
+        limiter = RateLimiter({'/api/contacts': '1000/60'}, {}, 10)
+        for _ in range(100):
+            allowed, _ = await limiter.check('user:a', 'a', '/api/contacts', self.redis)
+            self.assertTrue(allowed)
+        self.assertEqual(self.redis.round_trips, 10)
+
+    async def test_shared_between_workers(self):
+        workers = [RateLimiter({'/api/contacts': '100/60'}, {}, 10) for _ in range(4)]
+        allowed = sum([(await workers[i % 4].check('user:a', 'a', '/api/contacts', self.redis))[0]
+                       for i in range(200)])
+        self.assertGreaterEqual(allowed, 90)
+        self.assertLessEqual(allowed, 100)
+
+    async def test_subjects_and_users(self):
+        limiter = RateLimiter({'/api/contacts': '1/60'}, {'vip@example.com': {'/api/contacts': '3/60'}}, 10)
+        self.assertTrue((await limiter.check('user:a', 'a', '/api/contacts', self.redis))[0])
+        self.assertFalse((await limiter.check('user:a', 'a', '/api/contacts', self.redis))[0])
+        self.assertTrue((await limiter.check('user:b', 'b', '/api/contacts', self.redis))[0])
+        vip = [(await limiter.check('user:vip', 'vip@example.com', '/api/contacts', self.redis))[0] for _ in range(4)]
+        self.assertEqual(vip, [True, True, True, False])
+        self.assertIsNone(await limiter.check('user:a', 'a', '/api/auth/login', self.redis))
+
+    async def test_redis_down(self):
+        redis = MagicMock()
+        redis.pipeline.side_effect = ConnectionError('down')
+        limiter = RateLimiter({'/api/contacts': '1/60'}, {}, 10)
+        self.assertIsNone(await limiter.check('user:a', 'a', '/api/contacts', redis))
+
+    def test_request_subject(self):
+        scope = {'type': 'http', 'headers': [(b'authorization', b'Bearer token')], 'client': ('10.0.0.1', 5000)}
+        with patch('src.services.rate_limit.auth_service.decode_token',
+                   return_value={'sub': 'a@example.com', 'scope': 'access token'}):
+            self.assertEqual(request_subject(scope), ('user:a@example.com', 'a@example.com'))
+        with patch('src.services.rate_limit.auth_service.decode_token',
+                   return_value={'sub': 'a@example.com', 'scope': 'refresh token'}):
+            self.assertEqual(request_subject(scope), ('ip:10.0.0.1', None))
+
+
+class TestRateLimitMiddleware(unittest.TestCase):
+
+    def setUp(self):
+        app = FastAPI()
+        app.state.redis = FakeRedis()
+        app.add_middleware(RateLimitMiddleware, limiter=RateLimiter({'/limited': '1/60'}, {}, 10))
+
+        async def endpoint():
+            return {'ok': True}
+
+        app.get('/limited')(endpoint)
+        app.get('/free')(endpoint)
+        self.client = TestClient(app)
+
+    def test_middleware(self):
+        response = self.client.get('/limited')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.headers['ratelimit-remaining'], '0')
+        response = self.client.get('/limited')
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response.json(), {'detail': 'Too Many Requests'})
+        self.assertIn('retry-after', response.headers)
+        response = self.client.get('/free')
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('ratelimit-limit', response.headers)
+
+
+if __name__ == '__main__':
+    unittest.main()
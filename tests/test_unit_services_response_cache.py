@@ -0,0 +1,104 @@
+import unittest
+from datetime import date, datetime
+from typing import List
+from unittest.mock import AsyncMock, MagicMock
+
+from pydantic import TypeAdapter
+
+import os
+import sys
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+
+from src.database.models import Contact
+from src.schemas import ContactResponse
+from src.services.response_cache import ResponseCache, render, render_rows
+
+
+class TestResponseCache(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.store = {}
+        self.redis = MagicMock()
+        self.redis.get = AsyncMock(side_effect=lambda key: self.store.get(key))
+        self.redis.mget = AsyncMock(side_effect=lambda *keys: [self.store.get(key) for key in keys])
+        self.redis.set = AsyncMock(side_effect=lambda key, value, ex: self.store.__setitem__(key, value))
+        self.pipe = MagicMock()
+        self.pipe.execute = AsyncMock()
+        self.pipe.incr.side_effect = lambda key: self.store.__setitem__(
+            key, str(int(self.store.get(key, 0)) + 1).encode())
+        self.redis.pipeline.return_value.__aenter__.return_value = self.pipe
+        self.cache = ResponseCache(ttl=60, recent_write_ttl=5)
+
+    async def test_miss_then_hit(self):
+        key, cached = await self.cache.lookup(1, 'read_contacts', {'skip': 0, 'limit': 10}, self.redis)
+        self.assertIsNone(cached)
+        await self.cache.store(key, b'[{"id":1}]', {'X-Next-Cursor': 'abc'}, self.redis)
+        self.redis.set.assert_awaited_once()
+        self.assertEqual(self.redis.set.call_args.kwargs['ex'], 60)
+
+        key_again, cached = await self.cache.lookup(1, 'read_contacts', {'limit': 10, 'skip': 0}, self.redis)
+        self.assertEqual(key_again, key)
+        self.assertEqual(cached.body, b'[{"id":1}]')
+        self.assertEqual(cached.headers['x-next-cursor'], 'abc')
+        self.assertEqual(cached.media_type, 'application/json')
+
+    async def test_keys_differ_by_user_endpoint_and_params(self):
+        keys = {(await self.cache.lookup(user_id, endpoint, params, self.redis))[0]
+                for user_id in (1, 2) for endpoint in ('read_contacts', 'birthdays')
+                for params in ({'skip': 0}, {'skip': 10})}
+        self.assertEqual(len(keys), 8)
+
+    async def test_invalidate_changes_generation(self):
+        key, _ = await self.cache.lookup(1, 'read_contact', {'contact_id': 5}, self.redis)
+        await self.cache.store(key, b'{}', {}, self.redis)
+        await self.cache.invalidate(1, self.redis)
+        new_key, cached = await self.cache.lookup(1, 'read_contact', {'contact_id': 5}, self.redis)
+        self.assertNotEqual(new_key, key)
+        self.assertIsNone(cached)
+        other_key, _ = await self.cache.lookup(2, 'read_contact', {'contact_id': 5}, self.redis)
+        self.assertIn(':2:0:', other_key)
+
+    async def test_recent_write_not_cached(self):
+        await self.cache.invalidate(1, self.redis)
+        self.assertEqual(self.pipe.set.call_args.args, ('contacts:recent_write:1', 1))
+        self.assertEqual(self.pipe.set.call_args.kwargs['ex'], 5)
+        self.store['contacts:recent_write:1'] = b'1'
+        key, cached = await self.cache.lookup(1, 'read_contact', {'contact_id': 5}, self.redis)
+        self.assertEqual((key, cached), (None, None))
+        response = await self.cache.store(key, b'{}', {}, self.redis)
+        self.assertEqual(response.body, b'{}')
+        self.redis.set.assert_not_awaited()
+
+        del self.store['contacts:recent_write:1']
+        key, _ = await self.cache.lookup(1, 'read_contact', {'contact_id': 5}, self.redis)
+        self.assertIn(':1:1:', key)
+
+    async def test_stats(self):
+        key, _ = await self.cache.lookup(1, 'birthdays', {'period': 7}, self.redis)
+        await self.cache.store(key, b'[]', {}, self.redis)
+        await self.cache.lookup(1, 'birthdays', {'period': 7}, self.redis)
+        await self.cache.lookup(1, 'read_contacts', {'skip': 0}, self.redis)
+        stats = self.cache.stats()
+        self.assertEqual((stats['hits'], stats['misses']), (1, 2))
+        self.assertAlmostEqual(stats['hit_ratio'], 1 / 3)
+        self.assertEqual(stats['endpoints']['birthdays']['hit_ratio'], 0.5)
+
+    def test_render(self):
+        contact = Contact(id=1, first_name='Ann', last_name='Lee', email='ann@example.com', phone_number='12345',
+                          birthday=date(1990, 10, 20), notes=['note'])
+        body = render(TypeAdapter(List[ContactResponse]), [contact])
+        self.assertEqual(body, b'[{"first_name":"Ann","last_name":"Lee","email":"ann@example.com",'
+                               b'"phone_number":"12345","birthday":"1990-10-20","id":1,"notes":["note"]}]')
+
+    def test_render_rows(self):
+        contact = Contact(id=1, first_name='Ann', last_name='Lee', email='ann@example.com', phone_number='12345',
+                          birthday=date(1990, 10, 20), notes=None)
+        fields = tuple(ContactResponse.model_fields)
+        row = tuple(getattr(contact, field) for field in fields) + (datetime(2024, 10, 1),)
+        self.assertEqual(render_rows([row], fields), render(TypeAdapter(List[ContactResponse]), [contact]))
+        self.assertEqual(render_rows([], fields), b'[]')
+
+
+if __name__ == '__main__':
+    unittest.main()
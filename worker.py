@@ -0,0 +1,52 @@
+import argparse
+import asyncio
+from datetime import timedelta
+
+from src.conf.config import settings
+from src.database.db import SessionLocal
+from src.database.redis_pool import create_redis
+from src.repository import contacts as repository_contacts
+from src.services.email_queue import EmailWorker
+
+
+async def prune_tombstones(interval: int, retention: timedelta) -> None:
+    """
+    Prunes the contact tombstones every ``interval`` seconds until cancelled.
+
+    :param interval: Seconds between two runs.
+    :type interval: int
+    :param retention: How long tombstones are kept.
+    :type retention: timedelta
+    """
+    while True:
+        try:
+            async with SessionLocal() as db:
+                pruned = await repository_contacts.prune_tombstones(retention, db)
+            print(f'{pruned} contact tombstones pruned')
+        except Exception as e:
+            # The database is unreachable, the next run prunes what this one did not.
+            print(e)
+        await asyncio.sleep(interval)
+
+
+async def main(name: str) -> None:
+    """
+    Runs the email worker and the tombstone pruning until they are stopped.
+
+    :param name: Name of the worker, unfinished jobs are recovered by the next worker with the same name.
+    :type name: str
+    """
+    r = create_redis()
+    try:
+        await asyncio.gather(EmailWorker(r, name=name).run(),
+                             prune_tombstones(settings.tombstone_prune_interval,
+                                              timedelta(days=settings.tombstone_retention_days)))
+    finally:
+        await r.aclose()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Sends the queued emails and prunes contact tombstones.')
+    parser.add_argument('--name', default='default')
+    args = parser.parse_args()
+    asyncio.run(main(args.name))